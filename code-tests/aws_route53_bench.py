@@ -0,0 +1,180 @@
+"""
+Benchmark and regression harness of the Route53 tasks (python/dns), run offline against route53_fake.FakeRoute53.
+
+For every zone size, a hosted zone of that many A record sets is created in the fake and the list, check, create,
+update and delete tasks of route53_engine run against it through the real client path (route53_helpers client cache,
+route53_retry). Each task is reported with the API calls it made (throttled ones included), its wall time and, in a
+second run under tracemalloc, its peak Python memory.
+
+    eg: $ python3 code-tests/aws_route53_bench.py --sizes 100,10000 --output bench.json
+        $ python3 code-tests/aws_route53_bench.py --sizes 100,10000 --baseline bench.json
+
+With --baseline, the exit status is 1 when a task fails, makes more API calls than in the baseline, or takes more than
+--tolerance times its baseline wall time or peak memory: API calls are deterministic, wall time and memory are not.
+
+The client side rate limit (ROUTE53_REQUESTS_PER_SECOND) is raised unless --rate-limit is given, and the GetChange
+polling starts right away: otherwise both would hide the cost of the tasks themselves behind sleeps.
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+DNS_MODULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python', 'dns')
+
+BENCH_ZONE_NAME = 'bench.example.com.'
+BENCH_SIZES = '100,10000,100000'
+
+
+def bench_record_sets(size):
+    for number in range(size):
+        yield {'Name': 'host%06d.%s' % (number, BENCH_ZONE_NAME), 'Type': 'A', 'TTL': 300,
+               'ResourceRecords': [{'Value': '10.%d.%d.%d' % (number >> 16 & 255, number >> 8 & 255, number & 255)}]}
+
+
+def task_calls(route53_engine, credentials, hosted_zone_id, size):
+    """
+Returns the (task name, callable) pairs to benchmark. create, update and delete work on the same new record set, so
+a full run leaves the zone as it found it and can be repeated.
+    """
+    existing_name = 'host%06d.%s' % (size - 1, BENCH_ZONE_NAME)
+    new_name = 'bench-new.' + BENCH_ZONE_NAME
+    return (
+        ('list_resources_record_sets',
+         lambda: route53_engine.list_resources_record_sets(credentials, hosted_zone_id)),
+        ('check_resources_record_sets',
+         lambda: route53_engine.check_resources_record_sets(credentials, existing_name, hosted_zone_id)),
+        ('create_resources_record_sets',
+         lambda: route53_engine.create_resources_record_sets(credentials, new_name, '192.0.2.1', 'bench', 'A',
+                                                             hosted_zone_id)),
+        ('update_resources_record_sets',
+         lambda: route53_engine.update_resources_record_sets(credentials, new_name, '192.0.2.2', 'bench', 'A',
+                                                             hosted_zone_id)),
+        ('delete_resources_record_sets',
+         lambda: route53_engine.delete_resources_record_sets(credentials, new_name, '', 'bench', 'A',
+                                                             hosted_zone_id)),
+    )
+
+
+def _api_calls(fake):
+    # Throttled calls are counted both under their operation and under 'Throttled'.
+    return sum(count for operation, count in fake.calls.items() if operation != 'Throttled')
+
+
+def run_size(size, options):
+    import route53_engine
+    from route53_fake import FakeRoute53, FakeRoute53Credentials
+
+    fake = FakeRoute53(latency=options.latency, requests_per_second=options.throttle_rate)
+    hosted_zone_id = fake.add_hosted_zone(BENCH_ZONE_NAME, record_sets=bench_record_sets(size))
+    credentials = FakeRoute53Credentials(fake)
+
+    results = []
+    with open(os.devnull, 'w') as devnull:
+        for task, call in task_calls(route53_engine, credentials, hosted_zone_id, size):
+            calls_before, throttled_before = _api_calls(fake), fake.calls['Throttled']
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                started = time.monotonic()
+                result = call()
+                wall = time.monotonic() - started
+            finally:
+                sys.stdout = stdout
+            results.append({'size': size, 'task': task, 'ok': result is None or bool(result),
+                            'calls': _api_calls(fake) - calls_before,
+                            'throttled': fake.calls['Throttled'] - throttled_before,
+                            'wall_ms': round(wall * 1000, 1)})
+
+        if not options.skip_memory:
+            # tracemalloc slows Python down several times, so memory is measured on a second run.
+            for result, (task, call) in zip(results, task_calls(route53_engine, credentials, hosted_zone_id, size)):
+                stdout, sys.stdout = sys.stdout, devnull
+                tracemalloc.start()
+                try:
+                    call()
+                    result['peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+                finally:
+                    tracemalloc.stop()
+                    sys.stdout = stdout
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """
+Returns the messages describing the results worse than their baseline.
+    """
+    baseline_results = dict(((result['size'], result['task']), result) for result in baseline)
+    messages = []
+    for result in results:
+        reference = baseline_results.get((result['size'], result['task']))
+        if reference is None:
+            continue
+        name = result['task'] + ' @ ' + str(result['size'])
+        if result['calls'] > reference['calls']:
+            messages.append(name + ': ' + str(result['calls']) + ' API calls, baseline ' + str(reference['calls']))
+        for metric in ('wall_ms', 'peak_kib'):
+            if metric in result and metric in reference and result[metric] > reference[metric] * tolerance and \
+                    result[metric] - reference[metric] > 1:
+                messages.append(name + ': ' + metric + ' ' + str(result[metric]) + ', baseline ' +
+                                str(reference[metric]))
+    return messages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark of the Route53 tasks against route53_fake.')
+    parser.add_argument('--sizes', default=BENCH_SIZES, help='comma separated zone sizes (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every API call')
+    parser.add_argument('--throttle-rate', type=float, default=0,
+                        help='API calls per second over which the fake answers Throttling, 0 for no limit')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='client side rate limit (ROUTE53_REQUESTS_PER_SECOND), unlimited if 0')
+    parser.add_argument('--skip-memory', action='store_true', help='do not measure peak memory')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='wall time and memory ratio over the baseline reported as a regression '
+                             '(default: %(default)s)')
+    options = parser.parse_args(argv)
+
+    # Both are read when the Route53 modules are imported.
+    os.environ['ROUTE53_REQUESTS_PER_SECOND'] = str(options.rate_limit or 1000000)
+    for variable in ('ROUTE53_ZONE_CACHE_TTL', 'ROUTE53_WRITE_QUEUE_WINDOW'):
+        os.environ.pop(variable, None)
+    sys.path.insert(0, DNS_MODULES_PATH)
+
+    import route53_engine
+    route53_engine.wait_for_change = functools.partial(route53_engine.wait_for_change, initial_delay=0)
+
+    print('%-30s %8s %6s %9s %10s %10s  %s' % ('task', 'size', 'calls', 'throttled', 'wall ms', 'peak KiB', 'ok'))
+    results = []
+    for size in [int(size) for size in options.sizes.split(',')]:
+        for result in run_size(size, options):
+            results.append(result)
+            print('%-30s %8d %6d %9d %10.1f %10s  %s' % (result['task'], result['size'], result['calls'],
+                                                         result['throttled'], result['wall_ms'],
+                                                         result.get('peak_kib', '-'), result['ok']))
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    failed = [result['task'] + ' @ ' + str(result['size']) for result in results if not result['ok']]
+    if failed:
+        print('FAILED: ' + ', '.join(failed))
+
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            messages = regressions(results, json.load(baseline), options.tolerance)
+        for message in messages:
+            print('REGRESSION ' + message)
+        if messages:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
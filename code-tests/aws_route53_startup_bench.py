@@ -0,0 +1,93 @@
+"""
+Startup time benchmark of the Route53 entry points (python/dns).
+
+Every case runs in a fresh interpreter, several times, and the median wall time is reported together with whether
+botocore ended up loaded. The "boto3 import" case is the cost every entry point paid before boto3 was deferred to the
+first AWS call. boto3 and Fabric (python/dns/requirements.txt) must be installed: a case that fails is reported with
+its error and the exit status is 1.
+
+To compare with another revision, run the cases it has against a checkout of it, eg:
+
+    $ python3 code-tests/aws_route53_startup_bench.py --runs 10
+    $ git worktree add /tmp/jenkins-modules-before <revision>
+    $ python3 code-tests/aws_route53_startup_bench.py --runs 10 --modules-path /tmp/jenkins-modules-before/python/dns \
+        --case 'fabfile import' --case 'fab --list'
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DNS_MODULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python', 'dns')
+
+# (name, python code run in a fresh interpreter from DNS_MODULES_PATH)
+STARTUP_CASES = (
+    ('python interpreter', 'pass'),
+    ('boto3 import', 'import boto3, botocore.config'),
+    ('route53_cli --help', 'import sys; sys.argv = ["route53_cli.py", "--help"]; import route53_cli\n'
+                           'try:\n    route53_cli.main()\nexcept SystemExit:\n    pass'),
+    ('route53_engine import', 'import route53_engine'),
+    ('fabfile import', 'import jenkins_dns_aws_route53'),
+    ('fab --list', 'import sys; sys.argv = ["fab", "-f", "jenkins_dns_aws_route53.py", "--list"]\n'
+                   'from fabric.main import main\nmain()'),
+    ('route53_agent_client import', 'import route53_agent_client'),
+)
+
+# Reported at exit, so it is written after cases ending with sys.exit (fab) too.
+_REPORT_BOTOCORE = 'import atexit as _atexit, sys as _sys\n' \
+                   '_atexit.register(lambda: _sys.stderr.write("\\nbotocore=%s" % ("botocore" in _sys.modules)))\n'
+
+
+class StartupCaseError(Exception):
+    pass
+
+
+def run_case(code, runs, modules_path=DNS_MODULES_PATH):
+    """
+Runs code in runs fresh interpreters from modules_path and returns (list of wall times in seconds, botocore loaded).
+
+    :raise StartupCaseError: when the code fails, eg: on a missing dependency, with its error output.
+    """
+    timings, botocore_loaded = [], False
+    for _ in range(runs):
+        started = time.monotonic()
+        process = subprocess.run([sys.executable, '-c', _REPORT_BOTOCORE + code], cwd=modules_path,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+        timings.append(time.monotonic() - started)
+        if process.returncode != 0:
+            raise StartupCaseError(process.stderr.strip())
+        botocore_loaded = 'botocore=True' in process.stderr
+    return timings, botocore_loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Startup time benchmark of the Route53 entry points.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per case (default: %(default)s)')
+    parser.add_argument('--modules-path', default=DNS_MODULES_PATH,
+                        help='python/dns directory to run the cases from (default: this checkout)')
+    parser.add_argument('--case', action='append', choices=[name for name, _ in STARTUP_CASES],
+                        help='case to run, may be repeated (default: every case)')
+    options = parser.parse_args(argv)
+
+    status = 0
+    print('%-32s %10s %10s  %s' % ('case', 'median ms', 'min ms', 'botocore loaded'))
+    for name, code in STARTUP_CASES:
+        if options.case and name not in options.case:
+            continue
+        try:
+            timings, botocore_loaded = run_case(code, options.runs, options.modules_path)
+        except StartupCaseError as error:
+            print('%-32s %10s' % (name, 'FAILED'))
+            print(str(error), file=sys.stderr)
+            status = 1
+            continue
+        print('%-32s %10.1f %10.1f  %s' % (name, statistics.median(timings) * 1000, min(timings) * 1000,
+                                           botocore_loaded))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
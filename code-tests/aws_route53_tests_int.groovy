@@ -16,27 +16,28 @@ String dnsRecordSetName = "recordset-test.binbash.com.ar."
 String dnsRecordSetValue = "172.16.0.1"
 awsRoute53CreateRecordWithProfile(jenkinsModulesPath, dnsRecordSetComment, dnsRecordSetType, dnsHostedZoneId, awsRegion,
                                   dnsRecordSetName, dnsRecordSetValue, awsIamProfile)
-sleep 40000
-Boolean testResult1 = dnsCheckDomainExists(dnsRecordSetComment)
+Boolean testResult1 = awsRoute53VerifyRecordWithProfile(jenkinsModulesPath, dnsRecordSetType, dnsHostedZoneId, awsRegion,
+        dnsRecordSetName, dnsRecordSetValue, awsIamProfile)
 print "TEST1 = ${testResult1}\n"
 
 // Update record func call
 dnsRecordSetValue = "172.16.0.2"
 awsRoute53UpdateRecordWithProfile(jenkinsModulesPath, dnsRecordSetComment, dnsRecordSetType, dnsHostedZoneId, awsRegion,
         dnsRecordSetName, dnsRecordSetValue, awsIamProfile)
-sleep 10000
-Boolean testResult2 = dnsCheckDomainExists(dnsRecordSetComment)
+Boolean testResult2 = awsRoute53VerifyRecordWithProfile(jenkinsModulesPath, dnsRecordSetType, dnsHostedZoneId, awsRegion,
+        dnsRecordSetName, dnsRecordSetValue, awsIamProfile)
 print "TEST2 = ${testResult2}\n"
 
 // Delete record func call
 awsRoute53DeleteRecordWithProfile(jenkinsModulesPath, dnsRecordSetComment, dnsRecordSetType, dnsHostedZoneId, awsRegion,
         dnsRecordSetName, dnsRecordSetValue, awsIamProfile)
-sleep 50000
-Boolean testResult3 = dnsCheckDomainExists(dnsRecordSetComment)
+// An empty value waits for the record set to be gone
+Boolean testResult3 = awsRoute53VerifyRecordWithProfile(jenkinsModulesPath, dnsRecordSetType, dnsHostedZoneId, awsRegion,
+        dnsRecordSetName, "", awsIamProfile)
 print "TEST3 = ${testResult3}\n"
 
 // INT TEST
-if (testResult1 && testResult2 && !testResult3) {
+if (testResult1 && testResult2 && testResult3) {
         print "TEST #1 #2 #3 PASSED!!!\n"
 } else {
     print "TEST FAILED\n"
@@ -174,6 +175,30 @@ def awsRoute53DeleteRecordWithProfile(String jenkinsModulesPath, String dnsRecor
     }
 }
 
+// Waits until the authoritative name servers of the hosted zone answer dnsRecordSetValue ("" once deleted), instead of
+// sleeping a fixed time and asking a caching resolver
+def awsRoute53VerifyRecordWithProfile(String jenkinsModulesPath, String dnsRecordSetType, String dnsHostedZoneId,
+                                      String awsRegion, String dnsRecordSetName, String dnsRecordSetValue,
+                                      String awsIamProfile) {
+
+    try {
+        // Arguments passed as a list, so an empty value is kept
+        def bashCmd = ["/bin/bash", "aws_route53_tests_int.sh", "verify_resources_record_sets", "",
+                       jenkinsModulesPath, dnsRecordSetType, dnsHostedZoneId, awsRegion, dnsRecordSetName,
+                       dnsRecordSetValue, awsIamProfile]
+        println "bashCmd: ${bashCmd}"
+        def proc = bashCmd.execute()
+        proc.waitForProcessOutput(System.out, System.err)
+        return proc.exitValue() == 0
+
+    } catch (Exception e) {
+        print "[ERROR] Error while verifying dnsRecordSetName=${dnsRecordSetName}" +
+                ", dnsRecordSetValue=${dnsRecordSetValue}\n"
+        print "[ERROR] Exception=${e}\n"
+    }
+    return false
+}
+
 def dnsCheckDomainExists(String dnsRecordSetName) {
 
     String lookupResult = ""
@@ -27,6 +27,13 @@ function delete_resources_record_sets () {
     delete_resources_record_sets:"$awsIamProfile","$dnsRecordSetName","$dnsRecordSetValue","$dnsRecordSetComment","$dnsRecordSetType","$dnsHostedZoneId","$awsRegion"
 }
 
+# Waits until every authoritative name server answers dnsRecordSetValue ('' once deleted), exit status 1 on timeout.
+function verify_resources_record_sets () {
+    python3 ${jenkinsModulesPath}/python/dns/route53_cli.py --credentials "$awsIamProfile" \
+    verify_resources_record_sets "$dnsRecordSetName" "$dnsRecordSetValue" "$dnsRecordSetType" "$dnsHostedZoneId" \
+    --region-name "$awsRegion"
+}
+
 function dnsCheckDomainExists () {
     touch tmp_result.txt
     nslookup ${dnsRecordSetComment} > tmp_result.txt
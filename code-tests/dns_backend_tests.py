@@ -0,0 +1,278 @@
+"""
+Contract tests of the python/dns/dns_backend.py backends, run offline: FakeDNSBackend as it is, Route53Backend against
+route53_fake.FakeRoute53 through the real client path (route53_helpers client cache, route53_retry) and DynectBackend
+against an in-memory Dynect REST session (FakeDynectSession). Every backend runs the same DNSBackendContract cases,
+eg:
+
+    $ pip3 install -r python/dns/requirements.txt
+    $ python3 code-tests/dns_backend_tests.py -v
+
+The zone cache and the write queue are disabled and the client side rate limit raised, whatever the environment.
+"""
+
+import copy
+import itertools
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+DNS_MODULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python', 'dns')
+
+os.environ['ROUTE53_REQUESTS_PER_SECOND'] = '1000000'
+for variable in ('ROUTE53_ZONE_CACHE_TTL', 'ROUTE53_WRITE_QUEUE_WINDOW'):
+    os.environ.pop(variable, None)
+sys.path.insert(0, DNS_MODULES_PATH)
+
+from dyn.tm.errors import DynectGetError  # noqa: E402
+
+import dns_backend  # noqa: E402
+from dns_backend import DynectBackend, FakeDNSBackend, InvalidChangeBatch, Route53Backend  # noqa: E402
+from route53_fake import FakeRoute53, FakeRoute53Credentials  # noqa: E402
+from route53_helpers import manifest_entry_change  # noqa: E402
+
+ZONE_NAME = 'example.com.'
+
+ZONE_RECORD_SETS = [
+    {'name': 'www.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10', '192.0.2.11']},
+    {'name': 'example.com.', 'type': 'MX', 'ttl': 3600, 'values': ['10 mail.example.com.', '20 mail2.example.com.']},
+    {'name': 'txt.example.com.', 'type': 'TXT', 'ttl': 300, 'values': ['"v=spf1 -all"']},
+]
+
+
+class FakeDynectSession(object):
+    """
+In-memory Dynect REST API, serving the calls of DynectBackend. Record changes are staged per zone and only visible to
+other sessions once published (PUT /Zone/ {'publish': True}); DELETE /ZoneChanges/ discards them.
+    """
+    def __init__(self):
+        self.published = {}
+        self.staged = {}
+        self.calls = []
+
+    def add_zone(self, zone, record_sets=()):
+        records = OrderedDict()
+        for record_set in record_sets:
+            records[(record_set['name'], record_set['type'])] = [
+                {'rdata': dns_backend._dynect_rdata(record_set['type'], value), 'ttl': record_set['ttl']}
+                for value in record_set['values']]
+        self.published[zone.rstrip('.')] = records
+
+    def _records(self, zone, staging=False):
+        if staging and zone not in self.staged:
+            self.staged[zone] = copy.deepcopy(self.published[zone])
+        return self.staged[zone] if zone in self.staged else self.published[zone]
+
+    @staticmethod
+    def _detail(records, name=None):
+        data = {}
+        for (fqdn, record_type), node_records in records.items():
+            if name is not None and fqdn != name:
+                continue
+            for record in node_records:
+                data.setdefault(record_type.lower() + '_records', []).append(
+                    {'fqdn': fqdn.rstrip('.'), 'record_type': record_type, 'ttl': record['ttl'],
+                     'rdata': copy.deepcopy(record['rdata'])})
+        return {'data': data}
+
+    def execute(self, uri, method, args=None):
+        self.calls.append((method, uri))
+        parts = uri.strip('/').split('/')
+        resource, zone = parts[0], parts[1]
+        name = parts[2] + '.' if len(parts) > 2 else None
+
+        if resource == 'Zone' and method == 'PUT':
+            self.published[zone] = self.staged.pop(zone, self.published[zone])
+            return {'data': {}}
+        if resource == 'ZoneChanges' and method == 'DELETE':
+            self.staged.pop(zone, None)
+            return {'data': {}}
+        if resource == 'AllRecord':
+            return self._detail(self._records(zone), name)
+        if resource == 'ANYRecord':
+            node = [key for key in self._records(zone) if key[0] == name]
+            if not node:
+                raise DynectGetError('No such node')
+            return {'data': ['/REST/' + key[1] + 'Record/' + zone + '/' + name.rstrip('.') for key in node]}
+
+        record_type = resource[:-len('Record')]
+        key = (name, record_type)
+        if method == 'GET':
+            if not self._records(zone).get(key):
+                raise DynectGetError('No such node')
+            return {'data': ['/REST/' + resource + '/' + zone + '/' + name.rstrip('.') + '/' + str(number)
+                             for number, _ in enumerate(self._records(zone)[key])]}
+        records = self._records(zone, staging=True)
+        if method == 'POST':
+            records.setdefault(key, []).append(copy.deepcopy(args))
+        elif method == 'PUT':
+            records[key] = copy.deepcopy(args[record_type + 'Records'])
+        elif method == 'DELETE':
+            records.pop(key, None)
+        return {'data': {}}
+
+
+class _FakeDynectBackend(DynectBackend):
+    def __init__(self, session):
+        DynectBackend.__init__(self, 'customer', 'username', 'password')
+        self.session = session
+
+    def _session(self):
+        return self.session
+
+
+class DNSBackendContract(object):
+    """
+Cases every DNSBackend has to pass. Subclasses implement make_backend.
+    """
+    def make_backend(self, zone_name, record_sets):
+        """
+Returns (backend, zone) for a new zone named zone_name holding record_sets, zone being the zone argument of the
+backend methods.
+        """
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend, self.zone = self.make_backend(ZONE_NAME, copy.deepcopy(ZONE_RECORD_SETS))
+
+    def record_sets(self):
+        # The record sets of the zone by (name, type), without the SOA and NS ones Route53 creates.
+        return dict(((record_set['name'], record_set['type']), (record_set.get('ttl'), sorted(record_set['values'])))
+                    for record_set in self.backend.list(self.zone) if record_set['type'] not in ('SOA', 'NS'))
+
+    def test_list(self):
+        self.assertEqual(self.record_sets(), dict(((record_set['name'], record_set['type']),
+                                                   (record_set['ttl'], sorted(record_set['values'])))
+                                                  for record_set in ZONE_RECORD_SETS))
+
+    def test_exists(self):
+        self.assertTrue(self.backend.exists(self.zone, 'www.example.com.', 'A'))
+        self.assertTrue(self.backend.exists(self.zone, 'www.example.com', 'a'))
+        self.assertTrue(self.backend.exists(self.zone, 'www.example.com.'))
+        self.assertFalse(self.backend.exists(self.zone, 'www.example.com.', 'TXT'))
+        self.assertFalse(self.backend.exists(self.zone, 'missing.example.com.'))
+
+    def test_apply_create_upsert_delete(self):
+        applied = self.backend.apply(self.zone, [
+            {'action': 'CREATE', 'name': 'app.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+            {'action': 'UPSERT', 'name': 'www.example.com.', 'type': 'A', 'ttl': 120, 'values': ['192.0.2.12']},
+            {'action': 'DELETE', 'name': 'txt.example.com.', 'type': 'TXT', 'ttl': 300, 'values': ['"v=spf1 -all"']},
+        ], 'contract test')
+
+        self.assertEqual(applied, 3)
+        record_sets = self.record_sets()
+        self.assertEqual(record_sets[('app.example.com.', 'A')], (60, ['192.0.2.20']))
+        self.assertEqual(record_sets[('www.example.com.', 'A')], (120, ['192.0.2.12']))
+        self.assertNotIn(('txt.example.com.', 'TXT'), record_sets)
+
+    def test_delete_values_in_any_order(self):
+        self.backend.apply(self.zone, [{'action': 'DELETE', 'name': 'www.example.com.', 'type': 'A', 'ttl': 300,
+                                        'values': ['192.0.2.11', '192.0.2.10']}])
+        self.assertFalse(self.backend.exists(self.zone, 'www.example.com.', 'A'))
+
+    def assertRejected(self, changes):
+        before = self.record_sets()
+        with self.assertRaises(InvalidChangeBatch):
+            self.backend.apply(self.zone, changes)
+        self.assertEqual(self.record_sets(), before)
+
+    def test_create_existing_is_rejected(self):
+        self.assertRejected([
+            {'action': 'CREATE', 'name': 'app.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+            {'action': 'CREATE', 'name': 'www.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10']},
+        ])
+
+    def test_delete_missing_is_rejected(self):
+        self.assertRejected([
+            {'action': 'DELETE', 'name': 'missing.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10']},
+        ])
+
+    def test_delete_other_values_is_rejected(self):
+        self.assertRejected([
+            {'action': 'UPSERT', 'name': 'app.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+            {'action': 'DELETE', 'name': 'www.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10']},
+        ])
+
+    def test_delete_other_ttl_is_rejected(self):
+        self.assertRejected([
+            {'action': 'DELETE', 'name': 'www.example.com.', 'type': 'A', 'ttl': 60,
+             'values': ['192.0.2.10', '192.0.2.11']},
+        ])
+
+
+class FakeDNSBackendTest(DNSBackendContract, unittest.TestCase):
+
+    def make_backend(self, zone_name, record_sets):
+        return FakeDNSBackend({zone_name: record_sets}, page_size=2), zone_name
+
+    def test_list_pages(self):
+        self.assertEqual(len(list(self.backend.list(self.zone))), len(ZONE_RECORD_SETS))
+        self.assertEqual(self.backend.calls['list'], 2)
+
+    def test_record_set_outside_of_the_zone_is_rejected(self):
+        self.assertRejected([
+            {'action': 'UPSERT', 'name': 'app.example.org.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+        ])
+
+
+class Route53BackendTest(DNSBackendContract, unittest.TestCase):
+    # A single fake for the whole class: clients are cached per credentials cache key, which is the id of the fake.
+    fake = FakeRoute53()
+    credentials = FakeRoute53Credentials(fake)
+
+    def make_backend(self, zone_name, record_sets):
+        hosted_zone_id = self.fake.add_hosted_zone(zone_name, record_sets=[
+            manifest_entry_change(dict(record_set, action='CREATE'))['ResourceRecordSet']
+            for record_set in record_sets])
+        return Route53Backend(self.credentials), hosted_zone_id
+
+    def test_zone_by_name(self):
+        fake = FakeRoute53()
+        fake.add_hosted_zone('example.org.', private_zone=True)
+        hosted_zone_id = fake.add_hosted_zone('example.org.', record_sets=[
+            {'Name': 'www.example.org.', 'Type': 'A', 'TTL': 300, 'ResourceRecords': [{'Value': '192.0.2.30'}]}])
+        backend = Route53Backend(FakeRoute53Credentials(fake), zone_visibility='public')
+
+        self.assertTrue(backend.exists('example.org', 'www.example.org.', 'A'))
+        self.assertEqual(backend.apply('example.org.', [{'action': 'UPSERT', 'name': 'app.example.org.',
+                                                         'type': 'A', 'values': ['192.0.2.31']}]), 1)
+        self.assertTrue(backend.exists(hosted_zone_id, 'app.example.org.', 'A'))
+        with self.assertRaises(ValueError):
+            backend.exists('example.net.', 'www.example.net.')
+
+
+class DynectBackendTest(DNSBackendContract, unittest.TestCase):
+
+    def make_backend(self, zone_name, record_sets):
+        self.session = FakeDynectSession()
+        self.session.add_zone(zone_name, record_sets)
+        return _FakeDynectBackend(self.session), zone_name
+
+    def test_apply_publishes_once(self):
+        self.backend.apply(self.zone, [
+            {'action': 'UPSERT', 'name': 'app.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+            {'action': 'UPSERT', 'name': 'app2.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.21']},
+        ])
+        self.assertEqual(self.session.calls.count(('PUT', '/Zone/example.com/')), 1)
+        self.assertEqual(self.session.staged, {})
+
+    def test_rejected_apply_discards_the_staged_changes(self):
+        self.assertRejected([
+            {'action': 'UPSERT', 'name': 'app.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+            {'action': 'DELETE', 'name': 'missing.example.com.', 'type': 'A', 'ttl': 60, 'values': ['192.0.2.20']},
+        ])
+        self.assertIn(('DELETE', '/ZoneChanges/example.com/'), self.session.calls)
+        self.assertNotIn(('PUT', '/Zone/example.com/'), self.session.calls)
+        self.assertEqual(self.session.staged, {})
+
+    def test_rdata_round_trip(self):
+        for record_type, value in itertools.chain(
+                [(record_set['type'], value) for record_set in ZONE_RECORD_SETS for value in record_set['values']],
+                [('SRV', '10 5 5060 sip.example.com.'), ('CAA', '0 issue "letsencrypt.org"'),
+                 ('TXT', '"quoted \\"text\\""')]):
+            self.assertEqual(dns_backend._dynect_value(record_type, dns_backend._dynect_rdata(record_type, value)),
+                             value)
+
+
+if __name__ == '__main__':
+    unittest.main()
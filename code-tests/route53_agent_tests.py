@@ -0,0 +1,127 @@
+"""
+Tests of the route53 agent (python/dns/route53_agent.py) and its client, run offline: the agent runs in a subprocess
+started in another working directory, with a route53_fake.FakeRoute53 behind a 'fake' credentials spec, and the
+client forwards tasks to it from this process, eg:
+
+    $ pip3 install -r python/dns/requirements.txt
+    $ python3 code-tests/route53_agent_tests.py -v
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+DNS_MODULES_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python', 'dns'))
+
+# Set before the agent starts: the client environment (AWS_*, ROUTE53_*, HOME) has to match the agent one.
+os.environ['ROUTE53_REQUESTS_PER_SECOND'] = '1000000'
+for variable in ('ROUTE53_ZONE_CACHE_TTL', 'ROUTE53_WRITE_QUEUE_WINDOW'):
+    os.environ.pop(variable, None)
+sys.path.insert(0, DNS_MODULES_PATH)
+
+import route53_agent  # noqa: E402
+import route53_agent_client  # noqa: E402
+from route53_fake import FakeRoute53, FakeRoute53Credentials  # noqa: E402
+
+HOSTED_ZONE_ID = '/hostedzone/Z00000000000001'
+
+# Serves the agent with a 'fake' credentials spec: a FakeRoute53 holding the example.com. hosted zone.
+AGENT_SCRIPT = """
+import sys
+sys.path.insert(0, %r)
+import route53_agent
+from route53_fake import FakeRoute53, FakeRoute53Credentials
+fake = FakeRoute53()
+fake.add_hosted_zone('example.com.')
+route53_agent._credentials_providers['fake'] = FakeRoute53Credentials(fake)
+route53_agent.serve(sys.argv[1])
+""" % DNS_MODULES_PATH
+
+CHANGES_CSV = """action,name,type,value,ttl
+CREATE,%s.example.com.,A,192.0.2.10,300
+"""
+
+
+class AgentTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.agent_dir = tempfile.mkdtemp()
+        cls.client_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.agent_dir, 'agent.sock')
+        cls.agent = subprocess.Popen([sys.executable, '-c', AGENT_SCRIPT, cls.socket_path], cwd=cls.agent_dir,
+                                     stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while route53_agent_client.main(['--socket', cls.socket_path, 'ping']) != 0:
+            if time.monotonic() > deadline or cls.agent.poll() is not None:
+                raise RuntimeError('route53 agent did not start')
+            time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        route53_agent_client.main(['--socket', cls.socket_path, 'shutdown'])
+        cls.agent.wait(30)
+        shutil.rmtree(cls.agent_dir)
+        shutil.rmtree(cls.client_dir)
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(self.client_dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        route53_agent._credentials_providers.pop('fake', None)
+
+    def run_client(self, *args):
+        return route53_agent_client.main(['--socket', self.socket_path, '--credentials', 'fake', '--no-fallback'] +
+                                         list(args))
+
+    def test_relative_manifest_path(self):
+        with open('changes.csv', 'w') as manifest:
+            manifest.write(CHANGES_CSV % 'relative')
+
+        self.assertEqual(self.run_client('apply_resources_record_sets_changes', 'changes.csv', HOSTED_ZONE_ID), 0)
+        self.assertEqual(self.run_client('check_resources_record_sets', 'relative.example.com.', HOSTED_ZONE_ID), 0)
+
+    def test_absolute_path_request(self):
+        request = {'task': 'import_resources_record_sets', 'args': ['zones/example.com.zone', HOSTED_ZONE_ID]}
+        self.assertEqual(route53_agent.absolute_path_request(request, '/srv/job')['args'],
+                         ['/srv/job/zones/example.com.zone', HOSTED_ZONE_ID])
+        for args in (['-', HOSTED_ZONE_ID], ['/tmp/example.com.zone', HOSTED_ZONE_ID]):
+            request = {'task': 'import_resources_record_sets', 'args': args}
+            self.assertEqual(route53_agent.absolute_path_request(request, '/srv/job'), request)
+        request = {'task': 'failover_resources_record_sets', 'args': ['type=A', '192.0.2.1']}
+        self.assertEqual(route53_agent.absolute_path_request(request, '/srv/job'), request)
+
+    def test_stdin_argument_runs_in_process(self):
+        fake = FakeRoute53()
+        fake.add_hosted_zone('example.com.')
+        route53_agent._credentials_providers['fake'] = FakeRoute53Credentials(fake)
+
+        stdin = sys.stdin
+        sys.stdin = io.StringIO(CHANGES_CSV % 'stdin')
+        try:
+            self.assertEqual(self.run_client('apply_resources_record_sets_changes', '-', HOSTED_ZONE_ID, '',
+                                             'us-east-1', 'csv'), 0)
+        finally:
+            sys.stdin = stdin
+
+        self.assertEqual(fake.calls['ChangeResourceRecordSets'], 1)
+        self.assertEqual(self.run_client('check_resources_record_sets', 'stdin.example.com.', HOSTED_ZONE_ID), 1)
+
+    def test_agent_refuses_stdin_argument(self):
+        response = route53_agent_client.call_agent({'task': 'import_resources_record_sets', 'credentials': 'fake',
+                                                    'args': ['-', HOSTED_ZONE_ID],
+                                                    'environment': route53_agent.task_environment()},
+                                                   self.socket_path)
+        self.assertFalse(response['ok'])
+        self.assertIn('stdin', response['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,433 @@
+"""
+Provider agnostic DNS backends: one interface over Route53, Dynect and an in-memory fake, so pipelines and tools do not
+branch on the DNS provider and batching or caching only has to be built once.
+
+Record sets and changes are plain dicts, in the manifest entry format of route53_helpers.load_record_set_changes:
+
+    record set: {'name': 'app.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10']}
+    change:     {'action': 'UPSERT', 'name': 'app.example.com.', 'type': 'A', 'ttl': 300, 'values': ['192.0.2.10']}
+
+Values are in zonefile presentation format, as Route53 returns them (eg: '10 mail.example.com.' for MX, '"text"' for
+TXT). Route53 alias and routing policy record sets also hold route53_helpers.RECORD_SET_OPTIONS keys (eg:
+set_identifier, weight, alias_hosted_zone_id), which the other backends do not support.
+
+    eg: backend = dns_backend('route53', credentials_provider('instance-metadata'))
+        backend = dns_backend('dynect', 'your-dynect-group', 'your-dynect-username', api_key)
+
+        backend.apply('example.com.', [{'action': 'CREATE', 'name': 'app.example.com.', 'type': 'A',
+                                        'values': ['192.0.2.10']}])
+        backend.exists('example.com.', 'app.example.com.', 'A')
+        for record_set in backend.list('example.com.'):
+            ...
+
+Every backend has the Route53 change semantics: a CREATE of an existing record set, or a DELETE of a record set that
+is missing or whose TTL and values differ from the current ones, raises InvalidChangeBatch and none of the changes (of
+that change batch, for Route53) is applied.
+"""
+
+import copy
+import re
+from collections import Counter, OrderedDict
+
+from route53_helpers import get_route53_client, change_resource_record_sets_batched, manifest_entry_change, \
+    normalize_record_name, RECORD_SET_OPTIONS, DEFAULT_RECORD_SET_TTL
+from route53_cache import iter_zone_record_sets, lookup_resource_record_set, invalidate_zone
+from route53_zone_index import resolve_hosted_zone_id
+
+DNS_CHANGE_ACTIONS = ('CREATE', 'UPSERT', 'DELETE')
+
+# rdata fields of the record types DynectBackend supports, in zonefile value order.
+DYNECT_RDATA_FIELDS = OrderedDict([
+    ('A', ('address',)),
+    ('AAAA', ('address',)),
+    ('CNAME', ('cname',)),
+    ('NS', ('nsdname',)),
+    ('PTR', ('ptrdname',)),
+    ('MX', ('preference', 'exchange')),
+    ('SRV', ('priority', 'weight', 'port', 'target')),
+    ('TXT', ('txtdata',)),
+    ('SPF', ('txtdata',)),
+    ('CAA', ('flags', 'tag', 'value')),
+])
+_DYNECT_INTEGER_FIELDS = ('preference', 'priority', 'weight', 'port', 'flags')
+_QUOTED_STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+FAKE_PAGE_SIZE = 100
+
+
+class InvalidChangeBatch(ValueError):
+    """
+A change was rejected by the DNS backend, as Route53 rejects a ChangeBatch with an InvalidChangeBatch error.
+    """
+
+
+def _change_values(change):
+    if 'values' in change:
+        return list(change['values'])
+    return [change['value']] if change.get('value') is not None else []
+
+
+def _record_set_entry(change):
+    # The record set a change sets: the change without its action, with a values list and a normalized name and type.
+    record_set = dict((key, value) for key, value in change.items() if key not in ('action', 'value', 'values'))
+    record_set['name'] = normalize_record_name(change['name'])
+    record_set['type'] = str(change['type']).upper()
+    record_set['values'] = _change_values(change)
+    return record_set
+
+
+def _same_record_set(record_set, current):
+    # A Dynect DELETE has to give the full record set, like a Route53 one: same TTL and values (in any order).
+    return current is not None and current.get('ttl') == record_set.get('ttl') and \
+        sorted(current['values']) == sorted(record_set['values'])
+
+
+def _invalid_delete(record_set, current):
+    return InvalidChangeBatch('Tried to delete resource record set ' + record_set['name'] + ' type ' +
+                              record_set['type'] + ' but ' + ('the values provided do not match the current values'
+                                                              if current is not None else 'it was not found'))
+
+
+def _invalid_create(record_set):
+    return InvalidChangeBatch('Tried to create resource record set ' + record_set['name'] + ' type ' +
+                              record_set['type'] + ' but it already exists')
+
+
+class DNSBackend(object):
+    """
+Base DNS backend. Subclasses implement apply, list and exists for zones given by name, eg: example.com.
+    """
+    def apply(self, zone, changes, comment=''):
+        """
+Applies changes (CREATE | UPSERT | DELETE) to a zone in as few provider requests as possible. Either all the changes
+are applied or, on error, none is (for Route53: none of the change batch that failed).
+
+    :return: (int) number of changes applied.
+
+    :raise InvalidChangeBatch: when a CREATE or DELETE does not match the zone.
+        """
+        raise NotImplementedError
+
+    def list(self, zone):
+        """
+Yields the record sets of a zone, page by page as they are fetched.
+        """
+        raise NotImplementedError
+
+    def exists(self, zone, name, record_type=None):
+        """
+Tells whether the zone holds a record set named name (of type record_type when given).
+        """
+        raise NotImplementedError
+
+
+class Route53Backend(DNSBackend):
+    """
+Route53 hosted zones, through the route53_engine client, zone cache and change batching. Zones are given by name,
+resolved to a hosted zone with route53_zone_index (zone_visibility picks the public or private zone of a split
+horizon pair), or by hosted zone ID, eg: /hostedzone/Z2WI7FSN6LUJNR
+    """
+    def __init__(self, credentials, region_name='us-east-1', zone_visibility=''):
+        self.credentials = credentials
+        self.region_name = region_name
+        self.zone_visibility = zone_visibility
+
+    def _hosted_zone_id(self, aws_dns, zone):
+        if str(zone).startswith('/hostedzone/'):
+            return str(zone)
+        hosted_zone_id = resolve_hosted_zone_id(aws_dns, self.credentials.cache_key, self.zone_visibility,
+                                                normalize_record_name(zone))
+        if hosted_zone_id is None:
+            raise ValueError('Hosted zone not found: ' + str(zone))
+        return hosted_zone_id
+
+    def apply(self, zone, changes, comment=''):
+        from botocore.exceptions import ClientError
+
+        aws_dns = get_route53_client(self.credentials, self.region_name)
+        hosted_zone_id = self._hosted_zone_id(aws_dns, zone)
+
+        changes_applied = 0
+        try:
+            for batch, _ in change_resource_record_sets_batched(aws_dns, hosted_zone_id,
+                                                                [manifest_entry_change(change) for change in changes],
+                                                                comment):
+                changes_applied += len(batch)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') != 'InvalidChangeBatch':
+                raise
+            raise InvalidChangeBatch(error.response['Error'].get('Message', str(error)))
+        finally:
+            invalidate_zone(hosted_zone_id)
+        return changes_applied
+
+    def list(self, zone):
+        aws_dns = get_route53_client(self.credentials, self.region_name)
+        for resource_record_sets in iter_zone_record_sets(aws_dns, self._hosted_zone_id(aws_dns, zone)):
+            record_set = {'name': resource_record_sets['Name'], 'type': resource_record_sets['Type']}
+            if 'AliasTarget' in resource_record_sets:
+                record_set['values'] = [resource_record_sets['AliasTarget']['DNSName']]
+                record_set['alias_hosted_zone_id'] = resource_record_sets['AliasTarget']['HostedZoneId']
+                record_set['alias_evaluate_target_health'] = \
+                    str(resource_record_sets['AliasTarget'].get('EvaluateTargetHealth', False)).lower()
+            else:
+                record_set['ttl'] = resource_record_sets.get('TTL')
+                record_set['values'] = [record_values['Value']
+                                        for record_values in resource_record_sets.get('ResourceRecords', [])]
+            for option, element in RECORD_SET_OPTIONS.items():
+                if element in resource_record_sets and element not in ('TTL', 'AliasTarget'):
+                    record_set[option] = resource_record_sets[element]
+            yield record_set
+
+    def exists(self, zone, name, record_type=None):
+        aws_dns = get_route53_client(self.credentials, self.region_name)
+        return lookup_resource_record_set(aws_dns, self._hosted_zone_id(aws_dns, zone), name,
+                                          str(record_type).upper() if record_type else None) is not None
+
+
+def _dynect_rdata(record_type, value):
+    # Converts a zonefile value to the rdata of a Dynect record, eg: '10 mail.example.com.' for MX.
+    fields = DYNECT_RDATA_FIELDS[record_type]
+    if record_type in ('TXT', 'SPF'):
+        strings = _QUOTED_STRING_PATTERN.findall(value)
+        text = ''.join(strings) if strings else value
+        return {'txtdata': re.sub(r'\\(.)', r'\1', text)}
+
+    parts = str(value).split(None, len(fields) - 1)
+    if len(parts) != len(fields):
+        raise ValueError('Invalid ' + record_type + ' value: ' + str(value))
+    rdata = {}
+    for field, part in zip(fields, parts):
+        rdata[field] = int(part) if field in _DYNECT_INTEGER_FIELDS else part.strip('"')
+    return rdata
+
+
+def _dynect_value(record_type, rdata):
+    # Converts the rdata of a Dynect record to a zonefile value, as Route53 would show it.
+    if record_type in ('TXT', 'SPF'):
+        return '"' + rdata['txtdata'].replace('\\', '\\\\').replace('"', '\\"') + '"'
+    if record_type == 'CAA':
+        return '%s %s "%s"' % (rdata['flags'], rdata['tag'], rdata['value'])
+    return ' '.join(str(rdata[field]) for field in DYNECT_RDATA_FIELDS[record_type])
+
+
+def _dynect_record_sets(response):
+    # Groups the records of a /AllRecord/ response ({'data': {'a_records': [...], ...}}) by name and type.
+    record_sets = OrderedDict()
+    for records in response['data'].values():
+        for record in records:
+            record_type = str(record['record_type']).upper()
+            if record_type not in DYNECT_RDATA_FIELDS:
+                continue
+            key = (normalize_record_name(record['fqdn']), record_type)
+            record_set = record_sets.setdefault(key, {'name': key[0], 'type': record_type,
+                                                      'ttl': int(record['ttl']), 'values': []})
+            record_set['values'].append(_dynect_value(record_type, record['rdata']))
+    return record_sets
+
+
+class DynectBackend(DNSBackend):
+    """
+Dynect zones, through the REST API with the session shared by every Dynect task (see dynect_session). The changes are
+staged on the zone and published once; when one of them fails, the staged ones are discarded (DELETE /ZoneChanges/)
+and nothing is published. Dynect returns all the records of a zone in one response, so list fetches a single page.
+Supports the DYNECT_RDATA_FIELDS record types.
+    """
+    def __init__(self, customer, username, password):
+        self.customer = customer
+        self.username = username
+        self.password = password
+
+    def _session(self):
+        from dynect_session import dynect_session
+        return dynect_session(self.customer, self.username, self.password)
+
+    @staticmethod
+    def _record_uri(record_type, zone, name):
+        if record_type not in DYNECT_RDATA_FIELDS:
+            raise ValueError('Unsupported record type: ' + record_type + ', expected one of ' +
+                             ', '.join(DYNECT_RDATA_FIELDS))
+        return '/' + record_type + 'Record/' + zone + '/' + normalize_record_name(name).rstrip('.') + '/'
+
+    def _record_type_exists(self, session, zone, name, record_type):
+        from dyn.tm.errors import DynectGetError
+        try:
+            return bool(session.execute(self._record_uri(record_type, zone, name), 'GET')['data'])
+        except DynectGetError:
+            return False
+
+    @staticmethod
+    def _node_record_set(session, zone, name, record_type):
+        from dyn.tm.errors import DynectGetError
+        name = normalize_record_name(name)
+        try:
+            response = session.execute('/AllRecord/' + zone + '/' + name.rstrip('.') + '/', 'GET', {'detail': 'Y'})
+        except DynectGetError:
+            return None
+        return _dynect_record_sets(response).get((name, record_type))
+
+    def _stage(self, session, zone, change):
+        record_set = _record_set_entry(change)
+        action = str(change['action']).upper()
+        uri = self._record_uri(record_set['type'], zone, record_set['name'])
+        records = [{'rdata': _dynect_rdata(record_set['type'], value), 'ttl': int(record_set.get('ttl') or 0)}
+                   for value in record_set['values']]
+
+        if action == 'CREATE':
+            if self._record_type_exists(session, zone, record_set['name'], record_set['type']):
+                raise _invalid_create(record_set)
+            for record in records:
+                session.execute(uri, 'POST', record)
+        elif action == 'UPSERT':
+            # Replaces every record of that type on the node.
+            session.execute(uri, 'PUT', {record_set['type'] + 'Records': records})
+        elif action == 'DELETE':
+            # Dynect deletes every record of that type on the node, whatever the values: check them first.
+            record_set['ttl'] = int(record_set.get('ttl') or DEFAULT_RECORD_SET_TTL)
+            current = self._node_record_set(session, zone, record_set['name'], record_set['type'])
+            if not _same_record_set(record_set, current):
+                raise _invalid_delete(record_set, current)
+            session.execute(uri, 'DELETE')
+        else:
+            raise ValueError('Unsupported action: ' + action + ', expected one of ' + ', '.join(DNS_CHANGE_ACTIONS))
+
+    def apply(self, zone, changes, comment=''):
+        session = self._session()
+        zone = normalize_record_name(zone).rstrip('.')
+        changes = list(changes)
+        try:
+            for change in changes:
+                self._stage(session, zone, change)
+            session.execute('/Zone/' + zone + '/', 'PUT', {'publish': True, 'notes': str(comment)})
+        except Exception:
+            try:
+                session.execute('/ZoneChanges/' + zone + '/', 'DELETE')
+            except Exception as error:
+                # print colored(error, 'red')
+                print("exception :" + str(error))
+            raise
+        return len(changes)
+
+    def list(self, zone):
+        session = self._session()
+        zone = normalize_record_name(zone).rstrip('.')
+        response = session.execute('/AllRecord/' + zone + '/', 'GET', {'detail': 'Y'})
+        for record_set in _dynect_record_sets(response).values():
+            yield record_set
+
+    def exists(self, zone, name, record_type=None):
+        from dyn.tm.errors import DynectGetError
+        session = self._session()
+        zone = normalize_record_name(zone).rstrip('.')
+        if record_type:
+            return self._record_type_exists(session, zone, name, str(record_type).upper())
+        try:
+            return bool(session.execute('/ANYRecord/' + zone + '/' + normalize_record_name(name).rstrip('.') + '/',
+                                        'GET')['data'])
+        except DynectGetError:
+            return False
+
+
+class FakeDNSBackend(DNSBackend):
+    """
+In-memory backend for tests and dry runs, with the Route53 change semantics: a CREATE of an existing record set, a
+DELETE of a missing one or of one with other TTL or values, or a record set outside of the zone fails the whole apply.
+list yields page_size record sets per page; calls counts the apply, list (one per page) and exists calls.
+    """
+    def __init__(self, zones=None, page_size=FAKE_PAGE_SIZE):
+        self.zones = {}
+        self.page_size = int(page_size)
+        self.calls = Counter()
+        for zone, record_sets in (zones or {}).items():
+            self.add_zone(zone, record_sets)
+
+    @staticmethod
+    def _key(record_set):
+        return record_set['name'], record_set['type'], record_set.get('set_identifier') or ''
+
+    @staticmethod
+    def _record_set(change):
+        record_set = _record_set_entry(change)
+        if 'alias_hosted_zone_id' not in record_set:
+            record_set['ttl'] = int(record_set.get('ttl') or DEFAULT_RECORD_SET_TTL)
+        return record_set
+
+    @staticmethod
+    def _comparable(record_set):
+        # The full record set, routing options included, with the values in any order.
+        if record_set is None:
+            return None
+        return dict(record_set, values=sorted(record_set['values']))
+
+    def add_zone(self, zone, record_sets=()):
+        record_sets = [self._record_set(record_set) for record_set in record_sets]
+        self.zones[normalize_record_name(zone)] = OrderedDict((self._key(record_set), record_set)
+                                                              for record_set in record_sets)
+
+    def _zone(self, zone):
+        try:
+            return self.zones[normalize_record_name(zone)]
+        except KeyError:
+            raise ValueError('Zone not found: ' + str(zone))
+
+    def apply(self, zone, changes, comment=''):
+        self.calls['apply'] += 1
+        zone_name = normalize_record_name(zone)
+        record_sets = OrderedDict(self._zone(zone))
+        changes_applied = 0
+        for change in changes:
+            record_set = self._record_set(change)
+            action = str(change['action']).upper()
+            key = self._key(record_set)
+            if action not in DNS_CHANGE_ACTIONS:
+                raise ValueError('Unsupported action: ' + action + ', expected one of ' + ', '.join(DNS_CHANGE_ACTIONS))
+            if record_set['name'] != zone_name and not record_set['name'].endswith('.' + zone_name):
+                raise InvalidChangeBatch('RRSet with DNS name ' + record_set['name'] + ' is not permitted in zone ' +
+                                         zone_name)
+            if action == 'CREATE' and key in record_sets:
+                raise _invalid_create(record_set)
+            if action == 'DELETE' and self._comparable(record_sets.get(key)) != self._comparable(record_set):
+                raise _invalid_delete(record_set, record_sets.get(key))
+
+            if action == 'DELETE':
+                del record_sets[key]
+            else:
+                record_sets[key] = record_set
+            changes_applied += 1
+
+        self.zones[normalize_record_name(zone)] = record_sets
+        return changes_applied
+
+    def list(self, zone):
+        record_sets = list(self._zone(zone).values())
+        for page_start in range(0, len(record_sets), self.page_size):
+            self.calls['list'] += 1
+            for record_set in record_sets[page_start:page_start + self.page_size]:
+                yield copy.deepcopy(record_set)
+
+    def exists(self, zone, name, record_type=None):
+        self.calls['exists'] += 1
+        name = normalize_record_name(name)
+        record_type = str(record_type).upper() if record_type else None
+        return any(key[0] == name and (record_type is None or key[1] == record_type) for key in self._zone(zone))
+
+
+DNS_BACKENDS = {
+    'route53': Route53Backend,
+    'dynect': DynectBackend,
+    'fake': FakeDNSBackend,
+}
+
+
+def dns_backend(provider, *args, **kwargs):
+    """
+Returns the DNS backend of a provider, eg: dns_backend('route53', credentials_provider('instance-metadata'))
+
+    :param provider: (string) -- one of DNS_BACKENDS: route53 | dynect | fake
+
+    :raise ValueError: on an unknown provider.
+    """
+    if provider not in DNS_BACKENDS:
+        raise ValueError('Unsupported DNS provider: ' + str(provider) + ', expected one of ' +
+                         ', '.join(sorted(DNS_BACKENDS)))
+    return DNS_BACKENDS[provider](*args, **kwargs)
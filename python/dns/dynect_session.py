@@ -0,0 +1,176 @@
+"""
+Dynect API sessions shared by the jenkins_dns_dynect.py tasks, within a process and across processes.
+
+Logging in (POST /Session/) is the slowest Dynect API call and is rate limited, while a session token stays valid for
+as long as it is used. dynect_session() keeps the token of every customer/user in a small cache file
+(DYNECT_SESSION_CACHE_PATH, readable by its owner only) and hands it to the next task, in this process or another one:
+
+    - a session already open in the current thread for the same user is returned as it is;
+    - a cached token used less than DYNECT_SESSION_TTL seconds ago is checked with a cheap GET /Session/ and reused;
+    - otherwise, the stale token (if any) is logged out and a new session is logged in and cached.
+
+The cache file is updated under a flock, so parallel pipeline stages share one token instead of racing to log in.
+With DYNECT_SESSION_TTL set to 0 nothing is cached and every session is logged out when the process exits, eg:
+
+    $ export DYNECT_SESSION_TTL=0
+
+logout_dynect_session() logs out the cached session, eg: at the end of a pipeline.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from dyn.tm.errors import DynectError
+from dyn.tm.session import DynectSession
+
+DYNECT_SESSION_TTL = float(os.environ.get('DYNECT_SESSION_TTL', '1800'))
+DYNECT_SESSION_CACHE_PATH = os.environ.get('DYNECT_SESSION_CACHE_PATH',
+                                           os.path.join(os.path.expanduser('~'), '.cache', 'jenkins-dns',
+                                                        'dynect-session.json'))
+
+# Sessions opened by this process, logged out at exit when the cache is disabled.
+_OPENED_SESSIONS = []
+
+
+def dynect_session_cache_enabled():
+    return DYNECT_SESSION_TTL > 0
+
+
+def _cache_key(customer, username, password):
+    # Sessions of the same user with another password (eg: rotated) are not shared.
+    return str(customer) + '/' + str(username) + '/' + \
+        hashlib.sha256(str(password).encode('utf-8')).hexdigest()[:16]
+
+
+@contextmanager
+def _locked_cache():
+    # Yields the cache dict under an exclusive flock and writes it back, readable by its owner only, on success.
+    cache_dir = os.path.dirname(DYNECT_SESSION_CACHE_PATH)
+    if cache_dir and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    with open(DYNECT_SESSION_CACHE_PATH + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(DYNECT_SESSION_CACHE_PATH) as cache_file:
+                    cache = json.load(cache_file)
+            except (IOError, OSError, ValueError):
+                cache = {}
+
+            yield cache
+
+            temporary_path = DYNECT_SESSION_CACHE_PATH + '.tmp'
+            with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.rename(temporary_path, DYNECT_SESSION_CACHE_PATH)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _session_is_valid(session):
+    # GET /Session/ (session verify) fails with a DynectGetError for an expired or logged out token.
+    try:
+        session.execute('/Session/', 'GET')
+        return True
+    except DynectError:
+        return False
+
+
+def _log_out_token(session):
+    # Logs out the token of session, ignoring the failures of tokens already expired on the Dynect side.
+    try:
+        session.execute('/Session/', 'DELETE')
+    except DynectError:
+        pass
+    session._token = None
+
+
+def _new_session(customer, username, password):
+    session = DynectSession.new_session(customer, username, password, auto_auth=False)
+    session._jenkins_cache_key = _cache_key(customer, username, password)
+    _OPENED_SESSIONS.append(session)
+    return session
+
+
+def dynect_session(customer, username, password):
+    """
+Returns an authenticated DynectSession for the current thread, reusing the session of a previous task when possible.
+The dyn.tm objects (eg: Zone) use it implicitly.
+
+    :param customer: (string) -- Dynect customer name
+
+    :param username: (string) -- Dynect user name
+
+    :param password: (string) -- Dynect user password or API key
+
+    :return: (dyn.tm.session.DynectSession) authenticated session.
+
+    :raise dyn.tm.errors.DynectAuthError: if the log in fails.
+    """
+    cache_key = _cache_key(customer, username, password)
+
+    session = DynectSession.get_session()
+    if session is not None and session._token and getattr(session, '_jenkins_cache_key', None) == cache_key:
+        return session
+
+    session = _new_session(customer, username, password)
+    if not dynect_session_cache_enabled():
+        session.authenticate()
+        return session
+
+    with _locked_cache() as cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            session._token = cached['token']
+            if time.time() - cached['used_at'] < DYNECT_SESSION_TTL and _session_is_valid(session):
+                cached['used_at'] = time.time()
+                return session
+            _log_out_token(session)
+
+        session.authenticate()
+        cache[cache_key] = {'token': session._token, 'used_at': time.time()}
+    return session
+
+
+def logout_dynect_session(customer, username, password):
+    """
+Logs out the cached (or current) session of a user and drops it from the cache.
+
+    :return: (bool) True if a session was logged out.
+    """
+    cache_key = _cache_key(customer, username, password)
+    token = None
+
+    session = DynectSession.get_session()
+    if session is not None and getattr(session, '_jenkins_cache_key', None) == cache_key:
+        token = session._token
+
+    if dynect_session_cache_enabled():
+        with _locked_cache() as cache:
+            cached = cache.pop(cache_key, None)
+            token = token or (cached or {}).get('token')
+
+    if not token:
+        return False
+
+    if session is None or getattr(session, '_jenkins_cache_key', None) != cache_key:
+        session = _new_session(customer, username, password)
+    session._token = token
+    _log_out_token(session)
+    DynectSession.close_session()
+    return True
+
+
+@atexit.register
+def _log_out_opened_sessions():
+    if dynect_session_cache_enabled():
+        return
+    for session in _OPENED_SESSIONS:
+        if session._token:
+            _log_out_token(session)
@@ -1,10 +1,12 @@
 from fabric.decorators import task
 from fabric.api import settings, env
 
-import boto3
 import sys
 import importlib
 
+import route53_engine
+from route53_credentials import DefaultCredentials
+
 importlib.reload(sys)
 
 env.user = 'jenkins'
@@ -12,58 +14,32 @@ env.roledefs = {
     'local': ['localhost'],
 }
 
+# Fabric tasks for AWS Route53 using the default credentials chain (environment variables, shared credentials file,
+# ECS task role, web identity, EC2 instance profile...). The implementation lives in route53_engine.py, the chain is
+# resolved once per process.
+CREDENTIALS = DefaultCredentials()
+
+# TTL of the record sets created, updated and deleted by these tasks.
+RECORD_SET_TTL = 60
+
 
 @task
-def list_hostedzones(region_name_arg='us-east-1'):
+def list_hostedzones(region_name_arg='us-east-1', output_format_arg='text'):
     """
 Retrieves a list of the public and private hosted zones that are associated with the current AWS account.
-The response includes a HostedZones child element for each hosted zone.
-
-Amazon Route 53 returns a maximum of 100 items in each response.
-If you have a lot of hosted zones, you can use the maxitems parameter to list them in groups of up to 100.
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.list_hostedzones:"profile company","us-east-1"
+    :param output_format_arg: (string) -- text | jsonl | csv | table, eg: jsonl to parse the output with jq.
+
+    eg: $ fab -R local aws_route53_fab.list_hostedzones:"us-east-1","jsonl"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
-
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
-        try:
-            response = aws_dns.list_hosted_zones(
-                MaxItems='100'
-            )
-
-            for hosted_zones in response['HostedZones']:
-
-                hostedzone_id = hosted_zones.get('Id')
-                hostedzone_name = hosted_zones.get('Name')
-                hostedzone_caller_ref = hosted_zones.get('CallerReference')
-                hostedzone_conf_privzone = hosted_zones.get('Config').get('PrivateZone')
-                hostedzone_record_count = hosted_zones.get('ResourceRecordSetCount')
-
-                hostedzone_linkedserv_serv = ''
-                if hosted_zones.get('LinkedService') is not None:
-                    hostedzone_linkedserv_serv = hosted_zones.get('LinkedService').get('ServicePrincipal')
-
-                print("Route53 Hosted Zones:")
-                print('hostedzone_id: ' + str(hostedzone_id))
-                print('hostedzone_name: ' + str(hostedzone_name))
-                print('hostedzone_caller_ref: ' + str(hostedzone_caller_ref))
-                print('hostedzone_conf_privzone: ' + str(hostedzone_conf_privzone))
-                print('hostedzone_record_count: ' + str(hostedzone_record_count))
-                print('hostedzone_linkedserv_serv: ' + str(hostedzone_linkedserv_serv))
-
-        except Exception as error:
-            # print colored(error, 'red')
-            print("exception :" + str(error))
+        return route53_engine.list_hostedzones(CREDENTIALS, region_name_arg, output_format_arg)
 
 
 @task
-def list_resources_record_sets(hosted_zone_id_arg, region_name_arg='us-east-1'):
+def list_resources_record_sets(hosted_zone_id_arg, region_name_arg='us-east-1', output_format_arg='text'):
     """
 Lists the resource record sets in a specified hosted zone.
 
@@ -72,454 +48,355 @@ Lists the resource record sets in a specified hosted zone.
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.list_resources_record_sets:"profile company","/hostedzone/Z2WI7FSN6LUJNR",
-    "us-east-1"
+    :param output_format_arg: (string) -- text | jsonl | csv | table, eg: jsonl to parse the output with jq.
+
+    eg: $ fab -R local aws_route53_fab.list_resources_record_sets:"/hostedzone/Z2WI7FSN6LUJNR",
+    "us-east-1","csv"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
+        return route53_engine.list_resources_record_sets(CREDENTIALS, hosted_zone_id_arg, region_name_arg,
+                                                         output_format_arg)
+
+
+@task
+def list_all_resources_record_sets(region_name_arg='us-east-1', max_concurrency_arg='8', requests_per_second_arg='5',
+                                   output_format_arg='text'):
+    """
+Lists the resource record sets of every hosted zone of the account, fetching hosted zones concurrently.
 
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
+    :param region_name_arg: (string) -- AWS account region
 
-        hosted_zone_id = hosted_zone_id_arg
+    :param max_concurrency_arg: (string) -- number of hosted zones fetched at the same time.
 
-        try:
-            response = aws_dns.list_resource_record_sets(
-                HostedZoneId=hosted_zone_id,
-                # StartRecordName='string',
-                # StartRecordType='SOA' | 'A' | 'TXT' | 'NS' | 'CNAME' | 'MX' | 'NAPTR' | 'PTR' | 'SRV' | 'SPF' | 'AAAA'
-                #  | 'CAA',
-                # StartRecordIdentifier='string',
-                MaxItems='100'
-            )
+    :param requests_per_second_arg: (string) -- Route53 API requests per second allowed to the sweep.
 
-            for resource_record_sets in response['ResourceRecordSets']:
+    :param output_format_arg: (string) -- text | jsonl | csv | table, eg: jsonl to parse the output with jq.
 
-                resource_record_sets_name = resource_record_sets.get('Name')
-                resource_record_sets_type = resource_record_sets.get('Type')
-                resource_record_sets_region = resource_record_sets.get('Region')
-                resource_record_sets_ttl = resource_record_sets.get('TTL')
+    eg: $ fab -R local aws_route53_fab.list_all_resources_record_sets:"us-east-1","8","5","jsonl"
+    """
+    with settings(warn_only=False):
+        return route53_engine.list_all_resources_record_sets(CREDENTIALS, region_name_arg, max_concurrency_arg,
+                                                             requests_per_second_arg, output_format_arg)
 
-                resource_record_sets_record_value = ""
-                for record_values in resource_record_sets.get('ResourceRecords'):
-                    resource_record_sets_record_value = record_values.get('Value')
 
-                print("")
-                print("Route53 Rosource record sets for zone: " + hosted_zone_id)
-                print('resource_record_sets_name: ' + str(resource_record_sets_name))
-                print('resource_record_sets_type: ' + str(resource_record_sets_type))
-                print('resource_record_sets_region: ' + str(resource_record_sets_region))
-                print('resource_record_sets_ttl: ' + str(resource_record_sets_ttl))
-                print('resource_record_sets_record_value: ' + str(resource_record_sets_record_value))
+@task
+def get_hosted_zone_id(record_set_name_arg, region_name_arg='us-east-1', zone_visibility_arg=''):
+    """
+Finds the hosted zone ID a record name belongs to (longest matching hosted zone name).
 
-        except Exception as error:
-            # print colored(error, 'red')
-            print("exception :" + str(error))
+    :param record_set_name_arg: (string) -- record set name argument eg: yoursubdomain.yourdomain.com
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param zone_visibility_arg: (string) -- public | private to prefer that kind of hosted zone, empty for any.
+
+    eg: $ fab -R local aws_route53_fab.get_hosted_zone_id:"passbolt.example.com.ar.","us-east-1","public"
+    """
+    with settings(warn_only=False):
+        return route53_engine.get_hosted_zone_id(CREDENTIALS, record_set_name_arg, region_name_arg,
+                                                 zone_visibility_arg)
 
 
 @task
-def check_resources_record_sets(record_set_name_arg, hosted_zone_id_arg, region_name_arg='us-east-1'):
+def check_resources_record_sets(record_set_name_arg, hosted_zone_id_arg,
+                                region_name_arg='us-east-1', record_set_type_arg=''):
     """
-Lists the resource record sets in a specified hosted zone and check if record_set_name_arg exists.
+Checks if record_set_name_arg exists in a specified hosted zone.
 
     :param record_set_name_arg: (string) -- record set name argument eg: yoursubdomain.yourdomain.com
 
-    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
-     to list.
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets, or
+    '' | public | private to resolve it from the record name.
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.check_resources_record_sets:"profile company","passbolt.example.com.ar.",
-    "/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    :param record_set_type_arg: (string) -- optional record set type, eg: A | CNAME
 
+    eg: $ fab -R local aws_route53_fab.check_resources_record_sets:"passbolt.example.com.ar.",
+    "/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
+        return route53_engine.check_resources_record_sets(CREDENTIALS, record_set_name_arg, hosted_zone_id_arg,
+                                                          region_name_arg, record_set_type_arg)
 
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
 
-        hosted_zone_id = hosted_zone_id_arg
-        record_set_name = record_set_name_arg
+@task
+def create_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_comment_arg,
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 propagation_timeout_arg='300', record_set_options_arg=''):
+    """
+Creates a resource record set and waits for it to be INSYNC (see route53_engine.create_resources_record_sets).
 
-        try:
-            response = aws_dns.list_resource_record_sets(
-                HostedZoneId=hosted_zone_id,
-                # StartRecordName='string',
-                # StartRecordType='SOA' | 'A' | 'TXT' | 'NS' | 'CNAME' | 'MX' | 'NAPTR' | 'PTR' | 'SRV' | 'SPF' | 'AAAA'
-                #  | 'CAA',
-                # StartRecordIdentifier='string',
-                MaxItems='100'
-            )
+    :param record_set_name_arg: (string) -- record set name, eg: www.example.com.
 
-            resource_record_sets_name = ""
-            for resource_record_sets in response['ResourceRecordSets']:
+    :param record_set_value_arg: (string) -- record set value, eg: 192.0.2.44 or 192.0.2.44|192.0.2.45
 
-                resource_record_sets_name = resource_record_sets.get('Name')
+    :param record_set_comment_arg: (string) -- Record set comment
 
-                if resource_record_sets_name == record_set_name:
-                    print("")
-                    print("Route53 Rosource record sets for zone: " + hosted_zone_id)
-                    print('resource_record_sets_name: ' + str(resource_record_sets_name) + ' EXISTS!')
-                    return True
+    :param record_set_type_arg: (string) -- record set type: A | AAAA | CAA | CNAME | MX | NS | PTR | SRV | TXT ...
 
-            print("")
-            print("Route53 Rosource record sets for zone: " + hosted_zone_id)
-            print('resource_record_sets_name: ' + str(resource_record_sets_name) + ' does NOT exists!')
-            return False
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record set, or
+    '' | public | private to resolve it from the record name.
 
-        except Exception as error:
-            # print colored(error, 'red')
-            print("exception :" + str(error))
+    :param region_name_arg: (string) -- AWS account region
+
+    :param propagation_timeout_arg: (string) -- seconds to wait for the change to be INSYNC.
+
+    :param record_set_options_arg: (string) -- ';' separated key=value options: ttl, set_identifier, weight, region,
+    failover, multivalue_answer, health_check_id, alias_hosted_zone_id, alias_evaluate_target_health.
+
+    eg: $ fab -R local aws_route53_fab.create_resources_record_sets:"passbolt-test.binbash.com.ar.",
+    "35.190.149.186","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    """
+    with settings(warn_only=False):
+        return route53_engine.create_resources_record_sets(CREDENTIALS, record_set_name_arg, record_set_value_arg,
+                                                           record_set_comment_arg, record_set_type_arg,
+                                                           hosted_zone_id_arg, region_name_arg,
+                                                           record_set_ttl=RECORD_SET_TTL,
+                                                           propagation_timeout_arg=propagation_timeout_arg,
+                                                           record_set_options_arg=record_set_options_arg)
 
 
 @task
 def update_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_comment_arg,
-                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1'):
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 record_set_options_arg=''):
     """
-Updates a resource record set, which contains authoritative DNS information for a specified domain
-name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
-traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+Updates (UPSERT) an existing resource record set (see route53_engine.update_resources_record_sets).
 
-Use ChangeResourceRecordsSetsRequest to perform the following actions:
-UPSERT : If a resource record set does not already exist, AWS creates it.
-If a resource set does exist, Amazon Route 53 updates it with the values in the request.
+    :param record_set_name_arg: (string) -- record set name, eg: www.example.com.
 
-    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
-    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
-    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
-    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
-    (with a trailing dot) as identical.
+    :param record_set_value_arg: (string) -- new record set value, eg: 192.0.2.44 or 192.0.2.44|192.0.2.45
 
-    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
-    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+    :param record_set_comment_arg: (string) -- Record set comment
 
-    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
-    Note the following:
+    :param record_set_type_arg: (string) -- record set type: A | AAAA | CAA | CNAME | MX | NS | PTR | SRV | TXT ...
 
-    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
-    The * can't replace any of the middle labels, for example, marketing.*.example.com.
-    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
-    (ASCII 42), not as a wildcard.
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record set, or
+    '' | public | private to resolve it from the record name.
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_options_arg: (string) -- ';' separated key=value options: ttl, set_identifier, weight, region,
+    failover, multivalue_answer, health_check_id, alias_hosted_zone_id, alias_evaluate_target_health.
+
+    eg: $ fab -R local aws_route53_fab.update_resources_record_sets:"passbolt-test.company.com.ar.",
+    "34.203.224.136","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    """
+    with settings(warn_only=False):
+        return route53_engine.update_resources_record_sets(CREDENTIALS, record_set_name_arg, record_set_value_arg,
+                                                           record_set_comment_arg, record_set_type_arg,
+                                                           hosted_zone_id_arg, region_name_arg,
+                                                           record_set_ttl=RECORD_SET_TTL,
+                                                           record_set_options_arg=record_set_options_arg)
 
-    :param record_set_value_arg: (string) -- The current or new DNS record value, not to exceed 4,000 characters.
-    For descriptions about how to format Value for different record types, see Supported DNS Resource Record Types
-    in the Amazon Route 53 Developer Guide .
 
-    You can specify more than one value for all record types except CNAME and SOA .
-    Note: If you're creating an alias resource record set, omit Value
+@task
+def delete_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_comment_arg,
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 record_set_options_arg=''):
+    """
+Deletes an existing resource record set (see route53_engine.delete_resources_record_sets).
+
+    :param record_set_name_arg: (string) -- record set name, eg: www.example.com.
+
+    :param record_set_value_arg: (string) -- current record set value, eg: 192.0.2.44 or 192.0.2.44|192.0.2.45
 
     :param record_set_comment_arg: (string) -- Record set comment
 
-    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
-    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+    :param record_set_type_arg: (string) -- record set type: A | AAAA | CAA | CNAME | MX | NS | PTR | SRV | TXT ...
 
-    Valid values for basic resource record sets: A | CNAME.
-    NOTE: AWS support more types, however we do not for the moment.
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record set, or
+    '' | public | private to resolve it from the record name.
 
-    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
-     to list.
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_options_arg: (string) -- ';' separated key=value options: ttl, set_identifier, weight, region,
+    failover, multivalue_answer, health_check_id, alias_hosted_zone_id, alias_evaluate_target_health.
+
+    eg: $ fab -R local aws_route53_fab.delete_resources_record_sets:"passbolt.company.com.ar.",
+    "35.190.149.186","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    """
+    with settings(warn_only=False):
+        return route53_engine.delete_resources_record_sets(CREDENTIALS, record_set_name_arg, record_set_value_arg,
+                                                           record_set_comment_arg, record_set_type_arg,
+                                                           hosted_zone_id_arg, region_name_arg,
+                                                           record_set_ttl=RECORD_SET_TTL,
+                                                           record_set_options_arg=record_set_options_arg)
+
+
+@task
+def apply_resources_record_sets_changes(changes_file_arg, hosted_zone_id_arg,
+                                        record_set_comment_arg='', region_name_arg='us-east-1', changes_format_arg=''):
+    """
+Applies many record set changes from a JSON, YAML or CSV manifest in as few ChangeBatch requests as possible.
+
+    :param changes_file_arg: (string) -- path to a JSON, YAML or CSV changes manifest, or '-' to read it from stdin.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone the changes apply to, or '' | public | private
+    to resolve it from each record name.
+
+    :param record_set_comment_arg: (string) -- change batch comment
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.update_resources_record_sets:"profile company","passbolt-test.company.com.ar.",
-    "34.203.224.136","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    :param changes_format_arg: (string) -- json | yaml | csv, guessed from the file extension or content if omitted.
+
+    eg: $ fab -R local aws_route53_fab.apply_resources_record_sets_changes:"changes.json",
+    "/hostedzone/Z2WI7FSN6LUJNR","env spin-up records","us-east-1"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
-
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
-
-        region_name = str(region_name_arg)
-        hosted_zone_id = hosted_zone_id_arg
-        record_set_name = str(record_set_name_arg)
-        record_set_value = str(record_set_value_arg)
-        record_set_comment = str(record_set_comment_arg)
-        # 'Type': 'SOA' | 'A' | 'TXT' | 'NS' | 'CNAME' | 'MX' | 'NAPTR' | 'PTR' | 'SRV' | 'SPF' | 'AAAA' | 'CAA',
-        record_set_type = str(record_set_type_arg)
-
-        if (record_set_type == 'A' or record_set_type == 'CNAME') and \
-                check_resources_record_sets(record_set_name, hosted_zone_id_arg, region_name):
-            print("")
-            print("SUPPORTED RECORD TYPE and EXISTS")
-            print("")
-
-            try:
-                response = aws_dns.change_resource_record_sets(
-                    HostedZoneId=hosted_zone_id,
-                    ChangeBatch={
-                        'Comment': record_set_comment,
-                        'Changes': [
-                            {
-                                'Action': 'UPSERT',
-                                'ResourceRecordSet': {
-                                    'Name': record_set_name,
-                                    'Type': record_set_type,
-                                    'TTL': 60,
-                                    'ResourceRecords': [
-                                        {
-                                            'Value': record_set_value
-                                        },
-                                    ]
-                                }
-                            },
-                        ]
-                    }
-                )
-
-                print(response)
-                print('')
-                print('record set: ' + str(record_set_name) + ' SUCCESSFULLY UPDATED')
-                return True
-
-            except Exception as error:
-                # print colored(error, 'red')
-                print("exception :" + str(error))
-
-        else:
-            print("")
-            print("NOT SUPPORTED RECORD TYPE OR RECORD NAME DOES NOT EXISTS")
-            print("")
-            return False
+        return route53_engine.apply_resources_record_sets_changes(CREDENTIALS, changes_file_arg, hosted_zone_id_arg,
+                                                                  record_set_comment_arg, region_name_arg,
+                                                                  changes_format_arg)
 
 
 @task
-def create_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_comment_arg,
-                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1'):
+def reconcile_resources_record_sets(desired_state_file_arg, hosted_zone_id_arg, record_set_comment_arg='',
+                                    region_name_arg='us-east-1', desired_state_format_arg='', prune_arg='true',
+                                    dry_run_arg='false'):
     """
-Creates a resource record set, which contains authoritative DNS information for a specified domain
-name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
-traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+Makes a hosted zone match a desired state file with the minimal set of changes (see
+route53_engine.reconcile_resources_record_sets).
 
-Use ChangeResourceRecordsSetsRequest to perform the following actions:
-CREATE : Creates a resource record set that has the specified values.
+    :param desired_state_file_arg: (string) -- path to a JSON, YAML or CSV record sets manifest, or '-' for stdin.
 
-    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
-    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
-    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
-    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
-    (with a trailing dot) as identical.
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to reconcile, or '' | public | private to resolve it
+    from the first desired record name.
 
-    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
-    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+    :param record_set_comment_arg: (string) -- change batch comment
 
-    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
-    Note the following:
+    :param region_name_arg: (string) -- AWS account region
 
-    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
-    The * can't replace any of the middle labels, for example, marketing.*.example.com.
-    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
-    (ASCII 42), not as a wildcard.
+    :param desired_state_format_arg: (string) -- json | yaml | csv, guessed from the file extension or content if
+    omitted.
 
-    :param record_set_value_arg: (string) -- The current or new DNS record value, not to exceed 4,000 characters.
-    For descriptions about how to format Value for different record types, see Supported DNS Resource Record Types
-    in the Amazon Route 53 Developer Guide .
+    :param prune_arg: (string) -- true to delete the record sets missing from the desired state, false to keep them.
 
-    You can specify more than one value for all record types except CNAME and SOA .
-    Note: If you're creating an alias resource record set, omit Value
+    :param dry_run_arg: (string) -- true to print the changes without submitting them.
+
+    eg: $ fab -R local aws_route53_fab.reconcile_resources_record_sets:"zone.yml","/hostedzone/Z2WI7FSN6LUJNR",
+    "env records","us-east-1","","true","true"
+    """
+    with settings(warn_only=False):
+        return route53_engine.reconcile_resources_record_sets(CREDENTIALS, desired_state_file_arg, hosted_zone_id_arg,
+                                                              record_set_comment_arg, region_name_arg,
+                                                              desired_state_format_arg, prune_arg, dry_run_arg)
 
-    :param record_set_comment_arg: (string) -- Record set comment
 
-    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
-    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+@task
+def export_resources_record_sets(hosted_zone_id_arg, zonefile_arg='-', region_name_arg='us-east-1'):
+    """
+Exports a hosted zone to a BIND zonefile (see route53_engine.export_resources_record_sets).
 
-    Valid values for basic resource record sets: A | CNAME.
-    NOTE: AWS support more types, however we do not for the moment.
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to export, eg: /hostedzone/Z2WI7FSN6LUJNR
 
-    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
-     to list.
+    :param zonefile_arg: (string) -- path of the zonefile to write, or '-' for stdout.
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.create_resources_record_sets:"profile binbash","passbolt-test.binbash.com.ar.",
-    "35.190.149.186","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    eg: $ fab -R local aws_route53_fab.export_resources_record_sets:"/hostedzone/Z2WI7FSN6LUJNR","mydomain.com.zone",
+    "us-east-1"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
-
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
-
-        region_name = str(region_name_arg)
-        hosted_zone_id = hosted_zone_id_arg
-        record_set_name = str(record_set_name_arg)
-        record_set_value = str(record_set_value_arg)
-        record_set_comment = str(record_set_comment_arg)
-        # 'Type': 'SOA' | 'A' | 'TXT' | 'NS' | 'CNAME' | 'MX' | 'NAPTR' | 'PTR' | 'SRV' | 'SPF' | 'AAAA' | 'CAA',
-        record_set_type = str(record_set_type_arg)
-
-        if record_set_type == 'A' or record_set_type == 'CNAME' and \
-                check_resources_record_sets(record_set_name, hosted_zone_id_arg, region_name):
-            print("")
-            print("SUPPORTED RECORD TYPE and RECORD ALREADY EXISTS")
-            print("")
-
-        elif record_set_type == 'A' or record_set_type == 'CNAME':
-
-            print("")
-            print("SUPPORTED RECORD TYPE and RECORD WILL BE CREATED")
-            print("")
-
-            try:
-                response = aws_dns.change_resource_record_sets(
-                    HostedZoneId=hosted_zone_id,
-                    ChangeBatch={
-                        'Comment': record_set_comment,
-                        'Changes': [
-                            {
-                                'Action': 'CREATE',
-                                'ResourceRecordSet': {
-                                    'Name': record_set_name,
-                                    'Type': record_set_type,
-                                    'TTL': 60,
-                                    'ResourceRecords': [
-                                        {
-                                            'Value': record_set_value
-                                        },
-                                    ]
-                                }
-                            },
-                        ]
-                    }
-                )
-
-                print(response)
-
-                record_set_status = 'PENDING'
-                while record_set_status == 'PENDING':
-                    if check_resources_record_sets(record_set_name, hosted_zone_id_arg, region_name):
-                        record_set_status = 'INSYNC'
-
-                if record_set_status == 'INSYNC':
-                    print('')
-                    print('record set: ' + str(record_set_name) + ' SUCCESSFULLY CREATED')
-                    return True
-
-                else:
-                    print('record set: ' + str(record_set_name) + ' NOT CREATED')
-                    return False
-
-            except Exception as error:
-                # print colored(error, 'red')
-                print("exception :" + str(error))
-
-        else:
-            print("")
-            print("NOT SUPPORTED RECORD TYPE")
-            print("")
+        return route53_engine.export_resources_record_sets(CREDENTIALS, hosted_zone_id_arg, zonefile_arg,
+                                                           region_name_arg)
 
 
 @task
-def delete_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_comment_arg,
-                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1'):
+def import_resources_record_sets(zonefile_arg, hosted_zone_id_arg, record_set_comment_arg='',
+                                 region_name_arg='us-east-1', origin_arg='', propagation_timeout_arg='300'):
+    """
+Imports a BIND zonefile into a hosted zone (see route53_engine.import_resources_record_sets).
+
+    :param zonefile_arg: (string) -- path of the zonefile to read, or '-' for stdin.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to import into, eg: /hostedzone/Z2WI7FSN6LUJNR
+
+    :param record_set_comment_arg: (string) -- change batch comment
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param origin_arg: (string) -- origin of the relative names until a $ORIGIN directive, the zone name if omitted.
+
+    :param propagation_timeout_arg: (string) -- seconds to wait for the last change batch to be INSYNC, 0 to not wait.
+
+    eg: $ fab -R local aws_route53_fab.import_resources_record_sets:"mydomain.com.zone","/hostedzone/Z2WI7FSN6LUJNR",
+    "restore","us-east-1"
     """
-Delete a resource record set, which contains authoritative DNS information for a specified domain
-name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
-traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+    with settings(warn_only=False):
+        return route53_engine.import_resources_record_sets(CREDENTIALS, zonefile_arg, hosted_zone_id_arg,
+                                                           record_set_comment_arg, region_name_arg, origin_arg,
+                                                           propagation_timeout_arg)
 
-Use ChangeResourceRecordsSetsRequest to perform the following actions:
-DELETE : Deletes an existing resource record set that has the specified values.
 
-    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
-    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
-    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
-    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
-    (with a trailing dot) as identical.
+@task
+def verify_resources_record_sets(record_set_name_arg, record_set_value_arg, record_set_type_arg, hosted_zone_id_arg,
+                                 region_name_arg='us-east-1', nameservers_arg='', timeout_arg='60'):
+    """
+Waits until every authoritative name server of the hosted zone answers the expected values for a record set (see
+route53_engine.verify_resources_record_sets).
 
-    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
-    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+    :param record_set_name_arg: (string) -- record set name, eg: app.example.com.
 
-    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
-    Note the following:
+    :param record_set_value_arg: (string) -- expected values separated by '|', '*' for any value or '' to wait for
+    the record set to be gone (eg: after a delete).
 
-    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
-    The * can't replace any of the middle labels, for example, marketing.*.example.com.
-    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
-    (ASCII 42), not as a wildcard.
+    :param record_set_type_arg: (string) -- record set type, eg: A | CNAME | TXT
 
-    :param record_set_value_arg: (string) -- The current or new DNS record value, not to exceed 4,000 characters.
-    For descriptions about how to format Value for different record types, see Supported DNS Resource Record Types
-    in the Amazon Route 53 Developer Guide .
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the record set, or '' | public |
+    private to resolve it from record_set_name_arg.
 
-    You can specify more than one value for all record types except CNAME and SOA .
-    Note: If you're creating an alias resource record set, omit Value
+    :param region_name_arg: (string) -- AWS account region
 
-    :param record_set_comment_arg: (string) -- Record set comment
+    :param nameservers_arg: (string) -- comma separated name servers (host or host:port) to query instead of the
+    hosted zone ones, eg: the VPC resolver for a private hosted zone.
 
-    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
-    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+    :param timeout_arg: (string) -- seconds to wait before giving up.
 
-    Valid values for basic resource record sets: A | CNAME.
-    NOTE: AWS support more types, however we do not for the moment.
+    eg: $ fab -R local aws_route53_fab.verify_resources_record_sets:"jenkins.mydomain.com.","172.20.0.5","A",
+    "/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    """
+    with settings(warn_only=False):
+        return route53_engine.verify_resources_record_sets(CREDENTIALS, record_set_name_arg, record_set_value_arg,
+                                                           record_set_type_arg, hosted_zone_id_arg, region_name_arg,
+                                                           nameservers_arg, timeout_arg)
 
-    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
-     to list.
+
+@task
+def failover_resources_record_sets(selector_arg, target_value_arg, hosted_zone_id_arg='', record_set_comment_arg='',
+                                   region_name_arg='us-east-1', target_options_arg='', rollback_dir_arg='',
+                                   dry_run_arg='false'):
+    """
+Fails over every record set matching a selector to a target value or alias, one atomic change batch per hosted zone,
+and writes the rollback of each zone to a file (see route53_engine.failover_resources_record_sets).
+
+    :param selector_arg: (string) -- ';' separated criteria: name (regex), type, value (CIDR), alias (regex),
+    health_check, set_identifier, failover. Escape '=' and ',' with a backslash for fab.
+
+    :param target_value_arg: (string) -- target values separated by '|', or the alias target DNS name.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to fail over, or '' | public | private for every
+    hosted zone of the account.
+
+    :param record_set_comment_arg: (string) -- change batch comment
 
     :param region_name_arg: (string) -- AWS account region
 
-    eg: $ fab -R local aws_route53_fab.delete_resources_record_sets:"profile company","passbolt.company.com.ar.",
-    "35.190.149.186","passbolt test record","A","/hostedzone/Z2WI7FSN6LUJNR","us-east-1"
+    :param target_options_arg: (string) -- ';' separated key=value target options: ttl, alias_hosted_zone_id,
+    alias_evaluate_target_health.
+
+    :param rollback_dir_arg: (string) -- directory of the rollback files, ~/.cache/jenkins-dns/failover if omitted.
+
+    :param dry_run_arg: (string) -- true to print the changes without submitting them.
+
+    eg: $ fab -R local aws_route53_fab.failover_resources_record_sets:
+    "health_check\\=abcdef11-2222-3333-4444-555555fedcba","standby-elb-1.us-west-2.elb.amazonaws.com.",
+    "public","failover to us-west-2","us-east-1",
+    "alias_hosted_zone_id\\=Z1H1FL5HABSF5"
     """
     with settings(warn_only=False):
-        # from the [profile btr-tunubi] section of ~/.aws/credentials.
-        session = boto3.Session(region_name=region_name_arg)
-
-        print("Connecting to Route53")
-        aws_dns = session.client('route53')
-
-        region_name = str(region_name_arg)
-        hosted_zone_id = hosted_zone_id_arg
-        record_set_name = str(record_set_name_arg)
-        record_set_value = str(record_set_value_arg)
-        record_set_comment = str(record_set_comment_arg)
-        # 'Type': 'SOA' | 'A' | 'TXT' | 'NS' | 'CNAME' | 'MX' | 'NAPTR' | 'PTR' | 'SRV' | 'SPF' | 'AAAA' | 'CAA',
-        record_set_type = str(record_set_type_arg)
-
-        if (record_set_type == 'A' or record_set_type == 'CNAME') and \
-                check_resources_record_sets(record_set_name, hosted_zone_id_arg, region_name):
-            print("")
-            print("SUPPORTED RECORD TYPE and EXISTS it's going to be DELETED")
-            print("")
-
-            try:
-                response = aws_dns.change_resource_record_sets(
-                    HostedZoneId=hosted_zone_id,
-                    ChangeBatch={
-                        'Comment': record_set_comment,
-                        'Changes': [
-                            {
-                                'Action': 'DELETE',
-                                'ResourceRecordSet': {
-                                    'Name': record_set_name,
-                                    'Type': record_set_type,
-                                    'TTL': 60,
-                                    'ResourceRecords': [
-                                        {
-                                            'Value': record_set_value
-                                        },
-                                    ]
-                                }
-                            },
-                        ]
-                    }
-                )
-
-                print(response)
-                print('')
-                print('record set: ' + str(record_set_name) + ' SUCCESSFULLY DELETED')
-                return True
-
-            except Exception as error:
-                # print colored(error, 'red')
-                print("exception :" + str(error))
-
-        else:
-            print("")
-            print("NOT SUPPORTED RECORD TYPE OR RECORD NAME DOES NOT EXISTS NOT POSSIBLE TO DELETE")
-            print("")
-            return False
+        return route53_engine.failover_resources_record_sets(CREDENTIALS, selector_arg, target_value_arg,
+                                                             hosted_zone_id_arg, record_set_comment_arg,
+                                                             region_name_arg, target_options_arg, rollback_dir_arg,
+                                                             dry_run_arg)
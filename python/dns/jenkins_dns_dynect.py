@@ -1,25 +1,38 @@
-from dyn.tm.session import DynectSession
 from dyn.tm.zones import Zone
 
-from fabric.api import run, settings, env
+from fabric.api import settings, env
 from termcolor import colored
 
+from dynect_session import dynect_session, logout_dynect_session
+from machine_address import public_azure_address, docker_machine_address, resolve_addresses
+
 env.user = 'jenkins'
 env.roledefs = {
     'local': ['localhost'],
 }
 
+DYNECT_CUSTOMER_NAME = 'your-dynect-group'
+DYNECT_USER_NAME = 'your-dynect-username'
+DYNECT_ZONE_NAME = 'your-dynect-domain'
+
+# Separator of the machine names given to dynect_nodes, ',' being the fab arguments separator.
+MACHINE_NAMES_SEPARATOR = '|'
+
+# Addresses are resolved in process (see machine_address), not with nslookup or docker-machine over SSH.
+ADDRESS_RESOLVERS = {
+    'public_azure': public_azure_address,
+    'private': docker_machine_address,
+}
+
 
 def dynect_public_azure(machine_name, api_key, node_subdomain):
     with settings(warn_only=False):
-        client_address = run('nslookup ' + machine_name + '-lb.eastus.cloudapp.azure.com | grep "Address: ." |'
-                                                          ' cut -d\':\' -f2')
-        client_address.strip()
+        client_address = public_azure_address(machine_name)
         print(colored('IP Address: ' + client_address, 'red', attrs=['bold']))
 
-        DynectSession("your-dynect-group", "your-dynect-username", api_key)
+        dynect_session(DYNECT_CUSTOMER_NAME, DYNECT_USER_NAME, api_key)
 
-        my_zone = Zone('your-dynect-domain')
+        my_zone = Zone(DYNECT_ZONE_NAME)
         my_zone.add_record(machine_name + '.' + node_subdomain, 'A', client_address)
         my_zone.ttl = 30
 
@@ -34,12 +47,12 @@ def dynect_public_azure(machine_name, api_key, node_subdomain):
 
 def dynect_private(machine_name, api_key, node_subdomain):
     with settings(warn_only=False):
-        client_address = run('docker-machine ip ' + machine_name)
+        client_address = docker_machine_address(machine_name)
         print(colored('IP Address: ' + client_address, 'red', attrs=['bold']))
 
-        DynectSession("your-dynect-group", "your-dynect-username", api_key)
+        dynect_session(DYNECT_CUSTOMER_NAME, DYNECT_USER_NAME, api_key)
 
-        my_zone = Zone('your-dynect-domain')
+        my_zone = Zone(DYNECT_ZONE_NAME)
         my_zone.add_record(machine_name + '.' + node_subdomain, 'A', client_address)
         my_zone.ttl = 30
 
@@ -54,10 +67,91 @@ def dynect_private(machine_name, api_key, node_subdomain):
 
 def dynect_rm(machine_name, api_key, node_subdomain):
     with settings(warn_only=False):
-        DynectSession("your-dynect-group", "your-dynect-username", api_key)
-        my_zone = Zone('your-dynect-domain')
+        dynect_session(DYNECT_CUSTOMER_NAME, DYNECT_USER_NAME, api_key)
+        my_zone = Zone(DYNECT_ZONE_NAME)
         print(machine_name + '.' + node_subdomain)
         node = my_zone.get_node(machine_name + '.' + node_subdomain)
         print(colored('DELETING :' + machine_name + '.' + node_subdomain + ' and its Records', 'blue', attrs=['bold']))
         node.delete()
         my_zone.publish()
+
+
+def dynect_logout(api_key):
+    with settings(warn_only=False):
+        if logout_dynect_session(DYNECT_CUSTOMER_NAME, DYNECT_USER_NAME, api_key):
+            print(colored('Dynect session LOGGED OUT', 'blue', attrs=['bold']))
+        else:
+            print(colored('No Dynect session to log out', 'blue', attrs=['bold']))
+
+
+def dynect_nodes(machine_names, api_key, node_subdomain, address_source='private', action='add'):
+    """
+Adds (or removes) the A records of many machines with a single Dynect session and a single zone publish, instead of
+one log in and one publish per machine.
+
+    :param machine_names: (string) -- machine names separated by '|', eg: node-1|node-2|node-3
+
+    :param api_key: (string) -- Dynect user password or API key
+
+    :param node_subdomain: (string) -- subdomain of the machine records, eg: feeds
+
+    :param address_source: (string) -- private (docker-machine ip) | public_azure (Azure load balancer address)
+
+    :param action: (string) -- add | rm
+
+    eg: $ fab -R local dynect_nodes:"node-1|node-2|node-3","${dynectApiKey}","feeds","private","add"
+    """
+    with settings(warn_only=False):
+        machine_names = [machine_name.strip() for machine_name in str(machine_names).split(MACHINE_NAMES_SEPARATOR)
+                         if machine_name.strip()]
+        if action not in ('add', 'rm'):
+            raise ValueError('Unsupported action: ' + action + ', expected add or rm')
+        if address_source not in ADDRESS_RESOLVERS:
+            raise ValueError('Unsupported address_source: ' + str(address_source) + ', expected ' +
+                             ' or '.join(sorted(ADDRESS_RESOLVERS)))
+        # All the machines are resolved at once, before the session is opened.
+        addresses = resolve_addresses(machine_names, ADDRESS_RESOLVERS[address_source]) if action == 'add' else {}
+
+        dynect_session(DYNECT_CUSTOMER_NAME, DYNECT_USER_NAME, api_key)
+        my_zone = Zone(DYNECT_ZONE_NAME)
+
+        # Every change is staged on the zone and reported on its own, then published all at once.
+        results = []
+        for machine_name in machine_names:
+            node_name = machine_name + '.' + node_subdomain
+            client_address = ''
+            try:
+                if action == 'add':
+                    if isinstance(addresses[machine_name], Exception):
+                        raise addresses[machine_name]
+                    client_address = addresses[machine_name]
+                    my_zone.add_record(node_name, 'A', client_address)
+                else:
+                    my_zone.get_node(node_name).delete()
+                results.append((node_name, client_address, 'STAGED'))
+            except Exception as error:
+                # print colored(error, 'red')
+                results.append((node_name, client_address, 'FAILED: ' + str(error)))
+
+        staged = [result for result in results if result[2] == 'STAGED']
+        if staged:
+            if action == 'add':
+                my_zone.ttl = 30
+            try:
+                my_zone.publish()
+                status = 'PUBLISHED'
+            except Exception as error:
+                # print colored(error, 'red')
+                status = 'NOT PUBLISHED: ' + str(error)
+            results = [(node_name, client_address, status if result == 'STAGED' else result)
+                       for node_name, client_address, result in results]
+
+        print(colored('===========================================', 'red'))
+        for node_name, client_address, result in results:
+            print(colored(action + ' ' + node_name + ' A-Record IP: ' + client_address + ' ' + result,
+                          'red' if result != 'PUBLISHED' else 'blue', attrs=['bold']))
+        print(colored('===========================================', 'red'))
+
+        published = len([result for result in results if result[2] == 'PUBLISHED'])
+        print(colored(str(published) + ' of ' + str(len(results)) + ' records PUBLISHED', 'red', attrs=['bold']))
+        return published == len(results)
@@ -0,0 +1,83 @@
+"""
+In-process resolution of the IP address of machines, for the jenkins_dns_dynect.py tasks.
+
+Instead of running nslookup or docker-machine through Fabric (a shell and an SSH session to localhost per machine):
+
+    - public_azure_address resolves the Azure load balancer name of the machine with socket.getaddrinfo;
+    - docker_machine_address reads the address docker-machine stored in the machine config.json, under
+      MACHINE_STORAGE_PATH (~/.docker/machine by default, as for docker-machine itself), and only runs
+      `docker-machine ip` locally when the driver did not store one;
+    - resolve_addresses resolves many machines at once on a thread pool, getaddrinfo being a blocking call.
+"""
+
+import json
+import os
+import socket
+import subprocess
+from collections import OrderedDict
+
+MACHINE_STORAGE_PATH = os.environ.get('MACHINE_STORAGE_PATH',
+                                      os.path.join(os.path.expanduser('~'), '.docker', 'machine'))
+
+# Azure load balancer name of a machine, eg: node-1-lb.eastus.cloudapp.azure.com
+AZURE_LB_HOSTNAME_FORMAT = '{machine_name}-lb.eastus.cloudapp.azure.com'
+
+RESOLVE_MAX_WORKERS = 16
+
+
+def public_azure_address(machine_name):
+    """
+Returns the IPv4 address of the Azure load balancer of machine_name.
+
+    :raise socket.gaierror: if the name does not resolve.
+    """
+    hostname = AZURE_LB_HOSTNAME_FORMAT.format(machine_name=machine_name)
+    return socket.getaddrinfo(hostname, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
+
+def docker_machine_address(machine_name):
+    """
+Returns the IP address of a docker-machine machine, as `docker-machine ip` does.
+
+    :raise ValueError: if the machine does not exist or has no address.
+    """
+    config_path = os.path.join(MACHINE_STORAGE_PATH, 'machines', machine_name, 'config.json')
+    try:
+        with open(config_path) as config_file:
+            address = json.load(config_file).get('Driver', {}).get('IPAddress')
+    except (IOError, OSError):
+        raise ValueError('docker-machine ' + machine_name + ' not found in ' + MACHINE_STORAGE_PATH)
+
+    if not address:
+        # eg: drivers looking the address up at run time (virtualbox DHCP lease).
+        address = subprocess.check_output(['docker-machine', 'ip', machine_name]).decode('utf-8').strip()
+    if not address:
+        raise ValueError('docker-machine ' + machine_name + ' has no IP address')
+    return address
+
+
+def resolve_addresses(machine_names, resolve_address, max_workers=RESOLVE_MAX_WORKERS):
+    """
+Resolves the address of many machines concurrently.
+
+    :param machine_names: (list) -- machine names, eg: ['node-1', 'node-2']
+
+    :param resolve_address: (callable) -- resolver of one machine, eg: docker_machine_address
+
+    :param max_workers: (int) -- number of machines resolved at the same time.
+
+    :return: (OrderedDict) {machine name: address, or the exception raised resolving it}, in machine_names order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def resolve(machine_name):
+        try:
+            return resolve_address(machine_name)
+        except Exception as error:
+            return error
+
+    machine_names = list(machine_names)
+    if not machine_names:
+        return OrderedDict()
+    with ThreadPoolExecutor(max_workers=min(int(max_workers), len(machine_names))) as executor:
+        return OrderedDict(zip(machine_names, executor.map(resolve, machine_names)))
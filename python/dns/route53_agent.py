@@ -0,0 +1,310 @@
+"""
+Long running Route53 agent serving route53_engine tasks on a Unix socket.
+
+Every `fab -f jenkins_dns_aws_route53*.py` call pays for the Python, Fabric and boto3 imports and for a new botocore
+session before its first API call. The agent pays for them once: it keeps the route53 clients (route53_helpers), the
+credentials (route53_credentials) and the hosted zone index (route53_zone_index) warm across requests, and
+route53_agent_client.py forwards a task to it with nothing but the standard library, eg:
+
+    $ python route53_agent.py --idle-timeout 3600 &
+    $ python route53_agent_client.py --credentials instance-metadata check_resources_record_sets \\
+        "app.mydomain.com." "public" "us-east-1"
+
+Protocol: the client sends one JSON request line {"task": ..., "credentials": ..., "args": [...], "environment": {...}}
+and reads back one JSON response line {"ok": ..., "result": ..., "output": ..., "error_output": ...}, output and
+error_output being what the task printed to stdout and stderr. Requests are served by one thread each, so a create
+waiting for INSYNC does not hold the others.
+
+Credentials specs ('', chain, env, profiles...) and the module settings (ROUTE53_ZONE_CACHE_TTL,
+ROUTE53_WRITE_QUEUE_WINDOW...) depend on the environment, which the agent reads once, at start. A request carries the
+environment of the client (task_environment: AWS_*, ROUTE53_* and HOME) and the agent refuses it, with
+"environment_mismatch" set in the response, unless it matches its own: the client then runs the task in process, so a
+job exporting other AWS_* variables never acts with the credentials or settings of the agent.
+
+File arguments (TASK_PATH_ARGUMENTS) are resolved against the working directory of the agent, and its stdin is not the
+one of the client: the client makes them absolute (absolute_path_request) and runs the tasks reading stdin ('-', see
+reads_stdin) in process, and the agent refuses to run the latter.
+
+The socket is created with 0600 permissions: only the user running the agent (the Jenkins user) can use it.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+AGENT_SOCKET_PATH = os.environ.get('ROUTE53_AGENT_SOCKET',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'jenkins-dns',
+                                                'route53-agent.sock'))
+
+# Requests answered by the agent itself.
+AGENT_PING = 'ping'
+AGENT_SHUTDOWN = 'shutdown'
+
+# Environment variables a task depends on, see task_environment.
+TASK_ENVIRONMENT_PREFIXES = ('AWS_', 'ROUTE53_')
+TASK_ENVIRONMENT_NAMES = ('HOME',)
+
+# Index, in the task arguments (after the credentials), of the file arguments of the route53_engine tasks.
+TASK_PATH_ARGUMENTS = {
+    'apply_resources_record_sets_changes': 0,
+    'reconcile_resources_record_sets': 0,
+    'export_resources_record_sets': 1,
+    'import_resources_record_sets': 0,
+    'failover_resources_record_sets': 6,
+}
+# Tasks reading their file argument from stdin when it is '-' (export_resources_record_sets writes stdout instead).
+STDIN_TASKS = ('apply_resources_record_sets_changes', 'reconcile_resources_record_sets',
+               'import_resources_record_sets')
+
+_credentials_providers = {}
+_credentials_providers_lock = threading.Lock()
+
+
+class _ThreadOutput(object):
+    """
+sys.stdout and sys.stderr replacement sending what a thread prints to the buffer that thread registered, or to the
+real stream for threads without one, so concurrent tasks each get their own output back.
+    """
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def capture(self, buffer):
+        self._local.buffer = buffer
+
+    def release(self):
+        self._local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            return self._stream.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def task_environment(environ=None):
+    """
+Returns the environment variables the route53_engine tasks depend on: credentials (AWS_*, HOME for ~/.aws) and
+module settings (ROUTE53_*).
+    """
+    environ = os.environ if environ is None else environ
+    return dict((name, value) for name, value in environ.items()
+                if name.startswith(TASK_ENVIRONMENT_PREFIXES) or name in TASK_ENVIRONMENT_NAMES)
+
+
+def _path_argument(request):
+    # Returns (index, value) of the file argument of the request task, value being None when it is not given.
+    index = TASK_PATH_ARGUMENTS.get(request.get('task'))
+    args = request.get('args') or []
+    if index is None or index >= len(args):
+        return index, None
+    return index, str(args[index])
+
+
+def reads_stdin(request):
+    """
+Tells whether the request task reads stdin, ie: its file argument is '-'.
+    """
+    return request.get('task') in STDIN_TASKS and _path_argument(request)[1] == '-'
+
+
+def absolute_path_request(request, cwd=None):
+    """
+Returns a copy of request whose file argument, if any, is an absolute path, relative paths being resolved against cwd
+(the current working directory by default). '-' (stdin or stdout) and '' (default path) are left alone.
+    """
+    index, path = _path_argument(request)
+    if not path or path == '-':
+        return request
+
+    args = list(request['args'])
+    args[index] = os.path.join(cwd or os.getcwd(), os.path.expanduser(path))
+    return dict(request, args=args)
+
+
+def _credentials(credentials_spec):
+    # Providers are reused so instance metadata and assumed role credentials are only refreshed when they expire.
+    from route53_credentials import credentials_provider
+
+    credentials_spec = str(credentials_spec or '')
+    with _credentials_providers_lock:
+        provider = _credentials_providers.get(credentials_spec)
+        if provider is None:
+            provider = credentials_provider(credentials_spec)
+            _credentials_providers[credentials_spec] = provider
+    return provider
+
+
+def run_task(request):
+    """
+Runs the route53_engine task described by request in this process.
+
+    :param request: (dict) -- {"task": one of route53_engine.ENGINE_TASKS, "credentials":
+    route53_credentials.credentials_provider spec, "args": [task arguments after the credentials]}
+
+    :return: (dict) {"ok": True, "result": task return value} or {"ok": False, "error": message}
+    """
+    import route53_engine
+
+    task = str(request.get('task', ''))
+    if task not in route53_engine.ENGINE_TASKS:
+        return {'ok': False, 'error': 'Unsupported task: ' + task + ', expected one of ' +
+                ', '.join(route53_engine.ENGINE_TASKS)}
+
+    try:
+        result = getattr(route53_engine, task)(_credentials(request.get('credentials')), *request.get('args', []))
+        return {'ok': True, 'result': result}
+    except Exception as error:
+        # print colored(error, 'red')
+        return {'ok': False, 'error': str(error)}
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        self.server.last_request = time.monotonic()
+
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as error:
+            self._respond({'ok': False, 'error': 'Invalid request: ' + str(error)})
+            return
+
+        task = request.get('task')
+        if task == AGENT_PING:
+            self._respond({'ok': True, 'result': os.getpid()})
+            return
+        if task == AGENT_SHUTDOWN:
+            self._respond({'ok': True, 'result': True})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        if reads_stdin(request):
+            self._respond({'ok': False, 'error': 'The agent can not read the client stdin, run ' + str(task) +
+                           ' with a file argument or in process'})
+            return
+
+        if request.get('environment') != self.server.environment:
+            self._respond({'ok': False, 'environment_mismatch': True,
+                           'error': 'The request environment (AWS_*, ROUTE53_*, HOME) differs from the agent one'})
+            return
+
+        output, error_output = [], []
+        sys.stdout.capture(output)
+        sys.stderr.capture(error_output)
+        try:
+            response = run_task(request)
+        finally:
+            sys.stdout.release()
+            sys.stderr.release()
+        response['output'] = ''.join(output)
+        response['error_output'] = ''.join(error_output)
+        self._respond(response)
+
+    def _respond(self, response):
+        self.wfile.write((json.dumps(response, default=str) + '\n').encode('utf-8'))
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        self.last_request = time.monotonic()
+        self.environment = task_environment()
+        socketserver.UnixStreamServer.__init__(self, socket_path, _AgentRequestHandler)
+
+
+def _agent_running(socket_path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except (OSError, socket.error):
+        return False
+    finally:
+        probe.close()
+
+
+def _stop_when_idle(server, idle_timeout):
+    while True:
+        time.sleep(min(idle_timeout, 60))
+        if time.monotonic() - server.last_request >= idle_timeout:
+            server.shutdown()
+            return
+
+
+def serve(socket_path=AGENT_SOCKET_PATH, idle_timeout=0):
+    """
+Serves route53_engine tasks on socket_path until a shutdown request, an interrupt or idle_timeout seconds without
+requests (0 to never stop). A stale socket left by a killed agent is replaced; a live one is left alone.
+
+    :return: (bool) False if another agent already listens on socket_path.
+    """
+    if os.path.exists(socket_path):
+        if _agent_running(socket_path):
+            print('route53 agent already running on ' + socket_path)
+            return False
+        os.unlink(socket_path)
+
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, exist_ok=True)
+
+    # Warm up the imports the first request would otherwise pay for, boto3 included (the engine defers it).
+    import route53_engine  # noqa: F401
+    import boto3  # noqa: F401
+    import botocore.config  # noqa: F401
+
+    previous_umask = os.umask(0o177)
+    try:
+        server = AgentServer(socket_path)
+    finally:
+        os.umask(previous_umask)
+
+    if not isinstance(sys.stdout, _ThreadOutput):
+        sys.stdout = _ThreadOutput(sys.stdout)
+    if not isinstance(sys.stderr, _ThreadOutput):
+        sys.stderr = _ThreadOutput(sys.stderr)
+
+    if idle_timeout:
+        threading.Thread(target=_stop_when_idle, args=(server, float(idle_timeout)), daemon=True).start()
+
+    print('route53 agent listening on ' + socket_path + ', pid ' + str(os.getpid()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Route53 agent serving route53_engine tasks on a Unix socket.')
+    parser.add_argument('--socket', default=AGENT_SOCKET_PATH, help='Unix socket path (default: %(default)s)')
+    parser.add_argument('--idle-timeout', type=float, default=0,
+                        help='stop after this many seconds without requests, 0 to never stop (default: %(default)s)')
+    options = parser.parse_args(argv)
+    return 0 if serve(options.socket, options.idle_timeout) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
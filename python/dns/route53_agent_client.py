@@ -0,0 +1,90 @@
+"""
+Forwards a route53_engine task to the route53 agent (see route53_agent.py) and prints its output. Only the standard
+library is imported (route53_agent imports route53_engine lazily), so a call costs a Python start and a socket round
+trip instead of the Fabric and boto3 imports.
+
+Task arguments are the ones of the Fabric tasks, without the profile_name_arg that --credentials replaces, eg:
+
+    $ python route53_agent_client.py --credentials instance-metadata create_resources_record_sets \\
+        "jenkins.mydomain.com." "172.20.0.5" "jenkins record" "A" "public" "us-east-1"
+
+The exit status is 0 when the task returns a true value (or nothing, like the list tasks) and 1 otherwise. When no
+agent listens on the socket, or the agent runs with another environment (AWS_*, ROUTE53_*, HOME, see route53_agent),
+the task runs in this process, unless --no-fallback is given (exit status 2). Relative file arguments are resolved
+against the current directory before being forwarded, and tasks reading stdin ('-' file argument) always run in this
+process.
+"""
+
+import argparse
+import json
+import socket
+import sys
+
+import route53_agent
+from route53_agent import AGENT_SOCKET_PATH, AGENT_PING, AGENT_SHUTDOWN, task_environment, reads_stdin, \
+    absolute_path_request
+
+
+def call_agent(request, socket_path=AGENT_SOCKET_PATH):
+    """
+Sends one request to the agent and returns its response dict (see route53_agent for the protocol).
+
+    :raise OSError: when no agent listens on socket_path.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    finally:
+        client.close()
+
+    return json.loads(response.decode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a route53_engine task through the route53 agent.')
+    parser.add_argument('--socket', default=AGENT_SOCKET_PATH, help='agent Unix socket path (default: %(default)s)')
+    parser.add_argument('--credentials', default='',
+                        help="route53_credentials spec: '' | chain | env | instance-metadata | role:<arn> | "
+                             "profile:<name>")
+    parser.add_argument('--no-fallback', action='store_true',
+                        help='fail instead of running the task in this process when the agent is not running')
+    parser.add_argument('task', help='route53_engine task, or ping | shutdown')
+    parser.add_argument('args', nargs='*', help='task arguments')
+    options = parser.parse_args(argv)
+
+    request = absolute_path_request({'task': options.task, 'credentials': options.credentials, 'args': options.args,
+                                     'environment': task_environment()})
+    try:
+        if reads_stdin(request):
+            # The agent stdin is not this one: the task has to run here, --no-fallback or not.
+            response = route53_agent.run_task(request)
+        else:
+            response = call_agent(request, options.socket)
+        if response.get('environment_mismatch'):
+            raise OSError(response.get('error'))
+    except (OSError, socket.error) as error:
+        if options.no_fallback or options.task in (AGENT_PING, AGENT_SHUTDOWN):
+            print('route53 agent not available on ' + options.socket + ': ' + str(error), file=sys.stderr)
+            return 2
+        # In process, the task prints straight to this process stdout and stderr.
+        response = route53_agent.run_task(request)
+
+    sys.stdout.write(response.get('output', ''))
+    sys.stderr.write(response.get('error_output', ''))
+    if not response.get('ok'):
+        print('exception :' + str(response.get('error')), file=sys.stderr)
+        return 1
+    return 0 if response.get('result') is None or response.get('result') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+On-disk snapshot cache of Route53 hosted zones, shared by every process of a Jenkins agent.
+
+Snapshots are kept in a SQLite database (ROUTE53_ZONE_CACHE_PATH) and served without any API call while they are
+younger than ROUTE53_ZONE_CACHE_TTL seconds. Once expired, a snapshot is revalidated with a single cheap request
+(GetHostedZone ResourceRecordSetCount for record sets, GetHostedZoneCount for the hosted zones list), the way an ETag
+is: if the count did not change the snapshot is renewed for another TTL, otherwise it is fetched again.
+
+Record value changes (UPSERT) do not change ResourceRecordSetCount, so changes made from outside this module are only
+seen once the TTL expires; changes made through route53_engine invalidate the zone snapshot right away.
+
+The cache is disabled unless ROUTE53_ZONE_CACHE_TTL is set to a positive number of seconds, eg:
+
+    $ export ROUTE53_ZONE_CACHE_TTL=300
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from route53_helpers import iter_hosted_zones, iter_resource_record_sets, get_resource_record_set, \
+    normalize_record_name, RECORD_SETS_PAGE_SIZE
+
+ZONE_CACHE_TTL = float(os.environ.get('ROUTE53_ZONE_CACHE_TTL', '0'))
+ZONE_CACHE_PATH = os.environ.get('ROUTE53_ZONE_CACHE_PATH',
+                                 os.path.join(os.path.expanduser('~'), '.cache', 'jenkins-dns', 'route53.sqlite'))
+
+# Seconds a process waits for another one holding the SQLite write lock.
+ZONE_CACHE_LOCK_TIMEOUT = 30
+
+_ZONE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    hosted_zone_id TEXT PRIMARY KEY,
+    record_count INTEGER,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS record_sets (
+    hosted_zone_id TEXT,
+    position INTEGER,
+    name TEXT,
+    type TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS record_sets_lookup ON record_sets (hosted_zone_id, name, type);
+CREATE TABLE IF NOT EXISTS hosted_zone_lists (
+    cache_key TEXT PRIMARY KEY,
+    zone_count INTEGER,
+    fetched_at REAL,
+    data TEXT
+);
+"""
+
+
+def zone_cache_enabled():
+    return ZONE_CACHE_TTL > 0
+
+
+def _zone_key(hosted_zone_id):
+    return str(hosted_zone_id).replace('/hostedzone/', '')
+
+
+def _connect():
+    cache_dir = os.path.dirname(ZONE_CACHE_PATH)
+    if cache_dir and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # One short lived connection per call: sqlite3 connections can not be shared between threads.
+    conn = sqlite3.connect(ZONE_CACHE_PATH, timeout=ZONE_CACHE_LOCK_TIMEOUT)
+    conn.executescript(_ZONE_CACHE_SCHEMA)
+    return conn
+
+
+def _live_record_count(aws_dns, hosted_zone_id):
+    return aws_dns.get_hosted_zone(Id=hosted_zone_id)['HostedZone']['ResourceRecordSetCount']
+
+
+def _zone_snapshot_is_fresh(conn, aws_dns, hosted_zone_id):
+    zone_key = _zone_key(hosted_zone_id)
+    row = conn.execute('SELECT record_count, fetched_at FROM zones WHERE hosted_zone_id = ?', (zone_key,)).fetchone()
+    if row is None:
+        return False
+
+    record_count, fetched_at = row
+    if time.time() - fetched_at < ZONE_CACHE_TTL:
+        return True
+
+    if _live_record_count(aws_dns, hosted_zone_id) != record_count:
+        return False
+
+    with conn:
+        conn.execute('UPDATE zones SET fetched_at = ? WHERE hosted_zone_id = ?', (time.time(), zone_key))
+    return True
+
+
+def _refresh_zone_snapshot(conn, aws_dns, hosted_zone_id):
+    zone_key = _zone_key(hosted_zone_id)
+    # Read the count before listing, so a change made while listing makes the next revalidation fail.
+    record_count = _live_record_count(aws_dns, hosted_zone_id)
+
+    # Pages are written under a per-thread staging key in short transactions, so other processes are not locked out
+    # while a big zone is listed, and the snapshot is swapped in a single transaction at the end. Threads of the same
+    # process (eg: route53_agent requests) may refresh the same zone at the same time.
+    staging_key = zone_key + '#' + str(os.getpid()) + '.' + str(threading.get_ident())
+    page = []
+    with conn:
+        conn.execute('DELETE FROM record_sets WHERE hosted_zone_id = ?', (staging_key,))
+    for position, resource_record_sets in enumerate(iter_resource_record_sets(aws_dns, hosted_zone_id)):
+        page.append((staging_key, position, normalize_record_name(resource_record_sets['Name']),
+                     resource_record_sets['Type'], json.dumps(resource_record_sets, separators=(',', ':'))))
+        if len(page) >= int(RECORD_SETS_PAGE_SIZE):
+            with conn:
+                conn.executemany('INSERT INTO record_sets VALUES (?, ?, ?, ?, ?)', page)
+            page = []
+
+    with conn:
+        conn.executemany('INSERT INTO record_sets VALUES (?, ?, ?, ?, ?)', page)
+        conn.execute('DELETE FROM record_sets WHERE hosted_zone_id = ?', (zone_key,))
+        conn.execute('UPDATE record_sets SET hosted_zone_id = ? WHERE hosted_zone_id = ?', (zone_key, staging_key))
+        conn.execute('INSERT OR REPLACE INTO zones VALUES (?, ?, ?)', (zone_key, record_count, time.time()))
+
+
+def _ensure_zone_snapshot(conn, aws_dns, hosted_zone_id):
+    if not _zone_snapshot_is_fresh(conn, aws_dns, hosted_zone_id):
+        _refresh_zone_snapshot(conn, aws_dns, hosted_zone_id)
+
+
+def iter_zone_record_sets(aws_dns, hosted_zone_id):
+    """
+Iterates over the resource record sets of a hosted zone, from the local snapshot when the cache is enabled or
+straight from Route53 (see route53_helpers.iter_resource_record_sets) otherwise.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone, eg: /hostedzone/Z2WI7FSN6LUJNR
+
+    :return: generator of ResourceRecordSet dicts, in Route53 order.
+    """
+    if not zone_cache_enabled():
+        for resource_record_sets in iter_resource_record_sets(aws_dns, hosted_zone_id):
+            yield resource_record_sets
+        return
+
+    conn = _connect()
+    try:
+        _ensure_zone_snapshot(conn, aws_dns, hosted_zone_id)
+        # Fetched before yielding: an open SELECT holds the database read lock, which would block every writer (other
+        # refreshes, invalidate_zone) for as long as the caller takes to consume the generator.
+        rows = conn.execute('SELECT data FROM record_sets WHERE hosted_zone_id = ? ORDER BY position',
+                            (_zone_key(hosted_zone_id),)).fetchall()
+    finally:
+        conn.close()
+
+    for (data,) in rows:
+        yield json.loads(data)
+
+
+def lookup_resource_record_set(aws_dns, hosted_zone_id, record_set_name, record_set_type=None,
+                               record_set_identifier=None):
+    """
+Returns the record set named record_set_name (and of type record_set_type when given) with an indexed lookup on the
+local snapshot when the cache is enabled, or with a single seek request (see route53_helpers.get_resource_record_set)
+otherwise.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone, eg: /hostedzone/Z2WI7FSN6LUJNR
+
+    :param record_set_name: (string) -- record set name, eg: yoursubdomain.yourdomain.com.
+
+    :param record_set_type: (string) -- optional record set type, eg: A | CNAME
+
+    :param record_set_identifier: (string) -- optional SetIdentifier, for record sets with a routing policy.
+
+    :return: the matching ResourceRecordSet dict or None if it does not exist.
+    """
+    if not zone_cache_enabled():
+        return get_resource_record_set(aws_dns, hosted_zone_id, record_set_name, record_set_type,
+                                       record_set_identifier)
+
+    conn = _connect()
+    try:
+        _ensure_zone_snapshot(conn, aws_dns, hosted_zone_id)
+        query = 'SELECT data FROM record_sets WHERE hosted_zone_id = ? AND name = ?'
+        query_args = [_zone_key(hosted_zone_id), normalize_record_name(record_set_name)]
+        if record_set_type:
+            query += ' AND type = ?'
+            query_args.append(record_set_type)
+        # Record sets sharing name and type (routing policies) only differ by SetIdentifier, which is not indexed.
+        for (data,) in conn.execute(query + ' ORDER BY position', query_args):
+            resource_record_sets = json.loads(data)
+            if not record_set_identifier or resource_record_sets.get('SetIdentifier') == record_set_identifier:
+                return resource_record_sets
+        return None
+    finally:
+        conn.close()
+
+
+def iter_account_hosted_zones(aws_dns, cache_key):
+    """
+Iterates over the hosted zones of the account, from the local snapshot when the cache is enabled or straight from
+Route53 (see route53_helpers.iter_hosted_zones) otherwise. Expired snapshots are revalidated with GetHostedZoneCount.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param cache_key: (string) -- identifies the AWS account the client belongs to, eg: the credentials cache_key,
+    which for the default chain and environment variables providers is derived from the resolved access key: jobs of
+    different accounts sharing ROUTE53_ZONE_CACHE_PATH must not get each other's hosted zones.
+
+    :return: generator of HostedZone dicts.
+    """
+    if not zone_cache_enabled():
+        for hosted_zones in iter_hosted_zones(aws_dns):
+            yield hosted_zones
+        return
+
+    cache_key = str(cache_key)
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT zone_count, fetched_at, data FROM hosted_zone_lists WHERE cache_key = ?',
+                           (cache_key,)).fetchone()
+        hosted_zones = None
+        if row is not None:
+            zone_count, fetched_at, data = row
+            if time.time() - fetched_at < ZONE_CACHE_TTL:
+                hosted_zones = json.loads(data)
+            elif aws_dns.get_hosted_zone_count()['HostedZoneCount'] == zone_count:
+                with conn:
+                    conn.execute('UPDATE hosted_zone_lists SET fetched_at = ? WHERE cache_key = ?',
+                                 (time.time(), cache_key))
+                hosted_zones = json.loads(data)
+
+        if hosted_zones is None:
+            hosted_zones = list(iter_hosted_zones(aws_dns))
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO hosted_zone_lists VALUES (?, ?, ?, ?)',
+                             (cache_key, len(hosted_zones), time.time(),
+                              json.dumps(hosted_zones, separators=(',', ':'))))
+    finally:
+        conn.close()
+
+    for hosted_zone in hosted_zones:
+        yield hosted_zone
+
+
+def invalidate_zone(hosted_zone_id):
+    """
+Drops the local snapshot of a hosted zone, so the next read fetches it again. Called after every change submitted
+through route53_engine. Does nothing when the cache is disabled.
+
+    :param hosted_zone_id: (string) The ID of the hosted zone, eg: /hostedzone/Z2WI7FSN6LUJNR
+    """
+    if not zone_cache_enabled():
+        return
+
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('DELETE FROM zones WHERE hosted_zone_id = ?', (_zone_key(hosted_zone_id),))
+            conn.execute('DELETE FROM record_sets WHERE hosted_zone_id = ?', (_zone_key(hosted_zone_id),))
+    finally:
+        conn.close()
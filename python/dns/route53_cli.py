@@ -0,0 +1,79 @@
+"""
+Standalone command line entry point for the Route53 tasks, without Fabric.
+
+Every route53_engine.ENGINE_TASKS task is a sub command: its required arguments are positional, in the order of the
+Fabric tasks minus the profile that --credentials replaces, and its optional ones are --options named after the
+argument without the _arg suffix, eg:
+
+    $ python route53_cli.py --credentials instance-metadata create_resources_record_sets jenkins.mydomain.com. \\
+        172.20.0.5 "jenkins record" A public --region-name us-east-1 --record-set-ttl 60
+    $ python route53_cli.py --credentials "profile company" list_resources_record_sets /hostedzone/Z2WI7FSN6LUJNR \\
+        --output-format jsonl
+
+boto3 is only imported when a task makes its first AWS call (see route53_helpers.get_route53_client), so `--help` and
+argument errors return right away. The exit status is 0 when the task returns a true value (or nothing, like the list
+tasks) and 1 otherwise.
+"""
+
+import argparse
+import inspect
+import sys
+
+import route53_engine
+from route53_credentials import credentials_provider
+
+
+def _option_name(parameter_name):
+    if parameter_name.endswith('_arg'):
+        parameter_name = parameter_name[:-len('_arg')]
+    return parameter_name.replace('_', '-')
+
+
+def _summary(docstring):
+    # First sentence of the first paragraph, eg: "Lists the resource record sets in a specified hosted zone."
+    paragraph = ' '.join(docstring.split('\n\n', 1)[0].split())
+    return paragraph.split('. ', 1)[0].rstrip('.') + '.'
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Route53 tasks (see route53_engine), without Fabric.')
+    parser.add_argument('--credentials', default='',
+                        help="route53_credentials spec: '' | chain | env | instance-metadata | role:<arn> | "
+                             "profile:<name>")
+    tasks = parser.add_subparsers(dest='task', metavar='task')
+
+    for task in route53_engine.ENGINE_TASKS:
+        function = getattr(route53_engine, task)
+        docstring = inspect.getdoc(function) or ''
+        task_parser = tasks.add_parser(task, help=_summary(docstring), description=docstring,
+                                       formatter_class=argparse.RawDescriptionHelpFormatter)
+
+        # The first parameter is the credentials provider, built from --credentials.
+        for parameter in list(inspect.signature(function).parameters.values())[1:]:
+            if parameter.default is inspect.Parameter.empty:
+                task_parser.add_argument(parameter.name, metavar=_option_name(parameter.name).upper())
+            else:
+                value_type = type(parameter.default) if isinstance(parameter.default, (int, float)) else str
+                task_parser.add_argument('--' + _option_name(parameter.name), dest=parameter.name,
+                                         metavar=_option_name(parameter.name).upper(), default=parameter.default,
+                                         type=value_type, help='default: %(default)s')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if not options.task:
+        parser.print_help()
+        return 2
+
+    task_arguments = dict(vars(options))
+    credentials_spec = task_arguments.pop('credentials')
+    task = task_arguments.pop('task')
+
+    result = getattr(route53_engine, task)(credentials_provider(credentials_spec), **task_arguments)
+    return 0 if result is None or result else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+AWS credential providers for the Route53 engine.
+
+Every provider knows how to build a boto3 Session for a region and exposes a cache_key, so route53_helpers can cache
+one client per (credentials, region) in the current process. Providers backed by temporary credentials (instance
+metadata and assumed roles) keep them in memory until they are about to expire, instead of fetching them again for
+every task.
+
+    eg: credentials_provider('my-iam-profile')                                  -> ProfileCredentials
+        credentials_provider('instance-metadata')                               -> InstanceMetadataCredentials
+        credentials_provider('env')                                             -> EnvironmentCredentials
+        credentials_provider('role:arn:aws:iam::123456789012:role/route53-dns') -> AssumeRoleCredentials
+        credentials_provider('') or credentials_provider('chain')               -> DefaultCredentials
+        credentials_provider('profile:env')                                     -> ProfileCredentials
+
+The default chain and the environment variables can resolve to any account, so their cache_key is derived from the
+access key they resolve to: it must tell apart the accounts of two jobs sharing a Jenkins agent (see route53_cache).
+"""
+
+import hashlib
+import os
+import threading
+
+# boto3 and botocore are imported by the methods that use them, not here: importing them costs far more than the rest
+# of the module (see route53_cli.py), and listing or describing tasks must not pay for it.
+
+# Instance metadata (IMDS) requests are local and fast, fail quickly when not running on EC2.
+INSTANCE_METADATA_TIMEOUT = 1
+INSTANCE_METADATA_ATTEMPTS = 2
+
+ASSUME_ROLE_SESSION_NAME = 'jenkins-dns-route53'
+
+# Specs of the providers that are not profiles, a profile with one of these names is selected with profile:<name>.
+DEFAULT_CHAIN_SPEC = 'chain'
+PROFILE_SPEC_PREFIX = 'profile:'
+
+
+def _access_key_digest(access_key):
+    # Access key IDs are not secret, but there is no need to write them to the cache files either.
+    return hashlib.sha256(str(access_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+class CredentialProvider(object):
+    """
+Base credential provider. Subclasses either override session() or implement load_credentials() returning botocore
+Credentials (refreshable ones are refreshed by botocore before they expire).
+    """
+    cache_key = None
+
+    def load_credentials(self):
+        raise NotImplementedError
+
+    def session(self, region_name):
+        import boto3
+        import botocore.session
+
+        botocore_session = botocore.session.Session()
+        # botocore asks the 'credential_provider' component for credentials through its load_credentials() method.
+        botocore_session.register_component('credential_provider', self)
+        return boto3.Session(botocore_session=botocore_session, region_name=region_name)
+
+
+class DefaultCredentials(CredentialProvider):
+    """
+Default boto3 credentials chain: environment variables, shared credentials file, instance metadata, etc.
+The chain is resolved once per provider, the first time its cache_key or a session is needed.
+    """
+    def __init__(self):
+        self._botocore_session = None
+        self._botocore_session_lock = threading.Lock()
+
+    def _resolved_botocore_session(self):
+        import botocore.session
+
+        with self._botocore_session_lock:
+            if self._botocore_session is None:
+                self._botocore_session = botocore.session.Session()
+        return self._botocore_session
+
+    @property
+    def cache_key(self):
+        credentials = self._resolved_botocore_session().get_credentials()
+        return (DEFAULT_CHAIN_SPEC, _access_key_digest(credentials.access_key if credentials else ''))
+
+    def session(self, region_name):
+        import boto3
+        return boto3.Session(botocore_session=self._resolved_botocore_session(), region_name=region_name)
+
+
+class ProfileCredentials(CredentialProvider):
+    """
+Named profile from ~/.aws/credentials or ~/.aws/config.
+    """
+    def __init__(self, profile_name):
+        self.profile_name = str(profile_name)
+        self.cache_key = ('profile', self.profile_name)
+
+    def session(self, region_name):
+        import boto3
+        return boto3.Session(profile_name=self.profile_name, region_name=region_name)
+
+
+class EnvironmentCredentials(CredentialProvider):
+    """
+AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY and AWS_SESSION_TOKEN environment variables.
+    """
+    @property
+    def cache_key(self):
+        return ('env', _access_key_digest(os.environ.get('AWS_ACCESS_KEY_ID')))
+
+    def load_credentials(self):
+        from botocore.credentials import EnvProvider
+
+        credentials = EnvProvider().load()
+        if credentials is None:
+            raise RuntimeError('AWS credentials environment variables are not set')
+        return credentials
+
+
+class InstanceMetadataCredentials(CredentialProvider):
+    """
+EC2 instance profile credentials from the instance metadata service. They are fetched once per process and shared by
+every instance of this provider; botocore refreshes them from IMDS only when they are about to expire.
+    """
+    cache_key = ('instance-metadata',)
+
+    _credentials = None
+    _credentials_lock = threading.Lock()
+
+    def load_credentials(self):
+        from botocore.credentials import InstanceMetadataProvider
+        from botocore.utils import InstanceMetadataFetcher
+
+        with InstanceMetadataCredentials._credentials_lock:
+            if InstanceMetadataCredentials._credentials is None:
+                fetcher = InstanceMetadataFetcher(timeout=INSTANCE_METADATA_TIMEOUT,
+                                                  num_attempts=INSTANCE_METADATA_ATTEMPTS)
+                credentials = InstanceMetadataProvider(iam_role_fetcher=fetcher).load()
+                if credentials is None:
+                    raise RuntimeError('Unable to load EC2 instance profile credentials from instance metadata')
+                InstanceMetadataCredentials._credentials = credentials
+
+        return InstanceMetadataCredentials._credentials
+
+
+class AssumeRoleCredentials(CredentialProvider):
+    """
+Temporary credentials from sts:AssumeRole, requested with the source provider credentials (default chain if not
+given) and refreshed by botocore shortly before they expire.
+    """
+    def __init__(self, role_arn, source_credentials=None, session_name=ASSUME_ROLE_SESSION_NAME):
+        self.role_arn = str(role_arn)
+        self.source_credentials = source_credentials or DefaultCredentials()
+        self.session_name = session_name
+        # The role ARN names the account and the principal, whichever credentials assume it.
+        self.cache_key = ('role', self.role_arn)
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+
+    def _assume_role(self):
+        sts = self.source_credentials.session(None).client('sts')
+        response = sts.assume_role(RoleArn=self.role_arn, RoleSessionName=self.session_name)
+        return {
+            'access_key': response['Credentials']['AccessKeyId'],
+            'secret_key': response['Credentials']['SecretAccessKey'],
+            'token': response['Credentials']['SessionToken'],
+            'expiry_time': response['Credentials']['Expiration'].isoformat(),
+        }
+
+    def load_credentials(self):
+        from botocore.credentials import RefreshableCredentials
+
+        with self._credentials_lock:
+            if self._credentials is None:
+                self._credentials = RefreshableCredentials.create_from_metadata(
+                    metadata=self._assume_role(),
+                    refresh_using=self._assume_role,
+                    method='assume-role'
+                )
+
+        return self._credentials
+
+
+def credentials_provider(credentials_spec):
+    """
+Returns the credential provider described by credentials_spec, so Fabric tasks can select one with a plain string
+argument.
+
+    :param credentials_spec: (string) -- '' or 'chain' for the default chain, 'env' for environment variables,
+    'instance-metadata' for the EC2 instance profile, 'role:<role arn>' to assume a role with the default chain
+    credentials, or a profile name from ~/.aws/credentials, eg: default, profile:env (for a profile named like one of
+    the other specs).
+
+    :return: (CredentialProvider)
+    """
+    credentials_spec = str(credentials_spec or '')
+
+    if credentials_spec.startswith(PROFILE_SPEC_PREFIX):
+        return ProfileCredentials(credentials_spec[len(PROFILE_SPEC_PREFIX):])
+    if credentials_spec in ('', DEFAULT_CHAIN_SPEC):
+        return DefaultCredentials()
+    if credentials_spec == 'env':
+        return EnvironmentCredentials()
+    if credentials_spec == 'instance-metadata':
+        return InstanceMetadataCredentials()
+    if credentials_spec.startswith('role:'):
+        return AssumeRoleCredentials(credentials_spec[len('role:'):])
+    return ProfileCredentials(credentials_spec)
@@ -0,0 +1,1091 @@
+"""
+Route53 engine: the implementation behind the jenkins_dns_aws_route53*.py Fabric modules.
+
+Every function receives a route53_credentials provider as its first argument, so the IAM user profile and the EC2
+instance profile entry points are thin wrappers sharing the same code, and a performance fix only has to be made once.
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from route53_helpers import load_record_set_changes, load_record_sets, change_resource_record_sets_batched, \
+    wait_for_change, iter_resource_record_sets, get_resource_record_set, resource_record_set, split_record_set_values, \
+    normalize_record_name, get_route53_client, change_batch_size, DEFAULT_RECORD_SET_TTL, ROUTE53_REQUESTS_PER_SECOND, \
+    CHANGE_BATCH_MAX_RECORDS, CHANGE_BATCH_MAX_VALUE_CHARS
+from route53_cache import iter_account_hosted_zones, iter_zone_record_sets, lookup_resource_record_set, \
+    invalidate_zone, zone_cache_enabled
+from route53_zone_index import resolve_hosted_zone_id
+from route53_sweep import iter_account_record_sets, SWEEP_MAX_WORKERS
+from route53_reconcile import reconcile_changes, is_zone_apex_managed
+from route53_zonefile import iter_zonefile_record_sets, write_zonefile
+from route53_propagation import wait_for_propagation, PROPAGATION_TIMEOUT
+from route53_write_queue import submit_change, submit_change_batch
+from route53_failover import parse_failover_selector, failover_changes, write_rollback_file
+from route53_output import output_writer, status_stream, hosted_zone_row, record_set_row, OUTPUT_FORMAT_TEXT, \
+    OUTPUT_BUFFER_SIZE, \
+    HOSTED_ZONE_FIELDS, HOSTED_ZONE_TEXT_TITLE, HOSTED_ZONE_TEXT_LABELS, RECORD_SET_FIELDS, RECORD_SET_TEXT_TITLE, \
+    RECORD_SET_TEXT_LABELS
+
+# Tasks exposed by the Fabric modules, route53_cli.py and route53_agent.py, all taking a credentials provider first.
+ENGINE_TASKS = (
+    'list_hostedzones',
+    'list_resources_record_sets',
+    'list_all_resources_record_sets',
+    'get_hosted_zone_id',
+    'check_resources_record_sets',
+    'create_resources_record_sets',
+    'update_resources_record_sets',
+    'delete_resources_record_sets',
+    'apply_resources_record_sets_changes',
+    'reconcile_resources_record_sets',
+    'export_resources_record_sets',
+    'import_resources_record_sets',
+    'verify_resources_record_sets',
+    'failover_resources_record_sets',
+)
+
+
+def list_hostedzones(credentials, region_name_arg='us-east-1', output_format_arg=OUTPUT_FORMAT_TEXT):
+    """
+Retrieves a list of the public and private hosted zones that are associated with the current AWS account.
+The response includes a HostedZones child element for each hosted zone.
+
+Amazon Route 53 returns a maximum of 100 items in each response, every page is fetched. The list is served from the
+local zone cache when enabled (see route53_cache).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param output_format_arg: (string) -- text | jsonl | csv | table (see route53_output)
+    """
+    print("Connecting to Route53", file=status_stream(output_format_arg))
+    aws_dns = get_route53_client(credentials, region_name_arg)
+    try:
+        with output_writer(output_format_arg, HOSTED_ZONE_FIELDS, HOSTED_ZONE_TEXT_TITLE,
+                           HOSTED_ZONE_TEXT_LABELS) as writer:
+            for hosted_zones in iter_account_hosted_zones(aws_dns, credentials.cache_key):
+                writer.write(hosted_zone_row(hosted_zones))
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+
+
+def _record_sets_writer(output_format_arg):
+    return output_writer(output_format_arg, RECORD_SET_FIELDS, RECORD_SET_TEXT_TITLE, RECORD_SET_TEXT_LABELS)
+
+
+def list_resources_record_sets(credentials, hosted_zone_id_arg, region_name_arg='us-east-1',
+                               output_format_arg=OUTPUT_FORMAT_TEXT):
+    """
+Lists the resource record sets in a specified hosted zone, served from the local zone cache when enabled (see
+route53_cache).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list.
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param output_format_arg: (string) -- text | jsonl | csv | table (see route53_output)
+    """
+    print("Connecting to Route53", file=status_stream(output_format_arg))
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    hosted_zone_id = hosted_zone_id_arg
+
+    try:
+        with _record_sets_writer(output_format_arg) as writer:
+            for resource_record_sets in iter_zone_record_sets(aws_dns, hosted_zone_id):
+                writer.write(record_set_row(hosted_zone_id, resource_record_sets))
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+
+
+def list_all_resources_record_sets(credentials, region_name_arg='us-east-1', max_concurrency_arg=SWEEP_MAX_WORKERS,
+                                   requests_per_second_arg=ROUTE53_REQUESTS_PER_SECOND,
+                                   output_format_arg=OUTPUT_FORMAT_TEXT):
+    """
+Lists the resource record sets of every hosted zone of the AWS account. Hosted zones are fetched concurrently and
+printed as soon as each one completes, while a client side token bucket keeps the sweep under the Route53 API quota
+(see route53_sweep).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param max_concurrency_arg: (string) -- number of hosted zones fetched at the same time.
+
+    :param requests_per_second_arg: (string) -- Route53 API requests per second allowed to the sweep.
+
+    :param output_format_arg: (string) -- text | jsonl | csv | table (see route53_output)
+    """
+    print("Connecting to Route53", file=status_stream(output_format_arg))
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    try:
+        sweep_started = time.monotonic()
+        hosted_zones_count, resource_record_sets_count = 0, 0
+
+        with _record_sets_writer(output_format_arg) as writer:
+            for hosted_zone, zone_record_sets in iter_account_record_sets(aws_dns, credentials.cache_key,
+                                                                          int(max_concurrency_arg),
+                                                                          float(requests_per_second_arg)):
+                hosted_zones_count += 1
+                resource_record_sets_count += len(zone_record_sets)
+                for resource_record_sets in zone_record_sets:
+                    writer.write(record_set_row(hosted_zone['Id'], resource_record_sets))
+
+        print("", file=status_stream(output_format_arg))
+        print('hosted zones: ' + str(hosted_zones_count) + ', resource record sets: ' +
+              str(resource_record_sets_count) + ', listed in ' + '%.1f' % (time.monotonic() - sweep_started) + 's',
+              file=status_stream(output_format_arg))
+        return True
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+        return False
+
+
+def get_hosted_zone_id(credentials, record_set_name_arg, region_name_arg='us-east-1', zone_visibility_arg=''):
+    """
+Finds the hosted zone that record_set_name_arg belongs to, ie: the hosted zone with the longest matching name, using
+the in-process hosted zone index (see route53_zone_index).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) -- record set name argument eg: yoursubdomain.yourdomain.com
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param zone_visibility_arg: (string) -- public | private to prefer that kind of hosted zone, empty for any.
+
+    :return: (string) hosted zone ID, eg: /hostedzone/Z2WI7FSN6LUJNR, or None if no hosted zone matches.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_name = str(record_set_name_arg)
+
+    try:
+        hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, str(zone_visibility_arg),
+                                                record_set_name)
+
+        print("")
+        print('hostedzone_id for ' + record_set_name + ': ' + str(hosted_zone_id or 'NOT FOUND'))
+        return hosted_zone_id
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+
+
+def check_resources_record_sets(credentials, record_set_name_arg, hosted_zone_id_arg,
+                                region_name_arg='us-east-1', record_set_type_arg=''):
+    """
+Checks if record_set_name_arg exists in a specified hosted zone. The lookup seeks directly to the record set with
+StartRecordName/StartRecordType and MaxItems=1, so it costs a single API call regardless of the hosted zone size, or
+no API call at all when the local zone cache is enabled (see route53_cache).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) -- record set name argument eg: yoursubdomain.yourdomain.com
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list. Pass '', 'public' or 'private' to resolve it from record_set_name_arg (see route53_zone_index).
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_type_arg: (string) -- optional record set type, eg: A | CNAME. When omitted a record set of any
+    type named record_set_name_arg matches.
+
+    :raise botocore.exceptions.ClientError: when the lookup fails, eg: still throttled after the route53_retry retries,
+    so a failed lookup is never reported as a missing record.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_name = str(record_set_name_arg)
+    record_set_type = str(record_set_type_arg)
+
+    hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg, record_set_name)
+    if hosted_zone_id is None:
+        print("")
+        print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+        print("")
+        return False
+
+    try:
+        resource_record_sets = lookup_resource_record_set(aws_dns, hosted_zone_id, record_set_name,
+                                                          record_set_type)
+
+        if resource_record_sets is not None:
+            print("")
+            print("Route53 Rosource record sets for zone: " + hosted_zone_id)
+            print('resource_record_sets_name: ' + str(resource_record_sets.get('Name')) + ' EXISTS!')
+            return True
+
+        print("")
+        print("Route53 Rosource record sets for zone: " + hosted_zone_id)
+        print('resource_record_sets_name: ' + str(record_set_name) + ' does NOT exists!')
+        return False
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+        raise
+
+
+def _lookup_change_record_set(aws_dns, hosted_zone_id, resource_record_sets):
+    return lookup_resource_record_set(aws_dns, hosted_zone_id, resource_record_sets['Name'],
+                                      resource_record_sets['Type'], resource_record_sets.get('SetIdentifier'))
+
+
+def _record_set_values(resource_record_sets):
+    if 'AliasTarget' in resource_record_sets:
+        return [normalize_record_name(resource_record_sets['AliasTarget']['DNSName'])]
+    return sorted(record_values['Value'] for record_values in resource_record_sets.get('ResourceRecords', []))
+
+
+def _record_set_values_match(resource_record_sets, live_record_set):
+    return _record_set_values(resource_record_sets) == _record_set_values(live_record_set)
+
+
+def create_resources_record_sets(credentials, record_set_name_arg, record_set_value_arg, record_set_comment_arg,
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 record_set_ttl=DEFAULT_RECORD_SET_TTL, propagation_timeout_arg='300',
+                                 record_set_options_arg=''):
+    """
+Creates a resource record set, which contains authoritative DNS information for a specified domain
+name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
+traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+
+Use ChangeResourceRecordsSetsRequest to perform the following actions:
+CREATE : Creates a resource record set that has the specified values.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
+    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
+    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
+    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
+    (with a trailing dot) as identical.
+
+    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
+    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+
+    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
+    Note the following:
+
+    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
+    The * can't replace any of the middle labels, for example, marketing.*.example.com.
+    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
+    (ASCII 42), not as a wildcard.
+
+    :param record_set_value_arg: (string) -- The DNS record value, not to exceed 4,000 characters. For descriptions
+    about how to format Value for different record types, see Supported DNS Resource Record Types in the Amazon Route 53
+    Developer Guide . Several values are separated by '|', eg: 192.0.2.44|192.0.2.45
+
+    You can specify more than one value for all record types except CNAME and SOA .
+    Note: for an alias resource record set, pass the alias target DNS name, eg: my-elb-1.us-east-1.elb.amazonaws.com.
+
+    :param record_set_comment_arg: (string) -- Record set comment
+
+    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
+    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+
+    Valid values: A | AAAA | CAA | CNAME | DS | MX | NAPTR | NS | PTR | SOA | SPF | SRV | TXT
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list. Pass '', 'public' or 'private' to resolve it from record_set_name_arg (see route53_zone_index).
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_ttl: (int) -- record set TTL in seconds, unless set by the ttl option.
+
+    :param propagation_timeout_arg: (string) -- seconds to wait for the change to be INSYNC. The change status is
+    polled with GetChange using exponential backoff.
+
+    :param record_set_options_arg: (string) -- ';' separated key=value routing and alias options, eg:
+    ttl=60;set_identifier=blue;weight=10 or alias_hosted_zone_id=Z35SXDOTRQ7X7K;alias_evaluate_target_health=true.
+    Keys: ttl, set_identifier, weight, region (latency), failover, multivalue_answer, health_check_id,
+    alias_hosted_zone_id, alias_evaluate_target_health (see route53_helpers.resource_record_set).
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_name = str(record_set_name_arg)
+    record_set_comment = str(record_set_comment_arg)
+
+    try:
+        resource_record_sets = resource_record_set(record_set_name, record_set_type_arg, record_set_value_arg,
+                                                   record_set_ttl, record_set_options_arg)
+    except ValueError as error:
+        print("")
+        print("NOT SUPPORTED RECORD TYPE OR OPTIONS: " + str(error))
+        print("")
+        return False
+
+    hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg, record_set_name)
+    if hosted_zone_id is None:
+        print("")
+        print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+        print("")
+        return False
+
+    if _lookup_change_record_set(aws_dns, hosted_zone_id, resource_record_sets) is not None:
+        print("")
+        print("SUPPORTED RECORD " + record_set_name + " TYPE and RECORD ALREADY EXISTS")
+        print("")
+
+    else:
+
+        print("")
+        print("SUPPORTED RECORD TYPE and RECORD WILL BE CREATED")
+        print("")
+
+        try:
+            response = submit_change(aws_dns, hosted_zone_id, {
+                'Action': 'CREATE',
+                'ResourceRecordSet': resource_record_sets
+            }, record_set_comment, credentials.cache_key)
+
+            invalidate_zone(hosted_zone_id)
+            print(response)
+
+            propagation_seconds = wait_for_change(aws_dns, response['ChangeInfo']['Id'],
+                                                  timeout=float(propagation_timeout_arg))
+
+            print('')
+            print('record set: ' + str(record_set_name) + ' SUCCESSFULLY CREATED, INSYNC after ' +
+                  '%.1f' % propagation_seconds + 's')
+            return True
+
+        except TimeoutError as error:
+            print('record set: ' + str(record_set_name) + ' SUBMITTED but NOT INSYNC')
+            print("exception :" + str(error))
+            return False
+
+        except Exception as error:
+            # print colored(error, 'red')
+            print("exception :" + str(error))
+            return False
+
+
+def update_resources_record_sets(credentials, record_set_name_arg, record_set_value_arg, record_set_comment_arg,
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 record_set_ttl=DEFAULT_RECORD_SET_TTL, record_set_options_arg=''):
+    """
+Updates a resource record set, which contains authoritative DNS information for a specified domain
+name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
+traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+
+Use ChangeResourceRecordsSetsRequest to perform the following actions:
+UPSERT : If a resource record set does not already exist, AWS creates it.
+If a resource set does exist, Amazon Route 53 updates it with the values in the request.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
+    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
+    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
+    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
+    (with a trailing dot) as identical.
+
+    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
+    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+
+    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
+    Note the following:
+
+    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
+    The * can't replace any of the middle labels, for example, marketing.*.example.com.
+    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
+    (ASCII 42), not as a wildcard.
+
+    :param record_set_value_arg: (string) -- The DNS record value, not to exceed 4,000 characters. For descriptions
+    about how to format Value for different record types, see Supported DNS Resource Record Types in the Amazon Route 53
+    Developer Guide . Several values are separated by '|', eg: 192.0.2.44|192.0.2.45
+
+    You can specify more than one value for all record types except CNAME and SOA .
+    Note: for an alias resource record set, pass the alias target DNS name, eg: my-elb-1.us-east-1.elb.amazonaws.com.
+
+    :param record_set_comment_arg: (string) -- Record set comment
+
+    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
+    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+
+    Valid values: A | AAAA | CAA | CNAME | DS | MX | NAPTR | NS | PTR | SOA | SPF | SRV | TXT
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list. Pass '', 'public' or 'private' to resolve it from record_set_name_arg (see route53_zone_index).
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_ttl: (int) -- record set TTL in seconds, unless set by the ttl option.
+
+    :param record_set_options_arg: (string) -- ';' separated key=value routing and alias options, eg:
+    ttl=60;set_identifier=blue;weight=10 or alias_hosted_zone_id=Z35SXDOTRQ7X7K;alias_evaluate_target_health=true.
+    Keys: ttl, set_identifier, weight, region (latency), failover, multivalue_answer, health_check_id,
+    alias_hosted_zone_id, alias_evaluate_target_health (see route53_helpers.resource_record_set).
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_name = str(record_set_name_arg)
+    record_set_comment = str(record_set_comment_arg)
+
+    try:
+        resource_record_sets = resource_record_set(record_set_name, record_set_type_arg, record_set_value_arg,
+                                                   record_set_ttl, record_set_options_arg)
+    except ValueError as error:
+        print("")
+        print("NOT SUPPORTED RECORD TYPE OR OPTIONS: " + str(error))
+        print("")
+        return False
+
+    hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg, record_set_name)
+    if hosted_zone_id is None:
+        print("")
+        print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+        print("")
+        return False
+
+    if _lookup_change_record_set(aws_dns, hosted_zone_id, resource_record_sets) is not None:
+        print("")
+        print("SUPPORTED RECORD TYPE and EXISTS")
+        print("")
+
+        try:
+            response = submit_change(aws_dns, hosted_zone_id, {
+                'Action': 'UPSERT',
+                'ResourceRecordSet': resource_record_sets
+            }, record_set_comment, credentials.cache_key)
+
+            invalidate_zone(hosted_zone_id)
+            print(response)
+            print('')
+            print('record set: ' + str(record_set_name) + ' SUCCESSFULLY UPDATED')
+            return True
+
+        except Exception as error:
+            # print colored(error, 'red')
+            print("exception :" + str(error))
+            return False
+
+    else:
+        print("")
+        print("RECORD NAME DOES NOT EXISTS")
+        print("")
+        return False
+
+
+def delete_resources_record_sets(credentials, record_set_name_arg, record_set_value_arg, record_set_comment_arg,
+                                 record_set_type_arg, hosted_zone_id_arg, region_name_arg='us-east-1',
+                                 record_set_ttl=DEFAULT_RECORD_SET_TTL, record_set_options_arg=''):
+    """
+Delete a resource record set, which contains authoritative DNS information for a specified domain
+name or subdomain name. For example, you can use ChangeResourceRecordSets to create a resource record set that routes
+traffic for test.example.com to a web server that has an IP address of 192.0.2.44.
+
+Use ChangeResourceRecordsSetsRequest to perform the following actions:
+DELETE : Deletes an existing resource record set that has the specified values. The record set is read first and the
+DELETE is sent with the live element, so only name, type and, for routing policies, the set_identifier option are
+needed; when values are given they must match the live ones.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) --  The name of the domain you want to perform the action on.
+    Enter a fully qualified domain name, for example, www.example.com . You can optionally include a trailing dot.
+    If you omit the trailing dot, Amazon Route 53 still assumes that the domain name that you specify is fully
+    qualified. This means that Amazon Route 53 treats www.example.com (without a trailing dot) and www.example.com.
+    (with a trailing dot) as identical.
+
+    For information about how to specify characters other than a-z , 0-9 , and - (hyphen) and how to specify
+    internationalized domain names, see DNS Domain Name Format in the Amazon Route 53 Developer Guide .
+
+    You can use the asterisk (*) wildcard to replace the leftmost label in a domain name, for example, *.example.com .
+    Note the following:
+
+    The * must replace the entire label. For example, you can't specify *prod.example.com or prod*.example.com .
+    The * can't replace any of the middle labels, for example, marketing.*.example.com.
+    If you include * in any position other than the leftmost label in a domain name, DNS treats it as an * character
+    (ASCII 42), not as a wildcard.
+
+    :param record_set_value_arg: (string) -- The current DNS record value, optional, not to exceed 4,000 characters.
+    For descriptions about how to format Value for different record types, see Supported DNS Resource Record Types in
+    the Amazon Route 53 Developer Guide . Several values are separated by '|', eg: 192.0.2.44|192.0.2.45
+
+    You can specify more than one value for all record types except CNAME and SOA .
+    Note: for an alias resource record set, pass the alias target DNS name, eg: my-elb-1.us-east-1.elb.amazonaws.com.
+
+    :param record_set_comment_arg: (string) -- Record set comment
+
+    :param record_set_type_arg: (string) -- The DNS record type. For information about different record types and how
+    data is encoded for them, see Supported DNS Resource Record Types in the Amazon Route 53 Developer Guide .
+
+    Valid values: A | AAAA | CAA | CNAME | DS | MX | NAPTR | NS | PTR | SOA | SPF | SRV | TXT
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list. Pass '', 'public' or 'private' to resolve it from record_set_name_arg (see route53_zone_index).
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param record_set_ttl: (int) -- record set TTL in seconds, unless set by the ttl option.
+
+    :param record_set_options_arg: (string) -- ';' separated key=value routing and alias options, eg:
+    ttl=60;set_identifier=blue;weight=10 or alias_hosted_zone_id=Z35SXDOTRQ7X7K;alias_evaluate_target_health=true.
+    Keys: ttl, set_identifier, weight, region (latency), failover, multivalue_answer, health_check_id,
+    alias_hosted_zone_id, alias_evaluate_target_health (see route53_helpers.resource_record_set).
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_name = str(record_set_name_arg)
+    record_set_comment = str(record_set_comment_arg)
+
+    try:
+        resource_record_sets = resource_record_set(record_set_name, record_set_type_arg, record_set_value_arg,
+                                                   record_set_ttl, record_set_options_arg)
+    except ValueError as error:
+        print("")
+        print("NOT SUPPORTED RECORD TYPE OR OPTIONS: " + str(error))
+        print("")
+        return False
+
+    hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg, record_set_name)
+    if hosted_zone_id is None:
+        print("")
+        print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+        print("")
+        return False
+
+    # Read from Route53 and not from the zone cache: DELETE fails unless the element matches the live one exactly.
+    live_record_set = get_resource_record_set(aws_dns, hosted_zone_id, record_set_name, resource_record_sets['Type'],
+                                              resource_record_sets.get('SetIdentifier'))
+
+    if live_record_set is not None and split_record_set_values(record_set_value_arg) and \
+            not _record_set_values_match(resource_record_sets, live_record_set):
+        print("")
+        print("RECORD VALUE DOES NOT MATCH THE LIVE RECORD SET NOT POSSIBLE TO DELETE")
+        print("")
+        return False
+
+    elif live_record_set is not None:
+        print("")
+        print("SUPPORTED RECORD TYPE and EXISTS it's going to be DELETED")
+        print("")
+
+        try:
+            response = submit_change(aws_dns, hosted_zone_id, {
+                'Action': 'DELETE',
+                'ResourceRecordSet': live_record_set
+            }, record_set_comment, credentials.cache_key)
+
+            invalidate_zone(hosted_zone_id)
+            print(response)
+            print('')
+            print('record set: ' + str(record_set_name) + ' SUCCESSFULLY DELETED')
+            return True
+
+        except Exception as error:
+            # print colored(error, 'red')
+            print("exception :" + str(error))
+            return False
+
+    else:
+        print("")
+        print("RECORD NAME DOES NOT EXISTS NOT POSSIBLE TO DELETE")
+        print("")
+        return False
+
+
+def apply_resources_record_sets_changes(credentials, changes_file_arg, hosted_zone_id_arg,
+                                        record_set_comment_arg='', region_name_arg='us-east-1', changes_format_arg=''):
+    """
+Applies many resource record set changes read from a manifest file in a single call. Changes are packed
+into as few ChangeResourceRecordSets requests as the Route53 per request limits allow (1000 ResourceRecord elements
+and 32000 Value characters, UPSERT counted twice) and each request is applied atomically.
+
+Manifest entries hold action (CREATE | UPSERT | DELETE), name, type, value (or values) and an optional ttl, eg:
+
+    [{"action": "CREATE", "name": "app1.yourdomain.com.", "type": "A", "value": "172.20.0.5"},
+     {"action": "UPSERT", "name": "app2.yourdomain.com.", "type": "A", "values": ["172.20.0.6", "172.20.0.7"]}]
+
+A Route53 change batch document ({"Changes": [...]}) is accepted as well. CSV manifests need an
+"action,name,type,value[,ttl]" header.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param changes_file_arg: (string) -- path to a JSON, YAML or CSV changes manifest, or '-' to read it from stdin.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone the changes apply to. When empty, 'public' or
+    'private' every change goes to the hosted zone its record name belongs to (see route53_zone_index), so a manifest
+    may span several hosted zones.
+
+    :param record_set_comment_arg: (string) -- change batch comment
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param changes_format_arg: (string) -- json | yaml | csv, guessed from the file extension or content if omitted.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    record_set_comment = str(record_set_comment_arg)
+
+    try:
+        changes = load_record_set_changes(str(changes_file_arg), str(changes_format_arg))
+
+        changes_by_zone = OrderedDict()
+        for change in changes:
+            record_set_name = change['ResourceRecordSet']['Name']
+            hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg,
+                                                    record_set_name)
+            if hosted_zone_id is None:
+                print("")
+                print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+                print("")
+                return False
+            changes_by_zone.setdefault(hosted_zone_id, []).append(change)
+
+        changes_applied = 0
+        for hosted_zone_id, zone_changes in changes_by_zone.items():
+            print("")
+            print("Route53 changes loaded for zone " + hosted_zone_id + ": " + str(len(zone_changes)))
+
+            for batch, response in change_resource_record_sets_batched(aws_dns, hosted_zone_id, zone_changes,
+                                                                       record_set_comment):
+                changes_applied += len(batch)
+                invalidate_zone(hosted_zone_id)
+                print(response)
+                print('change batch: ' + str(len(batch)) + ' changes SUCCESSFULLY SUBMITTED')
+
+        print('')
+        print('record sets: ' + str(changes_applied) + ' of ' + str(len(changes)) + ' changes SUCCESSFULLY APPLIED')
+        return changes_applied == len(changes)
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+        return False
+
+
+def reconcile_resources_record_sets(credentials, desired_state_file_arg, hosted_zone_id_arg, record_set_comment_arg='',
+                                    region_name_arg='us-east-1', desired_state_format_arg='', prune_arg='true',
+                                    dry_run_arg='false'):
+    """
+Makes a hosted zone match a desired state file: the live record sets are listed in one paginated pass, diffed against
+the desired ones (see route53_reconcile) and only the CREATE, UPSERT and DELETE changes needed are submitted, packed
+in as few change batches as possible. A 2000 record zone with 3 changed records costs 7 ListResourceRecordSets pages,
+one GetHostedZone and one ChangeResourceRecordSets request.
+
+Desired state entries hold name, type, value (or values) and an optional ttl, or are full ResourceRecordSet elements
+(eg: for alias or weighted records), see route53_helpers.load_record_sets.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param desired_state_file_arg: (string) -- path to a JSON, YAML or CSV record sets manifest, or '-' for stdin.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to reconcile, or '' | public | private to resolve it
+    from the first desired record name.
+
+    :param record_set_comment_arg: (string) -- change batch comment
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param desired_state_format_arg: (string) -- json | yaml | csv, guessed from the file extension or content if
+    omitted.
+
+    :param prune_arg: (string) -- true to delete the record sets missing from the desired state (zone apex SOA and NS
+    excepted), false to only create and update.
+
+    :param dry_run_arg: (string) -- true to print the changes without submitting them.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    prune = str(prune_arg).lower() == 'true'
+    dry_run = str(dry_run_arg).lower() == 'true'
+
+    try:
+        desired_record_sets = load_record_sets(str(desired_state_file_arg), str(desired_state_format_arg))
+        if not desired_record_sets:
+            print("")
+            print("EMPTY DESIRED STATE, NOTHING TO RECONCILE")
+            print("")
+            return False
+
+        record_set_name = desired_record_sets[0]['Name']
+        hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg, record_set_name)
+        if hosted_zone_id is None:
+            print("")
+            print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+            print("")
+            return False
+
+        # Live state straight from Route53, not from the zone cache: a stale snapshot would yield a wrong diff.
+        zone_name = aws_dns.get_hosted_zone(Id=hosted_zone_id)['HostedZone']['Name']
+        changes = reconcile_changes(desired_record_sets, iter_resource_record_sets(aws_dns, hosted_zone_id),
+                                    zone_name, prune)
+
+        print("")
+        print("Route53 reconcile plan for zone " + hosted_zone_id + ": " + str(len(changes)) + " changes")
+        for change in changes:
+            print(change['Action'] + ' ' + change['ResourceRecordSet']['Name'] + ' ' +
+                  change['ResourceRecordSet']['Type'])
+
+        if dry_run or not changes:
+            return True
+
+        changes_applied = 0
+        for batch, response in change_resource_record_sets_batched(aws_dns, hosted_zone_id, changes,
+                                                                   str(record_set_comment_arg)):
+            changes_applied += len(batch)
+            invalidate_zone(hosted_zone_id)
+            print(response)
+            print('change batch: ' + str(len(batch)) + ' changes SUCCESSFULLY SUBMITTED')
+
+        print('')
+        print('record sets: ' + str(changes_applied) + ' of ' + str(len(changes)) + ' changes SUCCESSFULLY APPLIED')
+        return changes_applied == len(changes)
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+        return False
+
+
+def export_resources_record_sets(credentials, hosted_zone_id_arg, zonefile_arg='-', region_name_arg='us-east-1'):
+    """
+Exports a hosted zone to a BIND zonefile, eg: as a backup or to move it to another DNS provider. Record sets are
+written as the ListResourceRecordSets pages come in, so exporting a zone of any size uses constant memory. Alias and
+routing policy record sets are written as ;route53 comment lines, restored by import_resources_record_sets (see
+route53_zonefile).
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to export, eg: /hostedzone/Z2WI7FSN6LUJNR
+
+    :param zonefile_arg: (string) -- path of the zonefile to write, or '-' for stdout.
+
+    :param region_name_arg: (string) -- AWS account region
+    """
+    zonefile = str(zonefile_arg)
+    # Status lines go to stderr when the zonefile is written to stdout.
+    status = sys.stderr if zonefile == '-' else sys.stdout
+
+    print("Connecting to Route53", file=status)
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    try:
+        zone_name = aws_dns.get_hosted_zone(Id=hosted_zone_id_arg)['HostedZone']['Name']
+        record_sets = iter_resource_record_sets(aws_dns, hosted_zone_id_arg)
+
+        if zonefile == '-':
+            records, pragmas = write_zonefile(record_sets, zone_name, sys.stdout)
+            sys.stdout.flush()
+        else:
+            with open(zonefile, 'w', buffering=OUTPUT_BUFFER_SIZE) as stream:
+                records, pragmas = write_zonefile(record_sets, zone_name, stream)
+
+        print('zone ' + zone_name + ': ' + str(records + pragmas) + ' record sets SUCCESSFULLY EXPORTED (' +
+              str(pragmas) + ' alias or routing policy record sets as ;route53 lines)', file=status)
+        return True
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error), file=status)
+        return False
+
+
+def import_resources_record_sets(credentials, zonefile_arg, hosted_zone_id_arg, record_set_comment_arg='',
+                                 region_name_arg='us-east-1', origin_arg='', propagation_timeout_arg='300'):
+    """
+Imports a BIND zonefile into a hosted zone, eg: to restore a backup made by export_resources_record_sets or to
+migrate a zone. The zonefile is parsed line by line and its record sets are UPSERTed in change batches as they are
+parsed (see route53_zonefile), so tens of thousands of records are restored with a few dozen requests and without
+loading the file in memory. The zone apex SOA and NS record sets, managed by Route53, are left alone, and record
+types Route53 does not support are skipped.
+
+The whole zonefile is parsed once before the first change batch is submitted (stdin is spooled to a temporary file
+for it), so a syntax error, a record out of the zone or non contiguous records fail the import before any change.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param zonefile_arg: (string) -- path of the zonefile to read, or '-' for stdin.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to import into, eg: /hostedzone/Z2WI7FSN6LUJNR
+
+    :param record_set_comment_arg: (string) -- change batch comment
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param origin_arg: (string) -- origin of the relative names until a $ORIGIN directive, the zone name if omitted.
+
+    :param propagation_timeout_arg: (string) -- seconds to wait for the last change batch to be INSYNC, 0 to not wait.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    zonefile = str(zonefile_arg)
+    skipped = {}
+    changes_applied = 0
+
+    try:
+        zone_name = normalize_record_name(aws_dns.get_hosted_zone(Id=hosted_zone_id_arg)['HostedZone']['Name'])
+
+        def zonefile_changes(stream):
+            for resource_record_sets in iter_zonefile_record_sets(stream, str(origin_arg) or zone_name,
+                                                                  skipped=skipped):
+                record_set_name = normalize_record_name(resource_record_sets['Name'])
+                if record_set_name != zone_name and not record_set_name.endswith('.' + zone_name):
+                    raise ValueError('record ' + record_set_name + ' is not in zone ' + zone_name)
+                if is_zone_apex_managed(resource_record_sets, zone_name):
+                    skipped['apex ' + resource_record_sets['Type']] = 1
+                    continue
+                yield {'Action': 'UPSERT', 'ResourceRecordSet': resource_record_sets}
+
+        response = None
+        if zonefile == '-':
+            stream = tempfile.TemporaryFile('w+')
+            shutil.copyfileobj(sys.stdin, stream, OUTPUT_BUFFER_SIZE)
+            stream.seek(0)
+        else:
+            stream = open(zonefile, buffering=OUTPUT_BUFFER_SIZE)
+        try:
+            for _ in zonefile_changes(stream):
+                pass
+            stream.seek(0)
+            skipped.clear()
+
+            for batch, response in change_resource_record_sets_batched(aws_dns, hosted_zone_id_arg,
+                                                                       zonefile_changes(stream),
+                                                                       str(record_set_comment_arg)):
+                changes_applied += len(batch)
+                print('change batch: ' + str(len(batch)) + ' changes SUCCESSFULLY SUBMITTED, ' +
+                      response['ChangeInfo']['Id'])
+        finally:
+            invalidate_zone(hosted_zone_id_arg)
+            stream.close()
+
+        if skipped:
+            print('skipped: ' + ', '.join(key + ' x' + str(count) for key, count in sorted(skipped.items())))
+
+        if response is not None and float(propagation_timeout_arg) > 0:
+            propagation_seconds = wait_for_change(aws_dns, response['ChangeInfo']['Id'],
+                                                  timeout=float(propagation_timeout_arg))
+            print('last change batch INSYNC after ' + '%.1f' % propagation_seconds + 's')
+
+        print('')
+        print('zone ' + zone_name + ': ' + str(changes_applied) + ' record sets SUCCESSFULLY IMPORTED')
+        return True
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print('zone import stopped after ' + str(changes_applied) + ' record sets')
+        print("exception :" + str(error))
+        return False
+
+
+def verify_resources_record_sets(credentials, record_set_name_arg, record_set_value_arg, record_set_type_arg,
+                                 hosted_zone_id_arg, region_name_arg='us-east-1', nameservers_arg='',
+                                 timeout_arg=PROPAGATION_TIMEOUT):
+    """
+Waits until every authoritative name server of the hosted zone answers record_set_value_arg for the record set, or
+no record set at all after a delete. All the servers are queried at once over UDP and the task returns as soon as the
+last one is in sync (see route53_propagation), instead of sleeping a fixed time and asking a caching resolver.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param record_set_name_arg: (string) -- record set name, eg: app.example.com.
+
+    :param record_set_value_arg: (string) -- expected values separated by '|', eg: 192.0.2.44|192.0.2.45. Pass '*'
+    to accept any value (eg: alias or weighted record sets) or '' to wait for the record set to be gone.
+
+    :param record_set_type_arg: (string) -- record set type, eg: A | CNAME | TXT
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone that contains the record set, or '' | public |
+    private to resolve it from record_set_name_arg. Its DelegationSet name servers are queried.
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param nameservers_arg: (string) -- comma separated name servers to query instead, as host or host:port, eg: the
+    Route53 resolver of a VPC for a private hosted zone, or 127.0.0.1:5353 for a local test server. No AWS call is
+    made when given.
+
+    :param timeout_arg: (string) -- seconds to wait before giving up.
+    """
+    record_set_name = normalize_record_name(record_set_name_arg)
+    record_set_type = str(record_set_type_arg).upper()
+    record_set_value = str(record_set_value_arg)
+
+    if record_set_value == '*':
+        expected_values = None
+    else:
+        expected_values = split_record_set_values(record_set_value) if record_set_value else []
+
+    try:
+        nameservers = [nameserver for nameserver in str(nameservers_arg).split(',') if nameserver.strip()]
+        if not nameservers:
+            print("Connecting to Route53")
+            aws_dns = get_route53_client(credentials, region_name_arg)
+            hosted_zone_id = resolve_hosted_zone_id(aws_dns, credentials.cache_key, hosted_zone_id_arg,
+                                                    record_set_name)
+            if hosted_zone_id is None:
+                print("")
+                print("HOSTED ZONE NOT FOUND FOR RECORD " + record_set_name)
+                print("")
+                return False
+            nameservers = aws_dns.get_hosted_zone(Id=hosted_zone_id).get('DelegationSet', {}).get('NameServers', [])
+            if not nameservers:
+                print("")
+                print("NO NAME SERVERS FOR HOSTED ZONE " + hosted_zone_id + ", PASS THEM AS nameservers_arg")
+                print("")
+                return False
+
+        in_sync = wait_for_propagation(record_set_name, record_set_type, expected_values, nameservers,
+                                       timeout=float(timeout_arg))
+
+        for nameserver, seconds in sorted(in_sync.items(), key=lambda item: item[1]):
+            print(nameserver + ': in sync after ' + '%.2f' % seconds + 's')
+        print('')
+        print('record set: ' + record_set_name + ' ' + record_set_type + ' SUCCESSFULLY PROPAGATED to ' +
+              str(len(in_sync)) + ' name servers')
+        return True
+
+    except TimeoutError as error:
+        print('record set: ' + record_set_name + ' ' + record_set_type + ' NOT PROPAGATED')
+        print("exception :" + str(error))
+        return False
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print("exception :" + str(error))
+        return False
+
+
+def failover_resources_record_sets(credentials, selector_arg, target_value_arg, hosted_zone_id_arg='',
+                                   record_set_comment_arg='', region_name_arg='us-east-1', target_options_arg='',
+                                   rollback_dir_arg='', dry_run_arg='false'):
+    """
+Fails over every record set matching a selector to a target value or alias, eg: all the A records of a degraded
+region to the standby load balancer. The hosted zones are selected from the zone snapshots (see route53_cache), then
+the changes and the rollback of each one are planned from its live record sets, and every plan is checked against the
+ChangeBatch limits before any zone is changed. Each hosted zone is rewritten with a single, atomic
+ChangeResourceRecordSets request (under the write queue zone lock, see route53_write_queue): its record sets all move
+or none does. Before that, the changes restoring the zone are written to a rollback file, replayed with
+apply_resources_record_sets_changes.
+
+Selected record sets keep their routing policy and health check, only their values (or alias target) change. Record
+sets created by a traffic policy and the zone apex SOA and NS are never selected. See route53_failover for the
+selector syntax.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param selector_arg: (string) -- ';' separated criteria, eg: name=^api\\.;value=10.1.0.0/16 | health_check=<id> |
+    alias=us-east-1\\.elb\\.amazonaws\\.com | set_identifier=blue | failover=PRIMARY | type=A
+
+    :param target_value_arg: (string) -- target values separated by '|', eg: 192.0.2.10|192.0.2.11, or the DNS name of
+    the alias target when target_options_arg holds alias_hosted_zone_id.
+
+    :param hosted_zone_id_arg: (string) The ID of the hosted zone to fail over, or '' | public | private for every
+    hosted zone of the account (of that kind).
+
+    :param record_set_comment_arg: (string) -- change batch comment
+
+    :param region_name_arg: (string) -- AWS account region
+
+    :param target_options_arg: (string) -- ttl, alias_hosted_zone_id and alias_evaluate_target_health options of the
+    target, eg: ttl=30 or alias_hosted_zone_id=Z35SXDOTRQ7X7K;alias_evaluate_target_health=true
+
+    :param rollback_dir_arg: (string) -- directory of the rollback files, ~/.cache/jenkins-dns/failover if omitted.
+
+    :param dry_run_arg: (string) -- true to print the changes without submitting them or writing rollback files.
+    """
+    print("Connecting to Route53")
+    aws_dns = get_route53_client(credentials, region_name_arg)
+
+    dry_run = str(dry_run_arg).lower() == 'true'
+    hosted_zone_id_arg = str(hosted_zone_id_arg)
+    failed_over, rollback_files = 0, []
+
+    try:
+        criteria = parse_failover_selector(selector_arg)
+
+        if hosted_zone_id_arg and hosted_zone_id_arg not in ('public', 'private'):
+            hosted_zones = [aws_dns.get_hosted_zone(Id=hosted_zone_id_arg)['HostedZone']]
+        else:
+            hosted_zones = [hosted_zone for hosted_zone in iter_account_hosted_zones(aws_dns, credentials.cache_key)
+                            if not hosted_zone_id_arg or hosted_zone_id_arg ==
+                            ('private' if hosted_zone.get('Config', {}).get('PrivateZone') else 'public')]
+
+        # Every zone is planned before any is changed, so an invalid target or a zone too big for one ChangeBatch fails
+        # the task before the first change.
+        plans = []
+        for hosted_zone in hosted_zones:
+            changes, rollback_changes = failover_changes(iter_zone_record_sets(aws_dns, hosted_zone['Id']),
+                                                         hosted_zone['Name'], criteria, target_value_arg,
+                                                         target_options_arg)
+            if changes and zone_cache_enabled():
+                # The snapshot may be stale: the rollback file must restore the record sets as they are now.
+                changes, rollback_changes = failover_changes(iter_resource_record_sets(aws_dns, hosted_zone['Id']),
+                                                             hosted_zone['Name'], criteria, target_value_arg,
+                                                             target_options_arg)
+            if not changes:
+                continue
+
+            records, chars = change_batch_size(changes)
+            if records > CHANGE_BATCH_MAX_RECORDS or chars > CHANGE_BATCH_MAX_VALUE_CHARS:
+                raise ValueError('zone ' + hosted_zone['Name'] + ': ' + str(len(changes)) + ' record sets (' +
+                                 str(records) + ' ResourceRecord elements, ' + str(chars) + ' value characters) '
+                                 'exceed the ChangeBatch limits (' + str(CHANGE_BATCH_MAX_RECORDS) + ', ' +
+                                 str(CHANGE_BATCH_MAX_VALUE_CHARS) + '), narrow the selector. No zone was changed')
+            plans.append((hosted_zone, changes, rollback_changes))
+
+        print("")
+        print("Route53 failover plan: " + str(sum(len(plan[1]) for plan in plans)) + " record sets in " +
+              str(len(plans)) + " of " + str(len(hosted_zones)) + " hosted zones")
+        for hosted_zone, changes, _ in plans:
+            for change in changes:
+                print(hosted_zone['Id'] + ' ' + change['ResourceRecordSet']['Name'] + ' ' +
+                      change['ResourceRecordSet']['Type'] + ' ' +
+                      change['ResourceRecordSet'].get('SetIdentifier', ''))
+
+        if dry_run:
+            return True
+
+        for hosted_zone, changes, rollback_changes in plans:
+            rollback_file = write_rollback_file(hosted_zone['Id'], hosted_zone['Name'], rollback_changes,
+                                                str(rollback_dir_arg))
+
+            # One ChangeBatch per zone, so the zone fails over atomically.
+            response = submit_change_batch(aws_dns, hosted_zone['Id'], changes, record_set_comment_arg)
+            invalidate_zone(hosted_zone['Id'])
+            rollback_files.append((hosted_zone['Id'], rollback_file))
+            failed_over += len(changes)
+            print('zone ' + hosted_zone['Name'] + ': ' + str(len(changes)) + ' record sets SUCCESSFULLY SUBMITTED, ' +
+                  response['ChangeInfo']['Id'])
+
+        print('')
+        print('record sets: ' + str(failed_over) + ' SUCCESSFULLY FAILED OVER')
+        return True
+
+    except Exception as error:
+        # print colored(error, 'red')
+        print('failover stopped after ' + str(failed_over) + ' record sets')
+        print("exception :" + str(error))
+        return False
+
+    finally:
+        for hosted_zone_id, rollback_file in rollback_files:
+            print('rollback ' + hosted_zone_id + ': apply_resources_record_sets_changes:"' + rollback_file + '","' +
+                  hosted_zone_id + '"')
@@ -0,0 +1,178 @@
+"""
+Bulk failover of record sets: selects record sets with a selector and rewrites them all to a target value or alias.
+
+A selector is a ';' separated list of key=value criteria, all of which a record set has to meet, eg:
+
+    name=^api[0-9]*\\.;value=10.1.0.0/16          A records named api* pointing into 10.1.0.0/16
+    health_check=abcdef11-2222-3333-4444-555555fedcba
+    alias=us-east-1\\.elb\\.amazonaws\\.com;type=A
+
+Keys (FAILOVER_SELECTOR_KEYS): name (regex searched in the record set name), type, value (CIDR containing one of the
+A or AAAA values), alias (regex searched in the alias target DNS name), health_check (HealthCheckId), set_identifier
+and failover (PRIMARY | SECONDARY). Route53 record sets have no tags: select the hosted zones instead (hosted zone ID,
+public or private) and the record sets by name.
+
+Rewritten record sets keep their name, type and routing policy (SetIdentifier, Weight, Region, Failover,
+HealthCheckId...): only the values (or the alias target) change. Record sets managed by a traffic policy
+(TrafficPolicyInstanceId) and the zone apex SOA and NS are never selected: Route53 rejects changes to them.
+
+Before a zone is failed over, the UPSERT changes restoring its selected record sets as they were are written to a
+rollback file under FAILOVER_ROLLBACK_PATH (a Route53 change batch document), to be replayed with
+route53_engine.apply_resources_record_sets_changes.
+"""
+
+import ipaddress
+import json
+import os
+import re
+import time
+
+from route53_helpers import resource_record_set, normalize_record_name
+from route53_reconcile import is_zone_apex_managed
+
+FAILOVER_ROLLBACK_PATH = os.environ.get('ROUTE53_FAILOVER_ROLLBACK_PATH',
+                                        os.path.join(os.path.expanduser('~'), '.cache', 'jenkins-dns', 'failover'))
+
+FAILOVER_SELECTOR_KEYS = ('name', 'type', 'value', 'alias', 'health_check', 'set_identifier', 'failover')
+
+# Elements replaced by the failover target, the others (routing policy, health check) are kept.
+_FAILOVER_TARGET_ELEMENTS = ('ResourceRecords', 'TTL', 'AliasTarget')
+
+
+def parse_failover_selector(selector):
+    """
+Parses a selector, eg: 'name=^api\\.;value=10.1.0.0/16', into a dict of compiled criteria.
+
+    :raise ValueError: on an unknown key, an invalid regex or an invalid CIDR.
+    """
+    criteria = {}
+    for criterion in str(selector).split(';'):
+        if not criterion.strip():
+            continue
+        key, _, value = criterion.partition('=')
+        key = key.strip().lower()
+        if key not in FAILOVER_SELECTOR_KEYS:
+            raise ValueError('Unsupported selector key: ' + key + ', expected one of ' +
+                             ', '.join(FAILOVER_SELECTOR_KEYS))
+        value = value.strip()
+        if key in ('name', 'alias'):
+            criteria[key] = re.compile(value, re.IGNORECASE)
+        elif key == 'value':
+            criteria[key] = ipaddress.ip_network(value, strict=False)
+        elif key in ('type', 'failover'):
+            criteria[key] = value.upper()
+        else:
+            criteria[key] = value
+    if not criteria:
+        raise ValueError('Empty selector')
+    return criteria
+
+
+def _value_in_network(resource_record_sets, network):
+    for record_values in resource_record_sets.get('ResourceRecords', []):
+        try:
+            if ipaddress.ip_address(record_values['Value']) in network:
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def record_set_matches(resource_record_sets, criteria):
+    """
+Tells whether a ResourceRecordSet meets every criterion of a parsed selector (see parse_failover_selector).
+    """
+    if 'TrafficPolicyInstanceId' in resource_record_sets:
+        return False
+    if 'name' in criteria and not criteria['name'].search(normalize_record_name(resource_record_sets['Name'])):
+        return False
+    if 'type' in criteria and resource_record_sets['Type'] != criteria['type']:
+        return False
+    if 'value' in criteria and not _value_in_network(resource_record_sets, criteria['value']):
+        return False
+    if 'alias' in criteria and not criteria['alias'].search(
+            resource_record_sets.get('AliasTarget', {}).get('DNSName', '')):
+        return False
+    if 'health_check' in criteria and resource_record_sets.get('HealthCheckId') != criteria['health_check']:
+        return False
+    if 'set_identifier' in criteria and resource_record_sets.get('SetIdentifier') != criteria['set_identifier']:
+        return False
+    if 'failover' in criteria and resource_record_sets.get('Failover') != criteria['failover']:
+        return False
+    return True
+
+
+def failover_record_set(resource_record_sets, target_values, target_options=None):
+    """
+Returns resource_record_sets rewritten to the target values (or alias, see route53_helpers.resource_record_set
+options), keeping its name, type and routing policy, or None when it already points there.
+
+    :raise ValueError: on an invalid target for the record type.
+    """
+    target = resource_record_set(resource_record_sets['Name'], resource_record_sets['Type'], target_values,
+                                 resource_record_sets.get('TTL'), target_options)
+
+    failed_over = dict((element, value) for element, value in resource_record_sets.items()
+                       if element not in _FAILOVER_TARGET_ELEMENTS)
+    failed_over.update((element, target[element]) for element in _FAILOVER_TARGET_ELEMENTS if element in target)
+
+    if failed_over == resource_record_sets:
+        return None
+    return failed_over
+
+
+def failover_changes(record_sets, zone_name, criteria, target_values, target_options=None):
+    """
+Computes the failover of the record sets of a hosted zone.
+
+    :param record_sets: (iterable) -- ResourceRecordSet elements of the zone, eg: route53_cache.iter_zone_record_sets
+
+    :param zone_name: (string) -- hosted zone name, its apex SOA and NS are never selected.
+
+    :param criteria: (dict) -- parsed selector, see parse_failover_selector.
+
+    :param target_values: (string or list) -- target values, eg: '192.0.2.10|192.0.2.11', or alias target DNS name.
+
+    :param target_options: (string or dict) -- target options, eg: alias_hosted_zone_id=Z35SXDOTRQ7X7K;ttl=30
+
+    :return: (tuple) (UPSERT changes to the target, UPSERT changes restoring the selected record sets as they were)
+    """
+    changes, rollback_changes = [], []
+    for resource_record_sets in record_sets:
+        if is_zone_apex_managed(resource_record_sets, zone_name) or \
+                not record_set_matches(resource_record_sets, criteria):
+            continue
+        failed_over = failover_record_set(resource_record_sets, target_values, target_options)
+        if failed_over is None:
+            continue
+        changes.append({'Action': 'UPSERT', 'ResourceRecordSet': failed_over})
+        rollback_changes.append({'Action': 'UPSERT', 'ResourceRecordSet': resource_record_sets})
+    return changes, rollback_changes
+
+
+def write_rollback_file(hosted_zone_id, zone_name, rollback_changes, rollback_dir=''):
+    """
+Writes the rollback changes of a hosted zone as a change batch document, eg:
+~/.cache/jenkins-dns/failover/20261018T101500-Z2WI7FSN6LUJNR-example.com.json
+
+    :param rollback_dir: (string) -- directory to write to, FAILOVER_ROLLBACK_PATH if omitted.
+
+    :return: (string) path of the rollback file.
+    """
+    rollback_dir = rollback_dir or FAILOVER_ROLLBACK_PATH
+    if not os.path.isdir(rollback_dir):
+        os.makedirs(rollback_dir)
+
+    rollback_file = os.path.join(rollback_dir, time.strftime('%Y%m%dT%H%M%S') + '-' +
+                                 str(hosted_zone_id).split('/')[-1] + '-' + normalize_record_name(zone_name) +
+                                 'json')
+    document = {
+        'Comment': 'rollback of the failover of ' + normalize_record_name(zone_name) + ' (' + str(hosted_zone_id) +
+                   ')',
+        'Changes': rollback_changes,
+    }
+    # Written to a temporary file first: a rollback file is either complete or missing.
+    with open(rollback_file + '.tmp', 'w') as stream:
+        json.dump(document, stream, indent=2)
+    os.rename(rollback_file + '.tmp', rollback_file)
+    return rollback_file
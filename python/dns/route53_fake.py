@@ -0,0 +1,320 @@
+"""
+In-memory Route53 stand-in, to run the route53_engine tasks offline (see code-tests/aws_route53_bench.py).
+
+FakeRoute53 implements the part of the botocore route53 client the engine uses: ListHostedZones, GetHostedZone,
+GetHostedZoneCount, ListResourceRecordSets, ChangeResourceRecordSets and GetChange, with the Route53 ordering,
+pagination markers, atomic change batches and error codes (botocore ClientError). It can also simulate the service
+behaviour the engine has to cope with:
+
+    latency                     seconds added to every call, eg: 0.05 for a round trip to us-east-1.
+    requests_per_second         calls allowed per second, over which Throttling is raised (0 for no limit).
+    change_propagation_seconds  seconds a change stays PENDING; changes to a zone with a PENDING change get
+                                PriorRequestNotComplete.
+
+FakeRoute53Credentials plugs it in where a route53_credentials provider is expected, so the tasks go through
+route53_helpers.get_route53_client and route53_retry as they do against AWS, eg:
+
+    fake = FakeRoute53()
+    zone_id = fake.add_hosted_zone('example.com.', record_sets=[...])
+    route53_engine.check_resources_record_sets(FakeRoute53Credentials(fake), 'www.example.com.', zone_id)
+
+Every call is counted by operation name in FakeRoute53.calls.
+"""
+
+import bisect
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from route53_credentials import CredentialProvider
+from route53_helpers import normalize_record_name, CHANGE_BATCH_MAX_RECORDS
+
+FAKE_HOSTED_ZONES_MAX_ITEMS = 100
+FAKE_RECORD_SETS_MAX_ITEMS = 300
+
+
+def _client_error(code, message, operation_name, status_code=400):
+    from botocore.exceptions import ClientError
+
+    return ClientError({'Error': {'Code': code, 'Message': message},
+                        'ResponseMetadata': {'HTTPStatusCode': status_code}}, operation_name)
+
+
+def _record_set_sort_key(record_set_name, record_set_type='', record_set_identifier=''):
+    # Route53 lists record sets by name with the labels reversed (com.example.www), then by type and SetIdentifier.
+    labels = normalize_record_name(record_set_name).rstrip('.').split('.')
+    return tuple(reversed(labels)), record_set_type or '', record_set_identifier or ''
+
+
+def _record_set_key(resource_record_sets):
+    return _record_set_sort_key(resource_record_sets['Name'], resource_record_sets['Type'],
+                                resource_record_sets.get('SetIdentifier', ''))
+
+
+def _comparable(resource_record_sets):
+    # Route53 holds the ResourceRecords of a record set as a set: a DELETE may give them in any order.
+    if resource_record_sets is None or 'ResourceRecords' not in resource_record_sets:
+        return resource_record_sets
+    return dict(resource_record_sets, ResourceRecords=sorted(record['Value']
+                                                             for record in resource_record_sets['ResourceRecords']))
+
+
+class _FakeEvents(object):
+    """
+Minimal botocore event emitter: the handlers registered on 'before-send' events (eg: the route53_sweep rate limiter)
+are called before every request.
+    """
+    def __init__(self):
+        self._handlers = OrderedDict()
+
+    def register(self, event_name, handler, unique_id=None):
+        self._handlers[unique_id or id(handler)] = (event_name, handler)
+
+    def unregister(self, event_name, handler=None, unique_id=None):
+        self._handlers.pop(unique_id or id(handler), None)
+
+    def emit(self, event_name, **kwargs):
+        for registered_event_name, handler in list(self._handlers.values()):
+            if event_name.startswith(registered_event_name):
+                handler(event_name=event_name, **kwargs)
+
+
+class _FakeClientMeta(object):
+    def __init__(self):
+        self.events = _FakeEvents()
+        self.region_name = 'us-east-1'
+
+
+class _FakeHostedZone(object):
+    def __init__(self, hosted_zone):
+        self.hosted_zone = hosted_zone
+        self.keys = []
+        self.record_sets = {}
+        self.pending_until = 0.0
+
+
+class FakeRoute53(object):
+    """
+In-memory route53 client, thread safe.
+    """
+    def __init__(self, latency=0.0, requests_per_second=0, change_propagation_seconds=0.0):
+        self.latency = float(latency)
+        self.requests_per_second = float(requests_per_second)
+        self.change_propagation_seconds = float(change_propagation_seconds)
+        self.calls = Counter()
+        self.meta = _FakeClientMeta()
+        self._zones = OrderedDict()
+        self._changes = {}
+        self._recent_calls = deque()
+        self._lock = threading.RLock()
+
+    def add_hosted_zone(self, zone_name, private_zone=False, record_sets=()):
+        """
+Creates a hosted zone holding the SOA and NS record sets Route53 creates, and record_sets.
+
+    :return: (string) hosted zone ID, eg: /hostedzone/Z00000000000001
+        """
+        zone_name = normalize_record_name(zone_name)
+        with self._lock:
+            hosted_zone_id = '/hostedzone/Z%014d' % (len(self._zones) + 1)
+            zone = _FakeHostedZone({
+                'Id': hosted_zone_id,
+                'Name': zone_name,
+                'CallerReference': 'route53-fake-' + str(len(self._zones) + 1),
+                'Config': {'PrivateZone': bool(private_zone)},
+                'ResourceRecordSetCount': 0,
+            })
+            self._zones[hosted_zone_id] = zone
+
+            self._put_record_set(zone, {'Name': zone_name, 'Type': 'SOA', 'TTL': 900, 'ResourceRecords': [
+                {'Value': 'ns-1.awsdns-fake.com. awsdns-hostmaster.amazon.com. 1 7200 900 1209600 86400'}]})
+            self._put_record_set(zone, {'Name': zone_name, 'Type': 'NS', 'TTL': 172800, 'ResourceRecords': [
+                {'Value': 'ns-' + str(number) + '.awsdns-fake.com.'} for number in range(1, 5)]})
+            for resource_record_sets in record_sets:
+                self._put_record_set(zone, resource_record_sets)
+        return hosted_zone_id
+
+    def _put_record_set(self, zone, resource_record_sets):
+        resource_record_sets = dict(resource_record_sets)
+        resource_record_sets['Name'] = normalize_record_name(resource_record_sets['Name'])
+        key = _record_set_key(resource_record_sets)
+        if key not in zone.record_sets:
+            bisect.insort(zone.keys, key)
+        zone.record_sets[key] = resource_record_sets
+        zone.hosted_zone['ResourceRecordSetCount'] = len(zone.keys)
+
+    def _delete_record_set(self, zone, key):
+        del zone.record_sets[key]
+        del zone.keys[bisect.bisect_left(zone.keys, key)]
+        zone.hosted_zone['ResourceRecordSetCount'] = len(zone.keys)
+
+    def _call(self, operation_name):
+        # Bookkeeping shared by every API call: events, latency, throttling and the call counter.
+        self.meta.events.emit('before-send.route53.' + operation_name)
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[operation_name] += 1
+            if not self.requests_per_second:
+                return
+            now = time.monotonic()
+            while self._recent_calls and now - self._recent_calls[0] >= 1.0:
+                self._recent_calls.popleft()
+            if len(self._recent_calls) >= self.requests_per_second:
+                self.calls['Throttled'] += 1
+                raise _client_error('Throttling', 'Rate exceeded', operation_name)
+            self._recent_calls.append(now)
+
+    def _zone(self, hosted_zone_id, operation_name):
+        zone = self._zones.get('/hostedzone/' + str(hosted_zone_id).replace('/hostedzone/', ''))
+        if zone is None:
+            raise _client_error('NoSuchHostedZone', 'No hosted zone found with ID: ' + str(hosted_zone_id),
+                                operation_name, 404)
+        return zone
+
+    def list_hosted_zones(self, Marker=None, MaxItems=str(FAKE_HOSTED_ZONES_MAX_ITEMS)):
+        self._call('ListHostedZones')
+        with self._lock:
+            hosted_zone_ids = list(self._zones)
+            start = hosted_zone_ids.index(Marker) if Marker in self._zones else 0
+            page = hosted_zone_ids[start:start + min(int(MaxItems), FAKE_HOSTED_ZONES_MAX_ITEMS)]
+            response = {
+                'HostedZones': [copy.deepcopy(self._zones[hosted_zone_id].hosted_zone) for hosted_zone_id in page],
+                'IsTruncated': start + len(page) < len(hosted_zone_ids),
+                'MaxItems': str(MaxItems),
+            }
+            if response['IsTruncated']:
+                response['NextMarker'] = hosted_zone_ids[start + len(page)]
+        return response
+
+    def get_hosted_zone(self, Id):
+        self._call('GetHostedZone')
+        with self._lock:
+            zone = self._zone(Id, 'GetHostedZone')
+            return {'HostedZone': copy.deepcopy(zone.hosted_zone), 'DelegationSet': {'NameServers': [
+                'ns-' + str(number) + '.awsdns-fake.com' for number in range(1, 5)]}}
+
+    def get_hosted_zone_count(self):
+        self._call('GetHostedZoneCount')
+        with self._lock:
+            return {'HostedZoneCount': len(self._zones)}
+
+    def list_resource_record_sets(self, HostedZoneId, StartRecordName=None, StartRecordType=None,
+                                  StartRecordIdentifier=None, MaxItems=str(FAKE_RECORD_SETS_MAX_ITEMS)):
+        self._call('ListResourceRecordSets')
+        if StartRecordType and not StartRecordName:
+            raise _client_error('InvalidInput', 'StartRecordType requires StartRecordName', 'ListResourceRecordSets')
+
+        with self._lock:
+            zone = self._zone(HostedZoneId, 'ListResourceRecordSets')
+            start = 0
+            if StartRecordName:
+                start = bisect.bisect_left(zone.keys, _record_set_sort_key(StartRecordName, StartRecordType,
+                                                                           StartRecordIdentifier))
+            page = zone.keys[start:start + min(int(MaxItems), FAKE_RECORD_SETS_MAX_ITEMS)]
+            response = {
+                'ResourceRecordSets': [copy.deepcopy(zone.record_sets[key]) for key in page],
+                'IsTruncated': start + len(page) < len(zone.keys),
+                'MaxItems': str(MaxItems),
+            }
+            if response['IsTruncated']:
+                next_record_set = zone.record_sets[zone.keys[start + len(page)]]
+                response['NextRecordName'] = next_record_set['Name']
+                response['NextRecordType'] = next_record_set['Type']
+                if next_record_set.get('SetIdentifier'):
+                    response['NextRecordIdentifier'] = next_record_set['SetIdentifier']
+        return response
+
+    def change_resource_record_sets(self, HostedZoneId, ChangeBatch):
+        operation_name = 'ChangeResourceRecordSets'
+        self._call(operation_name)
+
+        with self._lock:
+            zone = self._zone(HostedZoneId, operation_name)
+            if time.monotonic() < zone.pending_until:
+                raise _client_error('PriorRequestNotComplete', 'The request was rejected because Route 53 was '
+                                    'still processing a prior request.', operation_name)
+
+            changes = ChangeBatch.get('Changes', [])
+            if not changes or sum(len(change['ResourceRecordSet'].get('ResourceRecords', [])) *
+                                  (2 if change['Action'] == 'UPSERT' else 1) for change in changes) > \
+                    CHANGE_BATCH_MAX_RECORDS:
+                raise _client_error('InvalidChangeBatch', 'Number of records limit exceeded.', operation_name)
+
+            # Changes are validated in order against the zone as modified by the previous changes of the batch, and
+            # only applied when all of them are valid: a batch is atomic.
+            staged = {}
+            zone_name = zone.hosted_zone['Name']
+            for change in changes:
+                resource_record_sets = dict(change['ResourceRecordSet'])
+                resource_record_sets['Name'] = normalize_record_name(resource_record_sets['Name'])
+                record_set_name = resource_record_sets['Name']
+                key = _record_set_key(resource_record_sets)
+                current = staged[key] if key in staged else zone.record_sets.get(key)
+                description = record_set_name + ' type ' + resource_record_sets['Type']
+
+                if record_set_name != zone_name and not record_set_name.endswith('.' + zone_name):
+                    raise _client_error('InvalidChangeBatch', 'RRSet with DNS name ' + record_set_name +
+                                        ' is not permitted in zone ' + zone_name, operation_name)
+                if change['Action'] == 'CREATE' and current is not None:
+                    raise _client_error('InvalidChangeBatch', 'Tried to create resource record set ' + description +
+                                        ' but it already exists', operation_name)
+                if change['Action'] == 'DELETE' and _comparable(current) != _comparable(resource_record_sets):
+                    raise _client_error('InvalidChangeBatch', 'Tried to delete resource record set ' + description +
+                                        ' but ' + ('the values provided do not match the current values'
+                                                   if current is not None else 'it was not found'), operation_name)
+                if change['Action'] not in ('CREATE', 'UPSERT', 'DELETE'):
+                    raise _client_error('InvalidInput', 'Invalid action ' + str(change['Action']), operation_name)
+                staged[key] = None if change['Action'] == 'DELETE' else resource_record_sets
+
+            for key, resource_record_sets in staged.items():
+                if resource_record_sets is None:
+                    if key in zone.record_sets:
+                        self._delete_record_set(zone, key)
+                else:
+                    self._put_record_set(zone, resource_record_sets)
+
+            zone.pending_until = time.monotonic() + self.change_propagation_seconds
+            change_id = '/change/C%014d' % (len(self._changes) + 1)
+            self._changes[change_id] = zone.pending_until
+            return {'ChangeInfo': self._change_info(change_id, ChangeBatch.get('Comment'))}
+
+    def _change_info(self, change_id, comment=None):
+        change_info = {
+            'Id': change_id,
+            'Status': 'PENDING' if time.monotonic() < self._changes[change_id] else 'INSYNC',
+            'SubmittedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        if comment:
+            change_info['Comment'] = comment
+        return change_info
+
+    def get_change(self, Id):
+        self._call('GetChange')
+        with self._lock:
+            if Id not in self._changes:
+                raise _client_error('NoSuchChange', 'A change with the specified change ID does not exist.',
+                                    'GetChange', 404)
+            return {'ChangeInfo': self._change_info(Id)}
+
+
+class _FakeSession(object):
+    def __init__(self, fake):
+        self._fake = fake
+
+    def client(self, service_name, config=None):
+        return self._fake
+
+
+class FakeRoute53Credentials(CredentialProvider):
+    """
+Credentials provider whose sessions return the given FakeRoute53 as their route53 client.
+    """
+    def __init__(self, fake):
+        self.fake = fake
+        self.cache_key = ('fake', id(fake))
+
+    def session(self, region_name):
+        return _FakeSession(self.fake)
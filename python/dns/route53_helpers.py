@@ -0,0 +1,651 @@
+"""
+Route53 helpers shared by the jenkins_dns_aws_route53*.py Fabric modules.
+
+These functions receive an already built boto3 route53 client, or a route53_credentials provider to build one, so they
+can be reused by every task regardless of how the AWS credentials are resolved.
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Route53 API quota: 5 requests per second per AWS account. Overridable for local stand-ins (see route53_fake).
+# https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html
+ROUTE53_REQUESTS_PER_SECOND = float(os.environ.get('ROUTE53_REQUESTS_PER_SECOND', '5'))
+
+# Size of the urllib3 connection pool of every cached route53 client, kept open (HTTP keep-alive) between calls.
+ROUTE53_MAX_POOL_CONNECTIONS = 10
+
+# Route53 returns at most 100 hosted zones per ListHostedZones response.
+HOSTED_ZONES_PAGE_SIZE = '100'
+
+# Route53 returns at most 300 resource record sets per ListResourceRecordSets response.
+RECORD_SETS_PAGE_SIZE = '300'
+
+# ChangeResourceRecordSets limits: at most 1000 ResourceRecord elements and 32000 characters across all Value elements
+# per request, UPSERT changes count twice.
+# https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html
+CHANGE_BATCH_MAX_RECORDS = 1000
+CHANGE_BATCH_MAX_VALUE_CHARS = 32000
+
+DEFAULT_RECORD_SET_TTL = 300
+
+# GetChange polling: first check after CHANGE_WAIT_INITIAL_DELAY seconds, then back off exponentially up to
+# CHANGE_WAIT_MAX_DELAY seconds between checks, giving up after CHANGE_WAIT_TIMEOUT seconds.
+CHANGE_WAIT_TIMEOUT = 300
+CHANGE_WAIT_INITIAL_DELAY = 1
+CHANGE_WAIT_MAX_DELAY = 16
+CHANGE_WAIT_BACKOFF = 2
+
+
+_route53_clients = {}
+_route53_clients_lock = threading.Lock()
+
+
+def get_route53_client(credentials, region_name='us-east-1'):
+    """
+Returns a route53 client for the given credentials and region, building it only the first time it is requested in
+the current process. Building a client loads the botocore service model and resolves the credentials, which is by far
+the most expensive part of a short task, so every task and nested call (eg: the existence checks done by create,
+update and delete) shares the same client and its pool of open TLS connections.
+
+boto3 clients are thread safe, sessions are not, so sessions are only used while holding the cache lock.
+
+The client is wrapped in a route53_retry.RetryingClient: every API call is rate limited and retried on throttling
+(Throttling, PriorRequestNotComplete) and transient errors, botocore's own retries being disabled.
+
+    :param credentials: (route53_credentials.CredentialProvider) -- AWS credentials provider.
+
+    :param region_name: (string) -- AWS account region
+
+    :return: (route53_retry.RetryingClient) route53 client.
+    """
+    # Deferred until the first AWS call, so importing the Route53 modules does not load botocore.
+    from botocore.config import Config
+    from route53_retry import RetryingClient
+
+    client_key = (credentials.cache_key, region_name)
+
+    with _route53_clients_lock:
+        aws_dns = _route53_clients.get(client_key)
+        if aws_dns is None:
+            session = credentials.session(region_name)
+            config = Config(max_pool_connections=ROUTE53_MAX_POOL_CONNECTIONS, retries={'max_attempts': 0})
+            aws_dns = RetryingClient(session.client('route53', config=config))
+            _route53_clients[client_key] = aws_dns
+
+    return aws_dns
+
+
+class TokenBucket(object):
+    """
+Thread safe token bucket rate limiter: allows bursts of up to capacity calls, then rate calls per second.
+
+Tokens are reserved under the lock and the wait happens outside of it, so concurrent callers queue up fairly, each one
+sleeping for its own share of the refill time.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+Takes one token, sleeping until it is available.
+
+    :return: (float) seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def before_send(self, **kwargs):
+        # botocore 'before-send' event handler, called before every HTTP attempt (retries included).
+        self.acquire()
+
+
+def iter_hosted_zones(aws_dns, page_size=HOSTED_ZONES_PAGE_SIZE):
+    """
+Lazily iterates over every hosted zone of the AWS account, following the NextMarker of ListHostedZones until Route53
+reports that the listing is no longer truncated.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param page_size: (string) -- number of hosted zones requested per API call, up to 100.
+
+    :return: generator of HostedZone dicts as returned by boto3.
+    """
+    request_args = {'MaxItems': str(page_size)}
+
+    while True:
+        response = aws_dns.list_hosted_zones(**request_args)
+
+        for hosted_zones in response['HostedZones']:
+            yield hosted_zones
+
+        if not response.get('IsTruncated'):
+            return
+
+        request_args['Marker'] = response['NextMarker']
+
+
+def iter_resource_record_sets(aws_dns, hosted_zone_id, start_record_name=None, start_record_type=None,
+                              start_record_identifier=None, page_size=RECORD_SETS_PAGE_SIZE):
+    """
+Lazily iterates over the resource record sets of a hosted zone, following the NextRecordName, NextRecordType and
+NextRecordIdentifier markers until Route53 reports that the listing is no longer truncated.
+
+Records are yielded as soon as each page arrives, so only one page is kept in memory and callers that stop iterating
+early (eg: an existence check) do not fetch the remaining pages.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone that contains the resource record sets that you want
+     to list.
+
+    :param start_record_name: (string) -- optional record name to start the listing from.
+
+    :param start_record_type: (string) -- optional record type to start the listing from, requires start_record_name.
+
+    :param start_record_identifier: (string) -- optional SetIdentifier to start the listing from, for weighted,
+     latency, geolocation and failover record sets.
+
+    :param page_size: (string) -- number of records requested per API call, up to 300.
+
+    :return: generator of ResourceRecordSet dicts as returned by boto3.
+    """
+    request_args = {
+        'HostedZoneId': hosted_zone_id,
+        'MaxItems': str(page_size),
+    }
+    if start_record_name:
+        request_args['StartRecordName'] = start_record_name
+    if start_record_type:
+        request_args['StartRecordType'] = start_record_type
+    if start_record_identifier:
+        request_args['StartRecordIdentifier'] = start_record_identifier
+
+    while True:
+        response = aws_dns.list_resource_record_sets(**request_args)
+
+        for resource_record_sets in response['ResourceRecordSets']:
+            yield resource_record_sets
+
+        if not response.get('IsTruncated'):
+            return
+
+        request_args['StartRecordName'] = response['NextRecordName']
+        request_args['StartRecordType'] = response['NextRecordType']
+        if response.get('NextRecordIdentifier'):
+            request_args['StartRecordIdentifier'] = response['NextRecordIdentifier']
+        else:
+            request_args.pop('StartRecordIdentifier', None)
+
+
+def normalize_record_name(record_set_name):
+    """
+Returns record_set_name the way Route53 returns it in ListResourceRecordSets responses: lower case, fully qualified
+with a trailing dot and with the leftmost '*' wildcard escaped as \\052.
+
+    :param record_set_name: (string) -- record set name, eg: *.yoursubdomain.yourdomain.com
+
+    :return: (string) eg: \\052.yoursubdomain.yourdomain.com.
+    """
+    record_set_name = str(record_set_name).lower()
+    if not record_set_name.endswith('.'):
+        record_set_name += '.'
+    if record_set_name.startswith('*.'):
+        record_set_name = '\\052' + record_set_name[1:]
+    return record_set_name
+
+
+def get_resource_record_set(aws_dns, hosted_zone_id, record_set_name, record_set_type=None, record_set_identifier=None):
+    """
+Seeks directly to record_set_name (and record_set_type when given) with StartRecordName/StartRecordType and
+MaxItems=1, so the lookup costs a single small API call no matter how many records the hosted zone holds.
+
+Route53 returns the first record set that sorts at or after the requested name and type, so the result is only
+considered a match when both the name and, if requested, the type are identical.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone that contains the resource record set.
+
+    :param record_set_name: (string) -- record set name, eg: yoursubdomain.yourdomain.com.
+
+    :param record_set_type: (string) -- optional record set type, eg: A | CNAME. When omitted any type matches.
+
+    :param record_set_identifier: (string) -- optional SetIdentifier of a weighted, latency, failover, geolocation or
+    multivalue answer record set (requires record_set_type). The seek then starts at that identifier with
+    StartRecordIdentifier.
+
+    :return: the matching ResourceRecordSet dict or None if it does not exist.
+    """
+    record_set_name = normalize_record_name(record_set_name)
+    if not record_set_type:
+        record_set_identifier = None
+
+    for resource_record_sets in iter_resource_record_sets(aws_dns, hosted_zone_id,
+                                                          start_record_name=record_set_name,
+                                                          start_record_type=record_set_type or None,
+                                                          start_record_identifier=record_set_identifier or None,
+                                                          page_size='1'):
+        if normalize_record_name(resource_record_sets.get('Name')) != record_set_name:
+            return None
+        if record_set_type and resource_record_sets.get('Type') != record_set_type:
+            return None
+        if record_set_identifier and resource_record_sets.get('SetIdentifier') != record_set_identifier:
+            return None
+        return resource_record_sets
+
+    return None
+
+
+# Record types accepted by ChangeResourceRecordSets.
+ROUTE53_RECORD_TYPES = ('A', 'AAAA', 'CAA', 'CNAME', 'DS', 'MX', 'NAPTR', 'NS', 'PTR', 'SOA', 'SPF', 'SRV', 'TXT')
+
+# Separator of the values of a multi-value record passed as a single task argument, eg: 192.0.2.44|192.0.2.45
+RECORD_SET_VALUES_SEPARATOR = '|'
+
+# record_set_options keys (see parse_record_set_options) and the ResourceRecordSet element each one sets.
+RECORD_SET_OPTIONS = OrderedDict([
+    ('ttl', 'TTL'),
+    ('set_identifier', 'SetIdentifier'),
+    ('weight', 'Weight'),
+    ('region', 'Region'),
+    ('failover', 'Failover'),
+    ('multivalue_answer', 'MultiValueAnswer'),
+    ('health_check_id', 'HealthCheckId'),
+    ('alias_hosted_zone_id', 'AliasTarget'),
+    ('alias_evaluate_target_health', 'AliasTarget'),
+])
+
+
+def split_record_set_values(record_set_values):
+    """
+Returns the list of values of record_set_values: a list is returned as is, a string is split on
+RECORD_SET_VALUES_SEPARATOR, eg: '192.0.2.44|192.0.2.45' -> ['192.0.2.44', '192.0.2.45']
+    """
+    if isinstance(record_set_values, (list, tuple)):
+        return [str(value) for value in record_set_values]
+    if record_set_values is None or str(record_set_values) == '':
+        return []
+    return [value.strip() for value in str(record_set_values).split(RECORD_SET_VALUES_SEPARATOR)]
+
+
+def parse_record_set_options(record_set_options):
+    """
+Parses the record set options of a task argument, eg: 'ttl=60;set_identifier=blue;weight=10'. Keys are the ones of
+RECORD_SET_OPTIONS, a dict is returned as is.
+
+    :param record_set_options: (string or dict) -- ';' separated key=value pairs, empty for none.
+
+    :return: (dict) option -> value
+    """
+    if isinstance(record_set_options, dict):
+        return record_set_options
+
+    options = {}
+    for option in str(record_set_options or '').split(';'):
+        if not option.strip():
+            continue
+        key, separator, value = option.partition('=')
+        key = key.strip().lower()
+        if not separator or key not in RECORD_SET_OPTIONS:
+            raise ValueError('Unsupported record set option: ' + option.strip() + ', expected key=value with key one '
+                             'of ' + ', '.join(RECORD_SET_OPTIONS))
+        options[key] = value.strip()
+    return options
+
+
+def resource_record_set(record_set_name, record_set_type, record_set_values, record_set_ttl=None,
+                        record_set_options=None):
+    """
+Builds a ResourceRecordSet element of any Route53 record type, simple or with a routing policy, or an alias.
+
+    :param record_set_name: (string) -- record set name, eg: yoursubdomain.yourdomain.com.
+
+    :param record_set_type: (string) -- one of ROUTE53_RECORD_TYPES, eg: A | AAAA | TXT | MX
+
+    :param record_set_values: (string or list) -- one or more record values, eg: ['172.20.0.5', '172.20.0.6'] or
+    '172.20.0.5|172.20.0.6'. For an alias, the DNS name of the alias target, eg: my-elb-1.us-east-1.elb.amazonaws.com.
+
+    :param record_set_ttl: (int) -- record set TTL in seconds, defaults to DEFAULT_RECORD_SET_TTL. Overridden by the
+    ttl option, ignored for aliases.
+
+    :param record_set_options: (string or dict) -- routing and alias options (see parse_record_set_options):
+    set_identifier, weight, region (latency), failover (PRIMARY | SECONDARY), multivalue_answer (true | false),
+    health_check_id, alias_hosted_zone_id and alias_evaluate_target_health (true | false).
+
+    :return: (dict) ResourceRecordSet element.
+    """
+    record_set_type = str(record_set_type).upper()
+    if record_set_type not in ROUTE53_RECORD_TYPES:
+        raise ValueError('Unsupported record type: ' + record_set_type + ', expected one of ' +
+                         ', '.join(ROUTE53_RECORD_TYPES))
+
+    options = parse_record_set_options(record_set_options)
+    record_set_values = split_record_set_values(record_set_values)
+
+    resource_record_sets = OrderedDict([('Name', str(record_set_name)), ('Type', record_set_type)])
+    for option, element in RECORD_SET_OPTIONS.items():
+        if option not in options or element in ('TTL', 'AliasTarget'):
+            continue
+        if element == 'Weight':
+            resource_record_sets[element] = int(options[option])
+        elif element == 'MultiValueAnswer':
+            resource_record_sets[element] = str(options[option]).lower() == 'true'
+        elif element == 'Failover':
+            resource_record_sets[element] = str(options[option]).upper()
+        else:
+            resource_record_sets[element] = str(options[option])
+
+    if options.get('alias_hosted_zone_id'):
+        if len(record_set_values) != 1:
+            raise ValueError('An alias record set needs exactly one value, the alias target DNS name')
+        resource_record_sets['AliasTarget'] = {
+            'HostedZoneId': str(options['alias_hosted_zone_id']),
+            'DNSName': record_set_values[0],
+            'EvaluateTargetHealth': str(options.get('alias_evaluate_target_health', 'false')).lower() == 'true',
+        }
+    else:
+        resource_record_sets['TTL'] = int(options.get('ttl') or record_set_ttl or DEFAULT_RECORD_SET_TTL)
+        resource_record_sets['ResourceRecords'] = [{'Value': value} for value in record_set_values]
+
+    return dict(resource_record_sets)
+
+
+def record_set_change(action, record_set_name, record_set_type, record_set_values, record_set_ttl=None,
+                      record_set_options=None):
+    """
+Builds a single ChangeResourceRecordSets Change element.
+
+    :param action: (string) -- CREATE | UPSERT | DELETE
+
+    :param record_set_name: (string) -- record set name, eg: yoursubdomain.yourdomain.com.
+
+    :param record_set_type: (string) -- record set type, eg: A | CNAME
+
+    :param record_set_values: (string or list) -- one or more record values, eg: ['172.20.0.5', '172.20.0.6']
+
+    :param record_set_ttl: (int) -- record set TTL in seconds, defaults to DEFAULT_RECORD_SET_TTL.
+
+    :param record_set_options: (string or dict) -- routing and alias options, see resource_record_set.
+
+    :return: (dict) Change element, eg: {'Action': 'CREATE', 'ResourceRecordSet': {...}}
+    """
+    return {
+        'Action': str(action).upper(),
+        'ResourceRecordSet': resource_record_set(record_set_name, record_set_type, record_set_values, record_set_ttl,
+                                                 record_set_options),
+    }
+
+
+def _manifest_entry_options(entry):
+    # Routing and alias options of a manifest entry or CSV row, eg: set_identifier, weight, alias_hosted_zone_id.
+    return dict((option, entry[option]) for option in RECORD_SET_OPTIONS
+                if option != 'ttl' and entry.get(option) not in (None, ''))
+
+
+def _manifest_entry_values(entry):
+    # Manifest values are never split on RECORD_SET_VALUES_SEPARATOR, multi-value entries use a "values" list.
+    if 'values' in entry:
+        return list(entry['values'])
+    return [entry['value']] if entry.get('value') is not None else []
+
+
+def manifest_entry_change(entry):
+    """
+Returns the Change element of a manifest entry (see load_record_set_changes), eg:
+{"action": "UPSERT", "name": "app.yourdomain.com.", "type": "A", "values": ["172.20.0.5"], "ttl": 60}. Change elements
+are returned as they are.
+    """
+    if 'ResourceRecordSet' in entry:
+        return entry
+    return record_set_change(entry['action'], entry['name'], entry['type'],
+                             _manifest_entry_values(entry), entry.get('ttl'), _manifest_entry_options(entry))
+
+
+def _load_csv_changes(manifest, default_action=None):
+    # Rows sharing action, name and type are merged into one multi-value change, in order of first appearance.
+    changes = OrderedDict()
+    for row in csv.DictReader(manifest):
+        action = row.get('action') or default_action
+        key = (action.upper(), row['name'], row['type'].upper(), row.get('set_identifier') or '')
+        if key in changes:
+            changes[key]['ResourceRecordSet']['ResourceRecords'].append({'Value': row['value']})
+        else:
+            changes[key] = record_set_change(action, row['name'], row['type'], [row['value']], row.get('ttl'),
+                                             _manifest_entry_options(row))
+    return list(changes.values())
+
+
+def _read_manifest(manifest_file, manifest_format=''):
+    # Returns (format, content) with format one of json | yaml | csv, guessed from the extension or the content.
+    if manifest_file == '-':
+        content = sys.stdin.read()
+    else:
+        with open(manifest_file) as manifest:
+            content = manifest.read()
+
+    manifest_format = str(manifest_format).lower()
+    if not manifest_format:
+        extension = manifest_file.rsplit('.', 1)[-1].lower() if '.' in manifest_file else ''
+        if extension in ('json', 'csv'):
+            manifest_format = extension
+        elif extension in ('yml', 'yaml'):
+            manifest_format = 'yaml'
+        elif content.lstrip()[:1] in ('{', '['):
+            manifest_format = 'json'
+        elif content.lstrip().lower().startswith(('action,', 'name,')):
+            manifest_format = 'csv'
+        else:
+            manifest_format = 'yaml'
+    elif manifest_format == 'yml':
+        manifest_format = 'yaml'
+
+    if manifest_format not in ('json', 'yaml', 'csv'):
+        raise ValueError('Unsupported manifest format: ' + manifest_format)
+    return manifest_format, content
+
+
+def _parse_manifest_document(manifest_format, content):
+    if manifest_format == 'json':
+        return json.loads(content)
+    import yaml
+    return yaml.safe_load(content)
+
+
+def load_record_set_changes(changes_file, changes_format=''):
+    """
+Reads a manifest of record set changes and returns the list of Change elements it describes.
+
+Supported formats are JSON, YAML (requires PyYAML) and CSV. JSON and YAML manifests hold either a Route53 change batch
+({"Changes": [...]}, same as `aws route53 change-resource-record-sets --change-batch`) or a list of entries like:
+
+    - action: CREATE
+      name: app1.yourdomain.com.
+      type: A
+      value: 172.20.0.5      # or "values: [...]" for multi-value records
+      ttl: 300               # optional
+      set_identifier: blue   # optional routing and alias options, see resource_record_set
+      weight: 10
+
+CSV manifests need an "action,name,type,value[,ttl]" header and one value per row, plus optional option columns
+(eg: set_identifier, weight).
+
+    :param changes_file: (string) -- path to the manifest file or '-' to read it from stdin.
+
+    :param changes_format: (string) -- json | yaml | csv. When empty it is guessed from the file extension, falling
+    back to sniffing the content.
+
+    :return: (list) Change elements.
+    """
+    changes_format, content = _read_manifest(changes_file, changes_format)
+    if changes_format == 'csv':
+        return _load_csv_changes(io.StringIO(content))
+
+    document = _parse_manifest_document(changes_format, content)
+    if isinstance(document, dict):
+        document = document.get('Changes', [])
+    return [manifest_entry_change(entry) for entry in document or []]
+
+
+def load_record_sets(record_sets_file, record_sets_format=''):
+    """
+Reads a manifest of record sets (eg: the desired state of a hosted zone) and returns the ResourceRecordSet elements it
+describes. Same formats as load_record_set_changes, without the action: JSON and YAML manifests hold either
+{"ResourceRecordSets": [...]} (same as `aws route53 list-resource-record-sets`) or a list of entries like:
+
+    - name: app1.yourdomain.com.
+      type: A
+      values: [172.20.0.5, 172.20.0.6]
+      ttl: 300               # optional
+      set_identifier: blue   # optional routing and alias options, see resource_record_set
+      weight: 10
+
+CSV manifests need a "name,type,value[,ttl]" header and one value per row, plus optional option columns.
+
+    :param record_sets_file: (string) -- path to the manifest file or '-' to read it from stdin.
+
+    :param record_sets_format: (string) -- json | yaml | csv, guessed when empty.
+
+    :return: (list) ResourceRecordSet elements.
+    """
+    record_sets_format, content = _read_manifest(record_sets_file, record_sets_format)
+    if record_sets_format == 'csv':
+        return [change['ResourceRecordSet'] for change in _load_csv_changes(io.StringIO(content), 'UPSERT')]
+
+    document = _parse_manifest_document(record_sets_format, content)
+    if isinstance(document, dict):
+        document = document.get('ResourceRecordSets', [])
+
+    record_sets = []
+    for entry in document or []:
+        if 'Name' in entry:
+            record_sets.append(entry)
+        else:
+            record_sets.append(resource_record_set(entry['name'], entry['type'],
+                                                   _manifest_entry_values(entry), entry.get('ttl'),
+                                                   _manifest_entry_options(entry)))
+    return record_sets
+
+
+def _change_batch_weight(change):
+    records = change['ResourceRecordSet'].get('ResourceRecords', [])
+    factor = 2 if change['Action'] == 'UPSERT' else 1
+    return max(len(records), 1) * factor, sum(len(record['Value']) for record in records) * factor
+
+
+def change_batch_size(changes):
+    """
+Returns the (ResourceRecord elements, Value characters) a ChangeBatch of changes counts against the Route53 limits
+(CHANGE_BATCH_MAX_RECORDS, CHANGE_BATCH_MAX_VALUE_CHARS), UPSERT changes counting twice.
+    """
+    weights = [_change_batch_weight(change) for change in changes]
+    return sum(records for records, _ in weights), sum(chars for _, chars in weights)
+
+
+def iter_change_batches(changes, max_records=CHANGE_BATCH_MAX_RECORDS, max_value_chars=CHANGE_BATCH_MAX_VALUE_CHARS):
+    """
+Packs Change elements, in order, into as few lists as possible without exceeding the Route53 per request limits on
+ResourceRecord elements and Value characters. A change that exceeds the limits on its own is sent alone so Route53
+reports the error for it.
+
+    :param changes: (iterable) -- Change elements, eg: as returned by load_record_set_changes.
+
+    :return: generator of Change element lists, each one fitting in a single ChangeBatch.
+    """
+    batch, batch_records, batch_chars = [], 0, 0
+    for change in changes:
+        records, chars = _change_batch_weight(change)
+        if batch and (batch_records + records > max_records or batch_chars + chars > max_value_chars):
+            yield batch
+            batch, batch_records, batch_chars = [], 0, 0
+        batch.append(change)
+        batch_records += records
+        batch_chars += chars
+    if batch:
+        yield batch
+
+
+def change_resource_record_sets_batched(aws_dns, hosted_zone_id, changes, comment=''):
+    """
+Submits changes to a hosted zone in as few ChangeResourceRecordSets calls as the Route53 limits allow. Each batch is
+applied atomically by Route53; batches are submitted in order and submission stops at the first failing batch.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone the changes apply to.
+
+    :param changes: (iterable) -- Change elements.
+
+    :param comment: (string) -- ChangeBatch comment.
+
+    :return: generator of (batch, response) tuples, one per submitted ChangeBatch.
+    """
+    for batch in iter_change_batches(changes):
+        change_batch = {'Changes': batch}
+        if comment:
+            change_batch['Comment'] = str(comment)
+
+        response = aws_dns.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch=change_batch)
+        yield batch, response
+
+
+def wait_for_change(aws_dns, change_id, timeout=CHANGE_WAIT_TIMEOUT, initial_delay=CHANGE_WAIT_INITIAL_DELAY,
+                    max_delay=CHANGE_WAIT_MAX_DELAY, backoff=CHANGE_WAIT_BACKOFF):
+    """
+Polls GetChange for the ChangeInfo.Id returned by ChangeResourceRecordSets until Route53 reports the change as INSYNC,
+ie: propagated to all Route53 authoritative DNS servers. Checks are spaced with exponential backoff, so a change that
+takes a minute to propagate costs a handful of API calls instead of a busy loop.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param change_id: (string) -- ChangeInfo.Id, eg: /change/C3QYC83OA0KX5K
+
+    :param timeout: (float) -- seconds to wait before giving up.
+
+    :param initial_delay: (float) -- seconds to wait before the first check.
+
+    :param max_delay: (float) -- upper bound for the delay between two checks.
+
+    :param backoff: (float) -- multiplier applied to the delay after every PENDING check.
+
+    :return: (float) seconds the change took to become INSYNC.
+
+    :raise TimeoutError: if the change is still PENDING after timeout seconds, or can not be polled: found applied
+    after its ChangeResourceRecordSets call failed, without an ID (see route53_retry.APPLIED_CHANGE_ID).
+    """
+    if not change_id:
+        raise TimeoutError('change applied, but its ID was lost with the failed response: INSYNC can not be checked')
+
+    started = time.monotonic()
+    delay = float(initial_delay)
+
+    while True:
+        time.sleep(min(delay, max(timeout - (time.monotonic() - started), 0)))
+
+        change_status = aws_dns.get_change(Id=change_id)['ChangeInfo']['Status']
+        elapsed = time.monotonic() - started
+        if change_status == 'INSYNC':
+            return elapsed
+        if elapsed >= timeout:
+            raise TimeoutError('change ' + str(change_id) + ' still ' + str(change_status) + ' after ' +
+                               '%.1f' % elapsed + 's')
+
+        delay = min(delay * backoff, max_delay)
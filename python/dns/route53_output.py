@@ -0,0 +1,228 @@
+"""
+Output writers for the Route53 listings.
+
+Listings are turned into rows (see hosted_zone_row and record_set_row) and written by one of the OUTPUT_FORMATS
+writers, which buffer their output and write it to the stream in OUTPUT_BUFFER_SIZE chunks instead of one unbuffered
+print per line:
+
+    text   the historic "label: value" lines, one block per row (default).
+    jsonl  one JSON object per row (JSON Lines), eg: piped to `jq` by a later Jenkins step.
+    csv    a header line and one line per record value, the layout of the CSV changes manifests
+           (see route53_helpers.load_record_set_changes).
+    table  aligned columns. Column widths depend on every row, so the table is written once the listing is complete.
+
+Every value of multi-value records is kept: a list in JSON Lines, one line per value in CSV and comma separated in
+text and table.
+"""
+
+import csv
+import io
+import json
+import sys
+from collections import OrderedDict
+
+OUTPUT_FORMAT_TEXT = 'text'
+OUTPUT_FORMATS = (OUTPUT_FORMAT_TEXT, 'jsonl', 'csv', 'table')
+
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+HOSTED_ZONE_FIELDS = ('id', 'name', 'caller_ref', 'private_zone', 'record_count', 'linked_service')
+RECORD_SET_FIELDS = ('hosted_zone_id', 'name', 'type', 'set_identifier', 'region', 'ttl', 'values', 'alias_target')
+
+# text format: block title and the "label: value" lines of every row, as printed by the original tasks.
+HOSTED_ZONE_TEXT_TITLE = 'Route53 Hosted Zones:'
+HOSTED_ZONE_TEXT_LABELS = OrderedDict([
+    ('id', 'hostedzone_id'),
+    ('name', 'hostedzone_name'),
+    ('caller_ref', 'hostedzone_caller_ref'),
+    ('private_zone', 'hostedzone_conf_privzone'),
+    ('record_count', 'hostedzone_record_count'),
+    ('linked_service', 'hostedzone_linkedserv_serv'),
+])
+RECORD_SET_TEXT_TITLE = '\nRoute53 Rosource record sets for zone: {hosted_zone_id}'
+RECORD_SET_TEXT_LABELS = OrderedDict([
+    ('name', 'resource_record_sets_name'),
+    ('type', 'resource_record_sets_type'),
+    ('region', 'resource_record_sets_region'),
+    ('ttl', 'resource_record_sets_ttl'),
+    ('values', 'resource_record_sets_record_value'),
+])
+
+
+def hosted_zone_row(hosted_zone):
+    """
+Flattens a ListHostedZones HostedZone element into a HOSTED_ZONE_FIELDS row.
+    """
+    return OrderedDict([
+        ('id', hosted_zone.get('Id')),
+        ('name', hosted_zone.get('Name')),
+        ('caller_ref', hosted_zone.get('CallerReference')),
+        ('private_zone', hosted_zone.get('Config', {}).get('PrivateZone')),
+        ('record_count', hosted_zone.get('ResourceRecordSetCount')),
+        ('linked_service', (hosted_zone.get('LinkedService') or {}).get('ServicePrincipal', '')),
+    ])
+
+
+def record_set_row(hosted_zone_id, resource_record_sets):
+    """
+Flattens a ListResourceRecordSets ResourceRecordSet element into a RECORD_SET_FIELDS row, keeping every value.
+    """
+    return OrderedDict([
+        ('hosted_zone_id', hosted_zone_id),
+        ('name', resource_record_sets.get('Name')),
+        ('type', resource_record_sets.get('Type')),
+        ('set_identifier', resource_record_sets.get('SetIdentifier')),
+        ('region', resource_record_sets.get('Region')),
+        ('ttl', resource_record_sets.get('TTL')),
+        ('values', [record_values.get('Value') for record_values in resource_record_sets.get('ResourceRecords', [])]),
+        ('alias_target', (resource_record_sets.get('AliasTarget') or {}).get('DNSName')),
+    ])
+
+
+def _cell(value):
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+class OutputWriter(object):
+    """
+Base writer: subclasses render rows with _emit(), which only appends to an in-memory buffer flushed to the stream
+every buffer_size characters and on close(). Use it as a context manager so the tail of the buffer is not lost.
+    """
+    def __init__(self, fields, stream=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        self.fields = fields
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._chunks = []
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _emit(self, text):
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write(self, row):
+        raise NotImplementedError
+
+    def flush(self):
+        # sys.stdout is looked up at flush time, not at construction, so redirections done by the caller are honoured.
+        stream = self.stream or sys.stdout
+        if self._chunks:
+            stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._buffered = 0
+        stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class TextWriter(OutputWriter):
+    def __init__(self, fields, text_title='', text_labels=None, stream=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        super(TextWriter, self).__init__(fields, stream, buffer_size)
+        self.text_title = text_title
+        self.text_labels = text_labels or OrderedDict((field, field) for field in fields)
+
+    def write(self, row):
+        lines = [self.text_title.format(**row)] if self.text_title else []
+        for field, label in self.text_labels.items():
+            lines.append(label + ': ' + _cell(row.get(field)))
+        self._emit('\n'.join(lines) + '\n')
+
+
+class JsonLinesWriter(OutputWriter):
+    def write(self, row):
+        self._emit(json.dumps(row, separators=(',', ':')) + '\n')
+
+
+class CsvWriter(OutputWriter):
+    """
+One line per value of the list fields (eg: record set 'values'), the other columns being repeated, so multi-value
+records read back the way the CSV changes manifests are merged.
+    """
+    def __init__(self, fields, stream=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        super(CsvWriter, self).__init__(fields, stream, buffer_size)
+        self._line = io.StringIO()
+        self._csv = csv.writer(self._line, lineterminator='\n')
+        self._header_written = False
+
+    def _emit_csv(self, cells):
+        self._csv.writerow(cells)
+        self._emit(self._line.getvalue())
+        self._line.seek(0)
+        self._line.truncate()
+
+    def write(self, row):
+        if not self._header_written:
+            self._emit_csv(['value' if field == 'values' else field for field in self.fields])
+            self._header_written = True
+
+        values = row.get('values')
+        for value in (values or ['']) if isinstance(values, list) else [values]:
+            self._emit_csv(['' if row.get(field) is None else (value if field == 'values' else row.get(field))
+                            for field in self.fields])
+
+
+class TableWriter(OutputWriter):
+    def __init__(self, fields, stream=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        super(TableWriter, self).__init__(fields, stream, buffer_size)
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append([_cell('' if row.get(field) is None else row.get(field)) for field in self.fields])
+
+    def close(self):
+        widths = [len(field) for field in self.fields]
+        for cells in self._rows:
+            widths = [max(width, len(cell)) for width, cell in zip(widths, cells)]
+
+        for cells in [list(self.fields)] + self._rows:
+            self._emit('  '.join(cell.ljust(width) for cell, width in zip(cells, widths)).rstrip() + '\n')
+        self._rows = []
+        super(TableWriter, self).close()
+
+
+def output_writer(output_format, fields, text_title='', text_labels=None, stream=None):
+    """
+Returns the writer for output_format.
+
+    :param output_format: (string) -- text | jsonl | csv | table, empty for text.
+
+    :param fields: (tuple) -- row fields in column order, eg: RECORD_SET_FIELDS
+
+    :param text_title: (string) -- text format only: line written before each row, formatted with the row fields.
+
+    :param text_labels: (OrderedDict) -- text format only: field -> label of the lines written for each row.
+
+    :param stream: (file) -- where the output is written, sys.stdout by default.
+
+    :return: (OutputWriter)
+    """
+    output_format = str(output_format or OUTPUT_FORMAT_TEXT).lower()
+    if output_format == OUTPUT_FORMAT_TEXT:
+        return TextWriter(fields, text_title, text_labels, stream)
+    if output_format == 'jsonl':
+        return JsonLinesWriter(fields, stream)
+    if output_format == 'csv':
+        return CsvWriter(fields, stream)
+    if output_format == 'table':
+        return TableWriter(fields, stream)
+    raise ValueError('Unsupported output format: ' + output_format + ', expected one of ' + ', '.join(OUTPUT_FORMATS))
+
+
+def status_stream(output_format):
+    """
+Stream for progress messages ("Connecting to Route53", totals...): stdout for the text format, stderr otherwise so
+they do not get mixed with the structured output.
+    """
+    if str(output_format or OUTPUT_FORMAT_TEXT).lower() == OUTPUT_FORMAT_TEXT:
+        return sys.stdout
+    return sys.stderr
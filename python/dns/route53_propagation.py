@@ -0,0 +1,261 @@
+"""
+Propagation check of a record set against the authoritative name servers of its hosted zone.
+
+Instead of sleeping a fixed time after a change and asking the local (caching) resolver, wait_for_propagation sends a
+non recursive query over UDP to every authoritative server at once, resends it every retry_interval seconds to the
+servers that still answer the old data, and returns as soon as all of them answer the expected values: usually well
+under a second once the change is INSYNC.
+
+Only the standard library is used: one non blocking UDP socket per server, multiplexed with select, and a minimal DNS
+message encoder and decoder (EDNS0 with a 4096 bytes payload, so long TXT answers are not truncated). Answers are
+rendered in the Route53 value format (eg: "10 mail.example.com." for MX) to be compared with the record set values.
+
+    eg: wait_for_propagation('app.example.com.', 'A', ['172.20.0.5'], ['ns-1.awsdns-01.org', '127.0.0.1:5353'])
+"""
+
+import random
+import select
+import socket
+import struct
+import time
+
+DNS_PORT = 53
+DNS_EDNS_PAYLOAD_SIZE = 4096
+
+PROPAGATION_TIMEOUT = 60
+PROPAGATION_RETRY_INTERVAL = 0.5
+
+DNS_RECORD_TYPE_CODES = {
+    'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'PTR': 12, 'MX': 15, 'TXT': 16, 'AAAA': 28, 'SRV': 33, 'NAPTR': 35,
+    'DS': 43, 'SPF': 99, 'CAA': 257,
+}
+DNS_RCODE_NXDOMAIN = 3
+
+_OPT_RECORD_TYPE = 41
+
+
+def build_query(record_set_name, record_set_type, query_id):
+    """
+Returns a non recursive DNS query message (RD flag off, as expected by authoritative servers) with an EDNS0 OPT
+record.
+    """
+    question = b''
+    for label in str(record_set_name).rstrip('.').split('.'):
+        label = label.replace('\\052', '*')
+        try:
+            label = label.encode('ascii')
+        except UnicodeEncodeError:
+            label = label.encode('idna')
+        question += struct.pack('!B', len(label)) + label
+    question += b'\x00' + struct.pack('!HH', DNS_RECORD_TYPE_CODES[record_set_type], 1)
+    opt_record = b'\x00' + struct.pack('!HHIH', _OPT_RECORD_TYPE, DNS_EDNS_PAYLOAD_SIZE, 0, 0)
+    return struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 1) + question + opt_record
+
+
+def _read_name(message, offset):
+    # Returns (name with a trailing dot, offset after the name), following compression pointers.
+    labels, end, jumps = [], None, 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            jumps += 1
+            if jumps > 64:
+                raise ValueError('DNS name compression loop')
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode('ascii', 'replace').lower())
+        offset += length
+    return '.'.join(labels) + '.', end if end is not None else offset
+
+
+def _character_strings(rdata):
+    strings, offset = [], 0
+    while offset < len(rdata):
+        length = rdata[offset]
+        text = rdata[offset + 1:offset + 1 + length].decode('utf-8', 'replace')
+        strings.append('"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"')
+        offset += 1 + length
+    return strings, offset
+
+
+def _render_rdata(message, record_type, offset, length):
+    # Renders the RDATA at offset the way Route53 shows record values, or returns None for unsupported types.
+    rdata = message[offset:offset + length]
+    if record_type == 1:
+        return socket.inet_ntop(socket.AF_INET, rdata)
+    if record_type == 28:
+        return socket.inet_ntop(socket.AF_INET6, rdata)
+    if record_type in (2, 5, 12):
+        return _read_name(message, offset)[0]
+    if record_type == 15:
+        return str(struct.unpack('!H', rdata[:2])[0]) + ' ' + _read_name(message, offset + 2)[0]
+    if record_type == 33:
+        priority, weight, port = struct.unpack('!HHH', rdata[:6])
+        return '%d %d %d %s' % (priority, weight, port, _read_name(message, offset + 6)[0])
+    if record_type in (16, 99):
+        return ' '.join(_character_strings(rdata)[0])
+    if record_type == 257:
+        tag_length = rdata[1]
+        value = rdata[2 + tag_length:].decode('utf-8', 'replace')
+        return '%d %s "%s"' % (rdata[0], rdata[2:2 + tag_length].decode('ascii', 'replace'), value)
+    return None
+
+
+def parse_response(message):
+    """
+Decodes a DNS response message.
+
+    :return: (tuple) (query id, rcode, list of (name, record type code, rendered value) answers)
+    """
+    query_id, flags, question_count, answer_count = struct.unpack('!HHHH', message[:8])
+    offset = 12
+    for _ in range(question_count):
+        offset = _read_name(message, offset)[1] + 4
+
+    answers = []
+    for _ in range(answer_count):
+        name, offset = _read_name(message, offset)
+        record_type, _, _, length = struct.unpack('!HHIH', message[offset:offset + 10])
+        offset += 10
+        answers.append((name, record_type, _render_rdata(message, record_type, offset, length)))
+        offset += length
+    return query_id, flags & 0x0F, answers
+
+
+def _canonical_value(value):
+    return ' '.join(str(value).split()).lower()
+
+
+def answer_matches(response, record_set_name, record_set_type, expected_values):
+    """
+Tells whether a parsed response (see parse_response) holds the expected record set state.
+
+    :param expected_values: (list) -- values the record set must hold exactly, None for any value, or an empty list
+    for no record set of that type (eg: after a delete).
+    """
+    _, rcode, answers = response
+    # Route53 names hold wildcards as \\052 (see route53_helpers.normalize_record_name), answers as '*'.
+    record_set_name = str(record_set_name).lower().rstrip('.').replace('\\052', '*') + '.'
+    values = [value for name, record_type, value in answers
+              if name == record_set_name and record_type == DNS_RECORD_TYPE_CODES[record_set_type]]
+
+    if expected_values is not None and not expected_values:
+        return not values and rcode in (0, DNS_RCODE_NXDOMAIN)
+    if rcode != 0 or not values:
+        return False
+    if expected_values is None:
+        return True
+    return sorted(_canonical_value(value) for value in values) == \
+        sorted(_canonical_value(value) for value in expected_values)
+
+
+def resolve_nameservers(nameservers):
+    """
+Resolves name servers given as host or host:port (eg: ns-1.awsdns-01.org, 127.0.0.1:5353, [::1]:5353) to socket
+addresses, IPv4 first. Name servers given twice, or resolving to an address already in the list, are only returned
+once: wait_for_propagation waits for one answer per returned name server.
+
+    :return: (list) of (address family, (address, port), name server as given)
+    """
+    addresses, seen = [], set()
+    for nameserver in nameservers:
+        nameserver = str(nameserver).strip()
+        if nameserver.lower() in seen:
+            continue
+        host, port = nameserver, DNS_PORT
+        if nameserver.startswith('['):
+            host, _, port = nameserver[1:].partition(']')
+            port = int(port.lstrip(':') or DNS_PORT)
+        elif nameserver.count(':') == 1:
+            host, port = nameserver.split(':')
+            port = int(port)
+
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        seen.add(nameserver.lower())
+        if infos[0][4][:2] in seen:
+            continue
+        seen.add(infos[0][4][:2])
+        addresses.append((infos[0][0], infos[0][4][:2], nameserver))
+    return addresses
+
+
+def wait_for_propagation(record_set_name, record_set_type, expected_values, nameservers, timeout=PROPAGATION_TIMEOUT,
+                         retry_interval=PROPAGATION_RETRY_INTERVAL):
+    """
+Queries every name server in parallel until all of them answer the expected record set state.
+
+    :param record_set_name: (string) -- record set name, eg: app.example.com.
+
+    :param record_set_type: (string) -- one of DNS_RECORD_TYPE_CODES, eg: A
+
+    :param expected_values: (list) -- see answer_matches: exact values, None for any value, [] for no record set.
+
+    :param nameservers: (list) -- name servers as host or host:port, eg: the hosted zone DelegationSet NameServers.
+
+    :param timeout: (float) -- seconds to wait before giving up.
+
+    :param retry_interval: (float) -- seconds between two queries to a server that did not answer the expected state.
+
+    :return: (dict) {name server: seconds it took to answer the expected state}
+
+    :raise TimeoutError: if some servers still do not answer the expected state after timeout seconds.
+    """
+    if record_set_type not in DNS_RECORD_TYPE_CODES:
+        raise ValueError('Not supported record type: ' + str(record_set_type))
+
+    started = time.monotonic()
+    servers = {}
+    try:
+        for family, address, nameserver in resolve_nameservers(nameservers):
+            server_socket = socket.socket(family, socket.SOCK_DGRAM)
+            server_socket.setblocking(False)
+            servers[server_socket] = {'address': address, 'nameserver': nameserver, 'query_id': None,
+                                      'next_query': started}
+
+        in_sync = {}
+        while len(in_sync) < len(servers):
+            now = time.monotonic()
+            if now - started >= timeout:
+                raise TimeoutError(str(record_set_name) + ' ' + str(record_set_type) + ' not propagated after ' +
+                                   '%.1f' % (now - started) + 's on ' + ', '.join(
+                                       server['nameserver'] for server in servers.values()
+                                       if server['nameserver'] not in in_sync))
+
+            for server_socket, server in servers.items():
+                if server['nameserver'] not in in_sync and server['next_query'] <= now:
+                    server['query_id'] = random.randint(0, 0xFFFF)
+                    server['next_query'] = now + retry_interval
+                    try:
+                        server_socket.sendto(build_query(record_set_name, record_set_type, server['query_id']),
+                                             server['address'])
+                    except (OSError, socket.error):
+                        # eg: network unreachable, retried with the next query.
+                        pass
+
+            waiting = [server_socket for server_socket, server in servers.items()
+                       if server['nameserver'] not in in_sync]
+            next_query = min(servers[server_socket]['next_query'] for server_socket in waiting)
+            readable = select.select(waiting, [], [], max(0, min(next_query, started + timeout) - now))[0]
+
+            for server_socket in readable:
+                server = servers[server_socket]
+                try:
+                    message, sender = server_socket.recvfrom(65535)
+                    response = parse_response(message)
+                except (OSError, socket.error, ValueError, IndexError, struct.error):
+                    continue
+                # Late answers to a previous query, or datagrams from elsewhere, are ignored.
+                if response[0] != server['query_id'] or sender[:2] != server['address']:
+                    continue
+                if answer_matches(response, record_set_name, record_set_type, expected_values):
+                    in_sync[server['nameserver']] = time.monotonic() - started
+        return in_sync
+    finally:
+        for server_socket in servers:
+            server_socket.close()
@@ -0,0 +1,103 @@
+"""
+Desired state reconciliation of a Route53 hosted zone.
+
+Desired and live record sets are keyed by (name, type, SetIdentifier) and compared through a digest of their
+canonical form, so the diff is a single pass over both sides whatever the zone size, and only the record sets whose
+digest differs end up in the change batches:
+
+    desired only            -> CREATE
+    both, digests differ    -> UPSERT
+    live only               -> DELETE (unless pruning is disabled)
+
+The SOA and NS record sets of the zone apex are managed by Route53 and never deleted.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from route53_helpers import normalize_record_name
+
+RECONCILE_CREATE = 'CREATE'
+RECONCILE_UPSERT = 'UPSERT'
+RECONCILE_DELETE = 'DELETE'
+
+# Changes are submitted in this order, so a record set replaced by another type (eg: A -> CNAME) is deleted before
+# the new one is created when they do not fit in the same change batch.
+RECONCILE_ACTIONS = (RECONCILE_DELETE, RECONCILE_CREATE, RECONCILE_UPSERT)
+
+
+def record_set_key(resource_record_sets):
+    return (normalize_record_name(resource_record_sets['Name']), str(resource_record_sets['Type']).upper(),
+            resource_record_sets.get('SetIdentifier', ''))
+
+
+def _canonical_record_set(resource_record_sets):
+    # Route53 returns names lowercased with a trailing dot, and does not keep the order of the values.
+    canonical = dict(resource_record_sets)
+    canonical['Name'] = normalize_record_name(canonical['Name'])
+    canonical['Type'] = str(canonical['Type']).upper()
+    if 'TTL' in canonical:
+        canonical['TTL'] = int(canonical['TTL'])
+    if 'ResourceRecords' in canonical:
+        canonical['ResourceRecords'] = sorted(str(record_values['Value'])
+                                              for record_values in canonical['ResourceRecords'])
+    if 'AliasTarget' in canonical:
+        alias_target = dict(canonical['AliasTarget'])
+        alias_target['DNSName'] = normalize_record_name(alias_target['DNSName'])
+        canonical['AliasTarget'] = alias_target
+    return canonical
+
+
+def record_set_digest(resource_record_sets):
+    """
+Digest of the canonical form of a record set: equal digests mean that no change is needed.
+    """
+    canonical = json.dumps(_canonical_record_set(resource_record_sets), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def is_zone_apex_managed(resource_record_sets, zone_name):
+    return (resource_record_sets['Type'] in ('SOA', 'NS') and
+            normalize_record_name(resource_record_sets['Name']) == normalize_record_name(zone_name))
+
+
+def reconcile_changes(desired_record_sets, live_record_sets, zone_name, prune=True):
+    """
+Computes the minimal list of Change elements turning live_record_sets into desired_record_sets.
+
+    :param desired_record_sets: (list) -- desired ResourceRecordSet elements, eg: route53_helpers.load_record_sets
+
+    :param live_record_sets: (iterable) -- live ResourceRecordSet elements of the hosted zone, consumed once.
+
+    :param zone_name: (string) -- hosted zone name, eg: example.com.
+
+    :param prune: (bool) -- delete the live record sets missing from the desired state.
+
+    :return: (list) Change elements, in RECONCILE_ACTIONS order.
+    """
+    desired = OrderedDict()
+    for resource_record_sets in desired_record_sets:
+        key = record_set_key(resource_record_sets)
+        if key in desired:
+            raise ValueError('Duplicated record set in the desired state: ' + ' '.join(str(part) for part in key))
+        desired[key] = (record_set_digest(resource_record_sets), resource_record_sets)
+
+    changes = dict((action, []) for action in RECONCILE_ACTIONS)
+    seen = set()
+    for resource_record_sets in live_record_sets:
+        key = record_set_key(resource_record_sets)
+        seen.add(key)
+        if key in desired:
+            digest, desired_record_set = desired[key]
+            if digest != record_set_digest(resource_record_sets):
+                changes[RECONCILE_UPSERT].append({'Action': RECONCILE_UPSERT, 'ResourceRecordSet': desired_record_set})
+        elif prune and not is_zone_apex_managed(resource_record_sets, zone_name):
+            # DELETE needs the exact live record set, values and TTL included.
+            changes[RECONCILE_DELETE].append({'Action': RECONCILE_DELETE, 'ResourceRecordSet': resource_record_sets})
+
+    for key, (digest, desired_record_set) in desired.items():
+        if key not in seen:
+            changes[RECONCILE_CREATE].append({'Action': RECONCILE_CREATE, 'ResourceRecordSet': desired_record_set})
+
+    return [change for action in RECONCILE_ACTIONS for change in changes[action]]
@@ -0,0 +1,300 @@
+"""
+Throttling aware retries for the Route53 API calls.
+
+Route53 answers with Throttling when an account goes over its 5 requests per second, and with PriorRequestNotComplete
+while a previous change to the same hosted zone is being applied; 20 Jenkins builds touching DNS at once get both.
+get_route53_client (route53_helpers) returns its clients wrapped in a RetryingClient, which runs every API call:
+
+    - through an AdaptiveTokenBucket: the client side rate starts at the Route53 quota, is halved on every Throttling
+      error and grows back slowly with successful calls (AIMD), so a throttled process backs off instead of hammering;
+    - with up to RETRY_MAX_ATTEMPTS attempts on throttling, PriorRequestNotComplete, 5xx and connection errors,
+      sleeping a random time between 0 and RETRY_BASE_DELAY * 2^attempt seconds (capped to RETRY_MAX_DELAY) between
+      attempts ("full jitter"), so builds throttled together do not retry together.
+
+ChangeResourceRecordSets calls with CREATE or DELETE changes are not idempotent: replayed after Route53 applied them,
+they fail with InvalidChangeBatch. Those are only retried right away on errors showing the request was not processed
+(throttling, PriorRequestNotComplete, connection errors before it was sent). After a 5xx or a read timeout, the
+change batch may have been applied: the live record sets are read again (change_batch_state) and the call is retried
+if the batch was not applied, answered with an APPLIED_CHANGE_ID ChangeInfo if it was, and fails otherwise.
+
+Other errors (eg: InvalidChangeBatch, AccessDenied) are raised right away, and so is the last error once the attempts
+are exhausted: callers never mistake a throttled call for a missing record. Retries and throttle time are counted in
+RETRY_STATS, printed to stderr at exit when any retry happened.
+
+botocore's own retries are disabled on these clients (max_attempts 0): the pinned boto3 1.9 / botocore 1.12 only have
+the legacy retry mode, without client side rate limiting.
+"""
+
+import atexit
+import random
+import sys
+import threading
+import time
+
+from route53_helpers import TokenBucket, ROUTE53_REQUESTS_PER_SECOND
+
+RETRY_MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20
+
+# AdaptiveTokenBucket: rate multiplied by RETRY_RATE_DECREASE on throttle, increased by RETRY_RATE_INCREASE requests
+# per second on success, kept between RETRY_MIN_RATE and the Route53 quota.
+RETRY_RATE_DECREASE = 0.5
+RETRY_RATE_INCREASE = 0.1
+RETRY_MIN_RATE = 0.5
+
+THROTTLING_ERROR_CODES = ('Throttling', 'ThrottlingException', 'RequestLimitExceeded')
+# The hosted zone is still applying a previous change: worth retrying, but says nothing about the request rate.
+BUSY_ERROR_CODES = ('PriorRequestNotComplete',)
+TRANSIENT_ERROR_CODES = ('InternalError', 'InternalFailure', 'ServiceUnavailable', 'RequestTimeout')
+
+# change_batch_state results.
+CHANGE_BATCH_APPLIED = 'applied'
+CHANGE_BATCH_NOT_APPLIED = 'not applied'
+
+# ChangeInfo.Id of a change batch found applied after its call failed: Route53 never returned its ID, so it can not be
+# polled with GetChange (see route53_helpers.wait_for_change).
+APPLIED_CHANGE_ID = ''
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+TokenBucket whose rate adapts to the throttling responses (additive increase, multiplicative decrease).
+    """
+    def __init__(self, max_rate=ROUTE53_REQUESTS_PER_SECOND, min_rate=RETRY_MIN_RATE):
+        super(AdaptiveTokenBucket, self).__init__(max_rate)
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * RETRY_RATE_DECREASE)
+            # Drop the burst allowance too, or the next calls would go out at once and be throttled again.
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RETRY_RATE_INCREASE)
+
+
+class RetryStats(object):
+    """
+Thread safe counters of the API calls done through RetryingClient.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.failures = 0
+        self.retry_sleep_seconds = 0.0
+        self.rate_limit_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, calls=0, retries=0, throttles=0, failures=0, retry_sleep_seconds=0.0,
+               rate_limit_wait_seconds=0.0):
+        with self._lock:
+            self.calls += calls
+            self.retries += retries
+            self.throttles += throttles
+            self.failures += failures
+            self.retry_sleep_seconds += retry_sleep_seconds
+            self.rate_limit_wait_seconds += rate_limit_wait_seconds
+
+    def __str__(self):
+        return ('route53 calls: ' + str(self.calls) + ', retries: ' + str(self.retries) + ', throttled: ' +
+                str(self.throttles) + ', failed: ' + str(self.failures) + ', retry sleep: ' +
+                '%.1f' % self.retry_sleep_seconds + 's, rate limit wait: ' + '%.1f' % self.rate_limit_wait_seconds +
+                's')
+
+
+RETRY_STATS = RetryStats()
+
+
+def _print_retry_stats():
+    if RETRY_STATS.retries or RETRY_STATS.failures:
+        print(str(RETRY_STATS), file=sys.stderr)
+
+
+atexit.register(_print_retry_stats)
+
+
+def _error_kind(error, idempotent=True):
+    # Returns 'throttling', 'busy', 'transient', 'ambiguous' (may have been processed, not idempotent) or None (not
+    # retryable).
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+    if isinstance(error, ClientError):
+        error_code = error.response.get('Error', {}).get('Code', '')
+        status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        if error_code in THROTTLING_ERROR_CODES or status_code == 429:
+            return 'throttling'
+        if error_code in BUSY_ERROR_CODES:
+            return 'busy'
+        if error_code in TRANSIENT_ERROR_CODES or status_code >= 500:
+            return 'transient' if idempotent else 'ambiguous'
+        return None
+    # botocore ConnectionError: endpoint, proxy, SSL or connect timeout errors, raised before the request is sent.
+    if isinstance(error, ConnectionError):
+        return 'transient'
+    # HTTPClientError: read timeout, connection closed... once the request was sent.
+    if isinstance(error, HTTPClientError):
+        return 'transient' if idempotent else 'ambiguous'
+    return None
+
+
+def is_idempotent(operation_name, kwargs):
+    """
+Tells whether an API call can be replayed safely: every call but ChangeResourceRecordSets with CREATE or DELETE
+changes, which fail once applied.
+    """
+    if operation_name != 'change_resource_record_sets':
+        return True
+    return all(change.get('Action') == 'UPSERT' for change in kwargs.get('ChangeBatch', {}).get('Changes', []))
+
+
+def change_batch_state(aws_dns, hosted_zone_id, change_batch):
+    """
+Tells from the live record sets whether a change batch was applied. Route53 applies a batch atomically, so its CREATE
+and DELETE changes are all applied or none is; UPSERT changes are not looked at, the record sets they replaced being
+unknown.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone the batch was submitted to.
+
+    :param change_batch: (dict) -- ChangeBatch element, eg: {'Changes': [...]}
+
+    :return: (string) CHANGE_BATCH_APPLIED, CHANGE_BATCH_NOT_APPLIED or None when the record sets match neither.
+    """
+    from route53_helpers import get_resource_record_set
+    from route53_reconcile import record_set_digest
+
+    applied, not_applied = True, True
+    for change in change_batch['Changes']:
+        if change['Action'] == 'UPSERT':
+            continue
+        resource_record_sets = change['ResourceRecordSet']
+        live_record_sets = get_resource_record_set(aws_dns, hosted_zone_id, resource_record_sets['Name'],
+                                                   resource_record_sets['Type'],
+                                                   resource_record_sets.get('SetIdentifier'))
+        live_matches = live_record_sets is not None and \
+            record_set_digest(live_record_sets) == record_set_digest(resource_record_sets)
+        if change['Action'] == 'CREATE':
+            applied, not_applied = applied and live_matches, not_applied and live_record_sets is None
+        else:
+            applied, not_applied = applied and live_record_sets is None, not_applied and live_matches
+
+    if applied:
+        return CHANGE_BATCH_APPLIED
+    if not_applied:
+        return CHANGE_BATCH_NOT_APPLIED
+    return None
+
+
+def _applied_change_response(change_batch):
+    change_info = {'Id': APPLIED_CHANGE_ID, 'Status': 'PENDING',
+                   'SubmittedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    if change_batch.get('Comment'):
+        change_info['Comment'] = change_batch['Comment']
+    return {'ChangeInfo': change_info}
+
+
+def retry_delay(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """
+Full jitter exponential backoff: a random delay between 0 and base_delay * 2^attempt seconds, capped to max_delay.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retry(operation, operation_name, rate_limiter, stats=RETRY_STATS, max_attempts=RETRY_MAX_ATTEMPTS,
+                    applied_state=None, **kwargs):
+    """
+Calls operation(**kwargs), waiting for rate_limiter before every attempt and retrying throttling and transient errors
+with jittered exponential backoff. Calls that are not idempotent (see is_idempotent) are only retried after an error
+that may have been processed (5xx, read timeout) when applied_state reports them as not applied.
+
+    :param operation: (callable) -- botocore client method, eg: client.change_resource_record_sets
+
+    :param operation_name: (string) -- name printed in the retry messages, eg: change_resource_record_sets
+
+    :param rate_limiter: (AdaptiveTokenBucket) -- client side rate limiter, shared by the calls of a client.
+
+    :param stats: (RetryStats) -- counters to update.
+
+    :param max_attempts: (int) -- attempts before the last error is raised.
+
+    :param applied_state: (callable) -- returns CHANGE_BATCH_APPLIED, CHANGE_BATCH_NOT_APPLIED or None for the call,
+    eg: change_batch_state. Without it, such errors are raised.
+
+    :return: the operation response.
+    """
+    stats.record(calls=1)
+    idempotent = is_idempotent(operation_name, kwargs)
+    attempt = 0
+    while True:
+        stats.record(rate_limit_wait_seconds=rate_limiter.acquire())
+        try:
+            response = operation(**kwargs)
+        except Exception as error:
+            error_kind = _error_kind(error, idempotent)
+            if error_kind == 'ambiguous':
+                state = None
+                if applied_state is not None:
+                    try:
+                        state = applied_state()
+                    except Exception as state_error:
+                        print('route53 ' + operation_name + ' state unknown: ' + str(state_error), file=sys.stderr)
+                if state == CHANGE_BATCH_APPLIED:
+                    print('route53 ' + operation_name + ' applied despite the error: ' + str(error), file=sys.stderr)
+                    return _applied_change_response(kwargs.get('ChangeBatch', {}))
+                error_kind = 'transient' if state == CHANGE_BATCH_NOT_APPLIED else None
+
+            if error_kind == 'throttling':
+                rate_limiter.throttled()
+            if error_kind in ('throttling', 'busy'):
+                stats.record(throttles=1)
+
+            attempt += 1
+            if error_kind is None or attempt >= max_attempts:
+                stats.record(failures=1)
+                raise
+
+            delay = retry_delay(attempt)
+            stats.record(retries=1, retry_sleep_seconds=delay)
+            print('route53 ' + operation_name + ' ' + error_kind + ' error, retry ' + str(attempt) + '/' +
+                  str(max_attempts - 1) + ' in ' + '%.1f' % delay + 's: ' + str(error), file=sys.stderr)
+            time.sleep(delay)
+            continue
+
+        rate_limiter.succeeded()
+        return response
+
+
+class RetryingClient(object):
+    """
+Wraps a botocore client so every API method goes through call_with_retry. Other attributes (meta, exceptions,
+get_paginator...) are the ones of the wrapped client.
+    """
+    _NOT_WRAPPED = ('get_paginator', 'get_waiter', 'can_paginate', 'generate_presigned_url')
+
+    def __init__(self, client, rate_limiter=None, stats=RETRY_STATS):
+        self._client = client
+        self._rate_limiter = rate_limiter or AdaptiveTokenBucket()
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or name in self._NOT_WRAPPED or not callable(attribute):
+            return attribute
+
+        def retrying_operation(**kwargs):
+            applied_state = None
+            if name == 'change_resource_record_sets':
+                def applied_state():
+                    return change_batch_state(self, kwargs['HostedZoneId'], kwargs['ChangeBatch'])
+            return call_with_retry(attribute, name, self._rate_limiter, self._stats, applied_state=applied_state,
+                                   **kwargs)
+
+        # Cached on the instance, so __getattr__ only runs once per method.
+        setattr(self, name, retrying_operation)
+        return retrying_operation
@@ -0,0 +1,59 @@
+"""
+Concurrent sweep of the record sets of every hosted zone of an AWS account.
+
+Zones are fetched by a thread pool sharing one route53 client (boto3 clients are thread safe, see
+route53_helpers.get_route53_client). Every HTTP request the client sends, retries included, first takes a token from a
+TokenBucket sized to the Route53 quota, so raising the concurrency never gets the account throttled: it only lets
+small zones be fetched while big ones are still being paged.
+"""
+
+from route53_helpers import TokenBucket, ROUTE53_REQUESTS_PER_SECOND
+from route53_cache import iter_account_hosted_zones, iter_zone_record_sets
+
+SWEEP_MAX_WORKERS = 8
+
+_RATE_LIMIT_EVENT = 'before-send.route53'
+_RATE_LIMIT_HANDLER_ID = 'jenkins-dns-route53-sweep-rate-limit'
+
+
+def _fetch_zone_record_sets(aws_dns, hosted_zone):
+    return hosted_zone, list(iter_zone_record_sets(aws_dns, hosted_zone['Id']))
+
+
+def iter_account_record_sets(aws_dns, cache_key, max_workers=SWEEP_MAX_WORKERS,
+                             requests_per_second=ROUTE53_REQUESTS_PER_SECOND):
+    """
+Fetches the record sets of every hosted zone of the account concurrently and yields each zone as soon as all its
+record sets are fetched, so output starts with the first finished zone rather than after the whole sweep.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param cache_key: (string) -- identifies the AWS account the client belongs to, eg: the credentials cache_key.
+
+    :param max_workers: (int) -- number of hosted zones fetched at the same time.
+
+    :param requests_per_second: (float) -- client side rate limit for the Route53 API calls done by the sweep.
+
+    :return: generator of (HostedZone dict, list of ResourceRecordSet dicts) tuples, in completion order.
+    """
+    # Imported here: concurrent.futures pulls logging in, a third of the route53_engine import time (see route53_cli).
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    rate_limiter = TokenBucket(requests_per_second)
+    aws_dns.meta.events.register(_RATE_LIMIT_EVENT, rate_limiter.before_send, unique_id=_RATE_LIMIT_HANDLER_ID)
+
+    try:
+        hosted_zones = list(iter_account_hosted_zones(aws_dns, cache_key))
+
+        with ThreadPoolExecutor(max_workers=int(max_workers)) as executor:
+            futures = [executor.submit(_fetch_zone_record_sets, aws_dns, hosted_zone) for hosted_zone in hosted_zones]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # Stop fetching the remaining zones if the caller stops iterating or a zone fails.
+                for future in futures:
+                    future.cancel()
+
+    finally:
+        aws_dns.meta.events.unregister(_RATE_LIMIT_EVENT, unique_id=_RATE_LIMIT_HANDLER_ID)
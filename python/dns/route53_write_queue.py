@@ -0,0 +1,256 @@
+"""
+Per hosted zone write queue coalescing the Route53 changes of concurrent processes into shared ChangeBatches.
+
+Route53 applies the changes of a hosted zone one ChangeBatch at a time and answers PriorRequestNotComplete to the
+ones sent while another is PENDING, so parallel pipeline stages updating records of the same zone mostly wait and
+retry (see route53_retry). With the queue enabled, create/update/delete (route53_engine) go through submit_change:
+
+    - the change is appended to a SQLite queue (ROUTE53_WRITE_QUEUE_PATH) shared by every process of the agent;
+    - the writer takes the zone flock; whoever holds it waits ROUTE53_WRITE_QUEUE_WINDOW seconds for the other stages
+      to enqueue their changes, then submits every pending change of the zone enqueued with the same credentials
+      (their cache_key) in as few ChangeBatches as possible. Changes of other credentials are left to their writers,
+      which flush them with their own client once they get the lock: a change is never submitted, nor its error
+      reported, under another job's principal;
+    - writers whose change was submitted meanwhile find it done once they get the lock, and return its ChangeInfo.
+
+Route53 rejects a ChangeBatch changing the same record set twice, so such changes go in the next batch, keeping the
+enqueue order. A batch rejected as a whole because of one invalid change (eg: CREATE of a record set created by
+another stage) is submitted again change by change, so every writer gets the result of its own change.
+
+The queue is disabled unless ROUTE53_WRITE_QUEUE_WINDOW is set to a positive number of seconds, eg:
+
+    $ export ROUTE53_WRITE_QUEUE_WINDOW=0.5
+"""
+
+import fcntl
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from route53_helpers import iter_change_batches
+from route53_reconcile import record_set_key
+
+WRITE_QUEUE_WINDOW = float(os.environ.get('ROUTE53_WRITE_QUEUE_WINDOW', '0'))
+WRITE_QUEUE_PATH = os.environ.get('ROUTE53_WRITE_QUEUE_PATH',
+                                  os.path.join(os.path.expanduser('~'), '.cache', 'jenkins-dns',
+                                               'route53-writes.sqlite'))
+
+# Seconds a process waits for another one holding the SQLite write lock.
+WRITE_QUEUE_LOCK_TIMEOUT = 30
+
+# Pending changes older than this (eg: enqueued by a process killed before the flush) are failed, not submitted.
+WRITE_QUEUE_MAX_AGE = 900
+
+# Route53 ChangeBatch Comment length limit.
+CHANGE_BATCH_COMMENT_MAX_LENGTH = 256
+
+CHANGE_PENDING = 'pending'
+CHANGE_SUBMITTED = 'submitted'
+CHANGE_FAILED = 'failed'
+
+_WRITE_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hosted_zone_id TEXT,
+    enqueued_at REAL,
+    comment TEXT,
+    change TEXT,
+    status TEXT,
+    result TEXT,
+    credentials_key TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_pending ON changes (hosted_zone_id, status);
+"""
+
+
+class QueuedChangeError(Exception):
+    """
+A change submitted through the write queue was rejected by Route53 (or expired before being submitted).
+    """
+
+
+def write_queue_enabled():
+    return WRITE_QUEUE_WINDOW > 0
+
+
+def _zone_key(hosted_zone_id):
+    return str(hosted_zone_id).replace('/hostedzone/', '')
+
+
+def _ensure_queue_dir():
+    queue_dir = os.path.dirname(WRITE_QUEUE_PATH)
+    if queue_dir and not os.path.isdir(queue_dir):
+        os.makedirs(queue_dir, exist_ok=True)
+
+
+def _connect():
+    _ensure_queue_dir()
+
+    # One short lived connection per call: sqlite3 connections can not be shared between threads.
+    conn = sqlite3.connect(WRITE_QUEUE_PATH, timeout=WRITE_QUEUE_LOCK_TIMEOUT)
+    conn.executescript(_WRITE_QUEUE_SCHEMA)
+    # Queues created before credentials_key existed: their pending rows match no credentials and expire.
+    if 'credentials_key' not in [column[1] for column in conn.execute('PRAGMA table_info(changes)')]:
+        with conn:
+            conn.execute('ALTER TABLE changes ADD COLUMN credentials_key TEXT')
+    return conn
+
+
+@contextmanager
+def _zone_lock(hosted_zone_id):
+    # flock locks belong to the open file, so they exclude both other processes and other threads (route53_agent), and
+    # are released by the kernel if the holder dies.
+    with open(WRITE_QUEUE_PATH + '.' + _zone_key(hosted_zone_id) + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _merged_comment(rows):
+    comments = []
+    for _, comment, _ in rows:
+        if comment and comment not in comments:
+            comments.append(comment)
+    return '; '.join(comments)[:CHANGE_BATCH_COMMENT_MAX_LENGTH]
+
+
+def _is_invalid_change_batch(error):
+    error_code = getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+    return error_code in ('InvalidChangeBatch', 'InvalidInput')
+
+
+def _submit_rows(aws_dns, hosted_zone_id, rows):
+    # Returns [(status, result, row id)], result being the ChangeInfo JSON or the error message.
+    change_batch = {'Changes': [change for _, _, change in rows]}
+    comment = _merged_comment(rows)
+    if comment:
+        change_batch['Comment'] = comment
+
+    try:
+        change_info = aws_dns.change_resource_record_sets(HostedZoneId=hosted_zone_id,
+                                                          ChangeBatch=change_batch)['ChangeInfo']
+        result = json.dumps(change_info, default=str)
+        return [(CHANGE_SUBMITTED, result, row_id) for row_id, _, _ in rows]
+    except Exception as error:
+        if len(rows) == 1 or not _is_invalid_change_batch(error):
+            return [(CHANGE_FAILED, str(error), row_id) for row_id, _, _ in rows]
+
+    results = []
+    for row in rows:
+        results.extend(_submit_rows(aws_dns, hosted_zone_id, [row]))
+    return results
+
+
+def _coalesced_batches(rows):
+    # Splits the pending rows, in enqueue order, into ChangeBatches that change each record set once and fit the
+    # Route53 limits (see route53_helpers.iter_change_batches).
+    rounds, keys = [[]], set()
+    for row in rows:
+        key = record_set_key(row[2]['ResourceRecordSet'])
+        if key in keys:
+            rounds.append([])
+            keys = set()
+        rounds[-1].append(row)
+        keys.add(key)
+
+    for round_rows in rounds:
+        rows_by_change = dict((id(row[2]), row) for row in round_rows)
+        for batch in iter_change_batches(row[2] for row in round_rows):
+            yield [rows_by_change[id(change)] for change in batch]
+
+
+def _flush_zone(conn, aws_dns, hosted_zone_id, credentials_key):
+    zone_key = _zone_key(hosted_zone_id)
+    with conn:
+        conn.execute('UPDATE changes SET status = ?, result = ? WHERE hosted_zone_id = ? AND status = ? AND '
+                     'enqueued_at < ?', (CHANGE_FAILED, 'expired before being submitted', zone_key, CHANGE_PENDING,
+                                         time.time() - WRITE_QUEUE_MAX_AGE))
+
+    rows = [(row_id, comment, json.loads(change)) for row_id, comment, change in conn.execute(
+        'SELECT id, comment, change FROM changes WHERE hosted_zone_id = ? AND status = ? AND credentials_key = ? '
+        'ORDER BY id', (zone_key, CHANGE_PENDING, credentials_key))]
+
+    batch_count = 0
+    for batch_rows in _coalesced_batches(rows):
+        results = _submit_rows(aws_dns, hosted_zone_id, batch_rows)
+        batch_count += 1
+        with conn:
+            conn.executemany('UPDATE changes SET status = ?, result = ? WHERE id = ?', results)
+
+    print('route53 write queue: ' + str(len(rows)) + ' changes to ' + zone_key + ' submitted in ' +
+          str(batch_count) + ' ChangeBatch')
+
+
+def submit_change(aws_dns, hosted_zone_id, change, comment='', credentials_key=''):
+    """
+Submits a single Change to a hosted zone, straight away when the write queue is disabled, or coalesced with the
+changes other processes enqueued for the same zone otherwise.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param hosted_zone_id: (string) The ID of the hosted zone the change applies to.
+
+    :param change: (dict) -- Change element, eg: {'Action': 'UPSERT', 'ResourceRecordSet': {...}}
+
+    :param comment: (string) -- ChangeBatch comment. Coalesced changes share a ChangeBatch with the distinct comments
+    joined.
+
+    :param credentials_key: (string) -- identifies the credentials of aws_dns, eg: the credentials cache_key. Only
+    changes enqueued with the same credentials are coalesced.
+
+    :return: (dict) {'ChangeInfo': ...} of the ChangeBatch the change was submitted in.
+
+    :raise QueuedChangeError: if Route53 rejected the change submitted through the queue.
+    """
+    if not write_queue_enabled():
+        return aws_dns.change_resource_record_sets(HostedZoneId=hosted_zone_id,
+                                                   ChangeBatch={'Comment': str(comment), 'Changes': [change]})
+
+    credentials_key = str(credentials_key)
+    conn = _connect()
+    try:
+        with conn:
+            row_id = conn.execute('INSERT INTO changes (hosted_zone_id, enqueued_at, comment, change, status, '
+                                  'credentials_key) VALUES (?, ?, ?, ?, ?, ?)',
+                                  (_zone_key(hosted_zone_id), time.time(), str(comment), json.dumps(change),
+                                   CHANGE_PENDING, credentials_key)).lastrowid
+
+        with _zone_lock(hosted_zone_id):
+            status, = conn.execute('SELECT status FROM changes WHERE id = ?', (row_id,)).fetchone()
+            if status == CHANGE_PENDING:
+                # Gives the stages writing to the same zone a chance to enqueue before the batch is sent.
+                time.sleep(WRITE_QUEUE_WINDOW)
+                _flush_zone(conn, aws_dns, hosted_zone_id, credentials_key)
+
+        with conn:
+            status, result = conn.execute('SELECT status, result FROM changes WHERE id = ?', (row_id,)).fetchone()
+            conn.execute('DELETE FROM changes WHERE id = ?', (row_id,))
+    finally:
+        conn.close()
+
+    if status != CHANGE_SUBMITTED:
+        raise QueuedChangeError(result)
+    return {'ChangeInfo': json.loads(result)}
+
+
+def submit_change_batch(aws_dns, hosted_zone_id, changes, comment=''):
+    """
+Submits changes to a hosted zone as a single, atomic ChangeBatch. They are not coalesced with the queued changes, but
+when the write queue is enabled the zone lock is held meanwhile, so the batch does not race the flush of another
+writer into PriorRequestNotComplete.
+
+    :param changes: (list) -- Change elements, fitting the Route53 limits (see route53_helpers.change_batch_size).
+
+    :return: (dict) the ChangeResourceRecordSets response.
+    """
+    change_batch = {'Comment': str(comment), 'Changes': list(changes)}
+    if not write_queue_enabled():
+        return aws_dns.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch=change_batch)
+
+    _ensure_queue_dir()
+    with _zone_lock(hosted_zone_id):
+        return aws_dns.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch=change_batch)
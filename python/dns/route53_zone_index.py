@@ -0,0 +1,136 @@
+"""
+In-process index of the account hosted zones, to find the hosted zone a record name belongs to without a separate
+lookup job.
+
+Zones are stored in a trie keyed by their labels in reverse order (com -> example -> internal), so resolving a name
+walks its labels once from the TLD down and the deepest zone found is the longest (most specific) match, eg:
+
+    example.com.            public   Z1
+    internal.example.com.   private  Z2
+
+    app.internal.example.com.  -> Z2 ('private' or no preference), Z1 ('public')
+    www.example.com.           -> Z1
+"""
+
+import threading
+
+from route53_cache import iter_account_hosted_zones
+
+ZONE_VISIBILITY_PUBLIC = 'public'
+ZONE_VISIBILITY_PRIVATE = 'private'
+
+_ZONES_KEY = None
+
+_hosted_zone_indexes = {}
+_hosted_zone_indexes_lock = threading.Lock()
+
+
+def _reversed_labels(dns_name):
+    return [label for label in reversed(str(dns_name).lower().rstrip('.').split('.')) if label]
+
+
+def _zone_visibility(hosted_zone):
+    if hosted_zone.get('Config', {}).get('PrivateZone'):
+        return ZONE_VISIBILITY_PRIVATE
+    return ZONE_VISIBILITY_PUBLIC
+
+
+class HostedZoneIndex(object):
+    """
+Reversed-label trie of hosted zones. Every node is a dict of child labels; the zones named after the node path are
+kept under the _ZONES_KEY (None) key, which can not clash with a label.
+    """
+    def __init__(self, hosted_zones=()):
+        self._root = {}
+        for hosted_zone in hosted_zones:
+            self.add(hosted_zone)
+
+    def add(self, hosted_zone):
+        node = self._root
+        for label in _reversed_labels(hosted_zone['Name']):
+            node = node.setdefault(label, {})
+        node.setdefault(_ZONES_KEY, []).append(hosted_zone)
+
+    def resolve(self, record_set_name, zone_visibility=''):
+        """
+Returns the hosted zone with the longest name that record_set_name belongs to.
+
+    :param record_set_name: (string) -- fully qualified record name, eg: app.internal.example.com.
+
+    :param zone_visibility: (string) -- public | private to prefer that kind of zone. The longest zone of the
+    preferred kind wins even if a longer zone of the other kind matches; zones of the other kind are only returned
+    when no zone of the preferred kind matches. Empty for no preference, then public zones win ties.
+
+    :return: HostedZone dict or None if no hosted zone matches.
+        """
+        best_preferred, best_other = None, None
+
+        node = self._root
+        for label in _reversed_labels(record_set_name):
+            node = node.get(label)
+            if node is None:
+                break
+            hosted_zones = node.get(_ZONES_KEY)
+            if not hosted_zones:
+                continue
+
+            preferred = [hosted_zone for hosted_zone in hosted_zones
+                         if not zone_visibility or _zone_visibility(hosted_zone) == zone_visibility]
+            if preferred:
+                # Stable sort: public zones first, so they win ties when there is no preference.
+                preferred.sort(key=lambda hosted_zone: _zone_visibility(hosted_zone) != ZONE_VISIBILITY_PUBLIC)
+                best_preferred = preferred[0]
+            else:
+                best_other = hosted_zones[0]
+
+        return best_preferred or best_other
+
+
+def get_hosted_zone_index(aws_dns, cache_key):
+    """
+Returns the HostedZoneIndex of the account aws_dns belongs to, built once per process from a paginated
+ListHostedZones (served from the local zone cache when enabled, see route53_cache).
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param cache_key: (string) -- identifies the AWS account the client belongs to, eg: the credentials cache_key.
+
+    :return: (HostedZoneIndex)
+    """
+    with _hosted_zone_indexes_lock:
+        hosted_zone_index = _hosted_zone_indexes.get(cache_key)
+        if hosted_zone_index is None:
+            hosted_zone_index = HostedZoneIndex(iter_account_hosted_zones(aws_dns, cache_key))
+            _hosted_zone_indexes[cache_key] = hosted_zone_index
+
+    return hosted_zone_index
+
+
+def resolve_hosted_zone_id(aws_dns, cache_key, hosted_zone_id_arg, record_set_name):
+    """
+Returns hosted_zone_id_arg unless it is empty, 'public' or 'private', in which case the hosted zone that
+record_set_name belongs to is looked up in the account HostedZoneIndex with that visibility preference.
+
+    :param aws_dns: (botocore.client.Route53) -- route53 client, eg: session.client('route53')
+
+    :param cache_key: (string) -- identifies the AWS account the client belongs to, eg: the credentials cache_key.
+
+    :param hosted_zone_id_arg: (string) -- hosted zone ID, eg: /hostedzone/Z2WI7FSN6LUJNR, or '' | public | private
+
+    :param record_set_name: (string) -- fully qualified record name, eg: app.internal.example.com.
+
+    :return: (string) hosted zone ID, eg: /hostedzone/Z2WI7FSN6LUJNR, or None if no hosted zone matches.
+    """
+    hosted_zone_id_arg = str(hosted_zone_id_arg or '')
+    if hosted_zone_id_arg not in ('', ZONE_VISIBILITY_PUBLIC, ZONE_VISIBILITY_PRIVATE):
+        return hosted_zone_id_arg
+
+    hosted_zone = get_hosted_zone_index(aws_dns, cache_key).resolve(record_set_name, hosted_zone_id_arg)
+    if hosted_zone is None:
+        # The index may predate the hosted zone in long running processes (see route53_agent): rebuild it once.
+        with _hosted_zone_indexes_lock:
+            _hosted_zone_indexes.pop(cache_key, None)
+        hosted_zone = get_hosted_zone_index(aws_dns, cache_key).resolve(record_set_name, hosted_zone_id_arg)
+    if hosted_zone is None:
+        return None
+    return hosted_zone['Id']
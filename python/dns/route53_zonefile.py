@@ -0,0 +1,271 @@
+"""
+Streaming export and import of Route53 hosted zones as RFC 1035 (BIND) zonefiles.
+
+Export writes one line per record value, with fully qualified owner names, as the ListResourceRecordSets pages come
+in. Route53 already returns the record values in zonefile presentation format (eg: quoted TXT strings, "10 mail." MX
+values), so they are written as they are. Alias and routing policy record sets (weighted, latency, failover...) have
+no zonefile syntax: they are written as ZONEFILE_ROUTE53_PRAGMA comment lines holding the ResourceRecordSet JSON, which
+BIND tools ignore and the import restores as they are.
+
+Import parses the zonefile line by line and yields one ResourceRecordSet per record set as soon as its last record is
+read, so a zone with tens of thousands of records is turned into change batches without being loaded in memory. The
+parser handles comments, parentheses spanning lines, quoted strings, $ORIGIN, $TTL, '@', relative names, blank owners
+and TTL units (eg: 1h30m). The records of a record set have to be contiguous, as in every exported or AXFR'd zone.
+
+Route53 escapes the special characters of the names with octal \\ooo sequences (eg: \\052 for the '*' of a
+wildcard), while \\DDD is a decimal escape in zonefiles: '\\052' would read as '4'. Names are written with the
+characters themselves ('*.example.com.') or decimal escapes, and turned back into the Route53 form on import.
+"""
+
+import json
+import re
+
+from route53_helpers import normalize_record_name, ROUTE53_RECORD_TYPES, DEFAULT_RECORD_SET_TTL
+
+# Comment lines holding a ResourceRecordSet without zonefile syntax, eg: ;route53 {"Name": ..., "AliasTarget": ...}
+ZONEFILE_ROUTE53_PRAGMA = ';route53 '
+
+ZONEFILE_CLASSES = ('IN', 'CH', 'HS', 'CS')
+
+# Index of the domain name fields of the record values, qualified with the origin when relative.
+ZONEFILE_RDATA_NAME_FIELDS = {
+    'SOA': (0, 1),
+    'CNAME': (0,),
+    'NS': (0,),
+    'PTR': (0,),
+    'MX': (1,),
+    'SRV': (3,),
+    'NAPTR': (5,),
+}
+
+# Characters written as they are in zonefile names, the others are \DDD escaped.
+_ZONEFILE_NAME_CHARS = re.compile(r'^[a-z0-9*_-]$', re.IGNORECASE)
+_NAME_ESCAPE = re.compile(r'\\(\d{3})')
+
+_TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_TTL_PATTERN = re.compile(r'^(\d+|(\d+[smhdw])+)$', re.IGNORECASE)
+
+
+def _parse_ttl(token):
+    if token.isdigit():
+        return int(token)
+    return sum(int(value) * _TTL_UNITS[unit.lower()] for value, unit in re.findall(r'(\d+)([smhdw])', token, re.I))
+
+
+def _is_ttl(token):
+    return bool(_TTL_PATTERN.match(token))
+
+
+def _tokenize(line):
+    # Returns the tokens of a physical line, quoted strings included with their quotes, parentheses as tokens and
+    # the comment dropped.
+    tokens, token, quoted, escaped = [], '', False, False
+    for char in line:
+        if escaped:
+            token, escaped = token + char, False
+        elif char == '\\':
+            token, escaped = token + char, True
+        elif quoted:
+            token += char
+            quoted = char != '"'
+        elif char == '"':
+            token, quoted = token + char, True
+        elif char == ';':
+            break
+        elif char in '()' or char.isspace():
+            if token:
+                tokens.append(token)
+            token = ''
+            if not char.isspace():
+                tokens.append(char)
+        else:
+            token += char
+    if quoted:
+        raise ValueError('unterminated quoted string')
+    if token:
+        tokens.append(token)
+    return tokens
+
+
+def _iter_logical_lines(stream):
+    # Yields (line number, owner present, tokens, pragma) tuples, joining the lines of parenthesized records.
+    tokens, line_number, owner_present, depth = [], 0, False, 0
+    for number, line in enumerate(stream, 1):
+        if depth == 0 and line.startswith(ZONEFILE_ROUTE53_PRAGMA):
+            yield number, False, [], json.loads(line[len(ZONEFILE_ROUTE53_PRAGMA):])
+            continue
+
+        try:
+            line_tokens = _tokenize(line.rstrip('\r\n'))
+        except ValueError as error:
+            raise ValueError('zonefile line ' + str(number) + ': ' + str(error))
+
+        if depth == 0:
+            if not line_tokens:
+                continue
+            line_number, owner_present = number, not line[:1].isspace()
+
+        for token in line_tokens:
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+                if depth < 0:
+                    raise ValueError('zonefile line ' + str(number) + ': unbalanced parenthesis')
+            else:
+                tokens.append(token)
+
+        if depth == 0 and tokens:
+            yield line_number, owner_present, tokens, None
+            tokens = []
+
+    if depth:
+        raise ValueError('zonefile line ' + str(line_number) + ': unbalanced parenthesis')
+
+
+def zonefile_name(record_set_name):
+    """
+Returns a Route53 record set name in zonefile syntax, eg: \\052.example.com. -> *.example.com.
+    """
+    def unescape(match):
+        char = chr(int(match.group(1), 8))
+        return char if _ZONEFILE_NAME_CHARS.match(char) else '\\%03d' % ord(char)
+    return _NAME_ESCAPE.sub(unescape, record_set_name)
+
+
+def route53_name(record_set_name):
+    """
+Returns a zonefile name the way Route53 lists it (see route53_helpers.normalize_record_name), its decimal escapes
+turned into octal ones, eg: *.example.com. -> \\052.example.com.
+    """
+    def escape(match):
+        char = chr(int(match.group(1)))
+        return char if _ZONEFILE_NAME_CHARS.match(char) and char != '*' else '\\%03o' % ord(char)
+    return normalize_record_name(_NAME_ESCAPE.sub(escape, record_set_name))
+
+
+def _qualify(name, origin):
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name
+    return name + '.' + origin
+
+
+def iter_zonefile_record_sets(stream, origin, default_ttl=None, skipped=None):
+    """
+Parses a zonefile and yields its ResourceRecordSet elements, one per record set, as soon as the record set is
+complete.
+
+    :param stream: (file) -- zonefile opened in text mode, read line by line.
+
+    :param origin: (string) -- origin of the relative names until a $ORIGIN directive, usually the zone name.
+
+    :param default_ttl: (int) -- TTL of the records without one, until a $TTL directive. Defaults to the TTL of the
+    previous record, or route53_helpers.DEFAULT_RECORD_SET_TTL for the first one.
+
+    :param skipped: (dict) -- when given, counts the records skipped by type, eg: {'HINFO': 2}. Route53 does not
+    support their type.
+
+    :return: generator of ResourceRecordSet dicts.
+
+    :raise ValueError: on a syntax error, a $INCLUDE directive or a record set whose records are not contiguous.
+    """
+    origin = normalize_record_name(origin)
+    default_ttl = int(default_ttl) if default_ttl else None
+    last_ttl, owner = None, None
+    record_set, seen = None, set()
+
+    for line_number, owner_present, tokens, pragma in _iter_logical_lines(stream):
+        if pragma is not None:
+            if record_set is not None:
+                yield record_set
+                record_set = None
+            yield pragma
+            continue
+
+        location = 'zonefile line ' + str(line_number) + ': '
+        directive = tokens[0].upper()
+        if directive == '$ORIGIN':
+            origin = normalize_record_name(_qualify(tokens[1], origin))
+            continue
+        if directive == '$TTL':
+            default_ttl = _parse_ttl(tokens[1])
+            continue
+        if directive.startswith('$'):
+            raise ValueError(location + 'unsupported directive ' + tokens[0])
+
+        if owner_present:
+            owner = route53_name(_qualify(tokens.pop(0), origin))
+        if owner is None:
+            raise ValueError(location + 'record without owner name')
+
+        ttl = None
+        while tokens and (tokens[0].upper() in ZONEFILE_CLASSES or _is_ttl(tokens[0])):
+            token = tokens.pop(0)
+            if token.upper() not in ZONEFILE_CLASSES:
+                ttl = _parse_ttl(token)
+        if len(tokens) < 2:
+            raise ValueError(location + 'record without type or value')
+
+        record_type, rdata = tokens[0].upper(), tokens[1:]
+        if record_type not in ROUTE53_RECORD_TYPES:
+            if skipped is not None:
+                skipped[record_type] = skipped.get(record_type, 0) + 1
+            continue
+
+        for field in ZONEFILE_RDATA_NAME_FIELDS.get(record_type, ()):
+            if field < len(rdata):
+                rdata[field] = _qualify(rdata[field], origin)
+
+        ttl = ttl if ttl is not None else default_ttl if default_ttl is not None else last_ttl
+        last_ttl = ttl
+        value = ' '.join(rdata)
+
+        if record_set is not None and (record_set['Name'], record_set['Type']) == (owner, record_type):
+            record_set['ResourceRecords'].append({'Value': value})
+            continue
+
+        if record_set is not None:
+            yield record_set
+        if (owner, record_type) in seen:
+            raise ValueError(location + owner + ' ' + record_type + ' records are not contiguous')
+        seen.add((owner, record_type))
+        record_set = {
+            'Name': owner,
+            'Type': record_type,
+            'TTL': ttl if ttl is not None else DEFAULT_RECORD_SET_TTL,
+            'ResourceRecords': [{'Value': value}],
+        }
+
+    if record_set is not None:
+        yield record_set
+
+
+def write_zonefile(record_sets, zone_name, stream):
+    """
+Writes record sets to stream as a zonefile, one line per record value.
+
+    :param record_sets: (iterable) -- ResourceRecordSet elements, eg: route53_helpers.iter_resource_record_sets
+
+    :param zone_name: (string) -- hosted zone name, written as $ORIGIN.
+
+    :param stream: (file) -- text stream to write to.
+
+    :return: (tuple) (record sets written as records, record sets written as ZONEFILE_ROUTE53_PRAGMA lines)
+    """
+    stream.write('$ORIGIN ' + normalize_record_name(zone_name) + '\n')
+    records, pragmas = 0, 0
+    for resource_record_sets in record_sets:
+        if 'AliasTarget' in resource_record_sets or 'SetIdentifier' in resource_record_sets or \
+                'TrafficPolicyInstanceId' in resource_record_sets:
+            stream.write(ZONEFILE_ROUTE53_PRAGMA + json.dumps(resource_record_sets, separators=(',', ':')) + '\n')
+            pragmas += 1
+            continue
+
+        prefix = zonefile_name(resource_record_sets['Name']) + ' ' + \
+            str(resource_record_sets.get('TTL', DEFAULT_RECORD_SET_TTL)) + ' IN ' + resource_record_sets['Type'] + ' '
+        stream.write(''.join(prefix + record_values['Value'] + '\n'
+                             for record_values in resource_record_sets.get('ResourceRecords', [])))
+        records += 1
+    return records, pragmas